@@ -47,6 +47,6 @@ def get_llm_service(provider: Optional[str] = Query(None, description="LLM provi
         provider: Optional LLM provider name (grok, gemini, mock)
         
     Returns:
-        LLM service instance
+        The provider's shared LLM service instance
     """
-    return LLMServiceFactory.create_llm_service(provider) 
\ No newline at end of file
+    return LLMServiceFactory.get_llm_service(provider) 
\ No newline at end of file
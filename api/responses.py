@@ -0,0 +1,137 @@
+"""
+Response classes for the FastAPI application.
+"""
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Optional
+from bson import ObjectId
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+from config.settings import settings
+from config.logging import logger
+
+try:
+    import orjson
+except ImportError:  # Only needed for JSON_SERIALIZER=orjson
+    orjson = None
+
+if settings.JSON_SERIALIZER == "orjson" and orjson is None:
+    logger.warning("JSON_SERIALIZER is orjson but orjson is not installed, using json")
+
+
+def _encode_value(value: Any) -> Any:
+    """
+    Convert values the JSON encoders cannot serialize by themselves.
+    
+    Args:
+        value: An ObjectId, datetime or Pydantic model
+    
+    Returns:
+        The JSON-compatible value, formatted as the response models would
+    
+    Raises:
+        TypeError: If the value is of any other type
+    """
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, BaseModel):
+        return value.model_dump(by_alias=True)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Serialize content to JSON with the configured serializer.
+    
+    Both serializers produce the same output for API content: compact,
+    UTF-8, ObjectIds as strings and datetimes in ISO 8601.
+    
+    Args:
+        content: The content to serialize
+    
+    Returns:
+        The JSON document
+    """
+    if settings.JSON_SERIALIZER == "orjson" and orjson is not None:
+        # orjson writes datetimes natively and calls default for the rest
+        return orjson.dumps(content, default=_encode_value)
+    
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+        default=_encode_value
+    ).encode("utf-8")
+
+
+class APIJSONResponse(JSONResponse):
+    """Default response class, rendered with the configured serializer."""
+    
+    def render(self, content: Any) -> bytes:
+        """Serialize the content."""
+        return dumps(content)
+
+
+class DocumentJSONResponse(APIJSONResponse):
+    """
+    JSON response for data returned by the repositories.
+    
+    Returning it from a route bypasses response_model validation, which
+    would only repeat the validation done when the data was written or
+    read. The response_model still documents the schema.
+    """
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Build a weak ETag from the values that identify a representation.
+    
+    Args:
+        parts: Values that change whenever the response body would
+    
+    Returns:
+        The quoted ETag
+    """
+    digest = hashlib.sha1("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag, using weak comparison.
+    
+    Args:
+        if_none_match: The request's If-None-Match header
+        etag: The current ETag of the resource
+    
+    Returns:
+        True if the client's copy is current
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def not_modified(etag: str) -> Response:
+    """
+    Build a 304 Not Modified response.
+    
+    Args:
+        etag: The current ETag of the resource
+    
+    Returns:
+        An empty response carrying the ETag
+    """
+    return Response(status_code=304, headers={"ETag": etag})
@@ -1,35 +1,104 @@
 """
 API routes for chat operations.
 """
-from fastapi import APIRouter, HTTPException, status, Depends, Query, Path
-from typing import List, Dict, Any, Optional
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Path, Body, Header, Request
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, List, Dict, Any, Literal, Optional, Tuple
+from datetime import datetime
+import csv
+import io
+import json
+import re
+import zlib
+from pydantic import ValidationError
 from db.models.chat import ChatMessage
 from db.models.user import User
 from db.repositories.chat_repository import ChatRepository
+from api.responses import DocumentJSONResponse, dumps, make_etag, etag_matches, not_modified
+from utils.csv_importer import CSVImporter
 from api.dependencies import get_current_user
+from config.settings import settings
 from config.logging import logger
 
 
 router = APIRouter(prefix="/chats", tags=["chats"])
 
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+def _format_validation_error(error: ValidationError) -> str:
+    """
+    Flatten a validation error into one readable line.
+    
+    Args:
+        error: The validation error raised by ChatMessage
+        
+    Returns:
+        The "field: message" pairs joined by semicolons; errors about the
+        whole item, e.g. one that is not an object, have no field
+    """
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in detail['loc'])}: {detail['msg']}" if detail["loc"] else detail["msg"]
+        for detail in error.errors()
+    )
+
+
+async def _ndjson_lines(request: Request) -> AsyncIterator[Tuple[int, bytes]]:
+    """
+    Yield the non-empty lines of an NDJSON body as they arrive.
+    
+    Args:
+        request: The incoming request
+        
+    Yields:
+        The 1-based line number and the raw line
+        
+    Raises:
+        HTTPException: If a line exceeds NDJSON_MAX_LINE_BYTES
+    """
+    pending = b""
+    line_number = 0
+    
+    async for chunk in request.stream():
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield line_number, line
+        
+        if len(pending) > settings.NDJSON_MAX_LINE_BYTES:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Line {line_number + 1} is longer than {settings.NDJSON_MAX_LINE_BYTES} bytes"
+            )
+    
+    if pending.strip():
+        yield line_number + 1, pending
+
 
 @router.post("/", response_model=ChatMessage, status_code=status.HTTP_201_CREATED)
 async def create_chat_message(
     message: ChatMessage,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
     current_user: User = Depends(get_current_user)
 ):
     """
     Store a new chat message.
     
+    Retrying with the same Idempotency-Key header returns the message
+    stored by the first attempt instead of creating a duplicate.
+    
     Args:
         message: The chat message to store
+        idempotency_key: Optional client-supplied key for safe retries
         current_user: The authenticated user
         
     Returns:
         The stored chat message
     """
     try:
-        return await ChatRepository.create_message(message)
+        return await ChatRepository.create_message(message, idempotency_key=idempotency_key)
     except Exception as e:
         logger.error(f"Error creating chat message: {e}")
         raise HTTPException(
@@ -38,41 +107,322 @@ async def create_chat_message(
         )
 
 
+@router.post("/bulk", response_model=Dict[str, Any])
+async def create_chat_messages(
+    messages: List[Any] = Body(..., description="Chat messages to store"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Store many chat messages in one request.
+    
+    Each message is validated on its own, so one bad item, including one
+    that is not a JSON object, does not reject the whole payload. Valid
+    messages are written with unordered batched inserts.
+    
+    Args:
+        messages: The chat messages to store
+        current_user: The authenticated user
+        
+    Returns:
+        Counts per status and one result per submitted message
+    """
+    if not messages:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No messages provided"
+        )
+    
+    if len(messages) > settings.BULK_INSERT_MAX_MESSAGES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.BULK_INSERT_MAX_MESSAGES} messages per request"
+        )
+    
+    results: List[Dict[str, Any]] = [None] * len(messages)
+    valid_messages: List[ChatMessage] = []
+    valid_indexes: List[int] = []
+    
+    for index, item in enumerate(messages):
+        try:
+            valid_messages.append(ChatMessage.model_validate(item))
+            valid_indexes.append(index)
+        except ValidationError as e:
+            results[index] = {
+                "index": index,
+                "status": "invalid",
+                "id": None,
+                "error": _format_validation_error(e)
+            }
+    
+    try:
+        write_results = await ChatRepository.create_messages(valid_messages)
+    except Exception as e:
+        logger.error(f"Error creating chat messages: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to store chat messages"
+        )
+    
+    for index, result in zip(valid_indexes, write_results):
+        results[index] = {
+            "index": index,
+            "status": result["status"],
+            "id": str(result["id"]) if result["id"] else None,
+            "error": result.get("error")
+        }
+    
+    counts = {"inserted": 0, "duplicate": 0, "invalid": 0, "failed": 0}
+    for result in results:
+        counts[result["status"]] += 1
+    
+    return {
+        "total": len(messages),
+        **counts,
+        "results": results
+    }
+
+
+@router.post("/stream", response_model=Dict[str, Any])
+async def stream_chat_messages(
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Store chat messages from a newline-delimited JSON body.
+    
+    The body is read line by line and valid messages are written in
+    batches of BULK_INSERT_BATCH_SIZE as they fill, so memory use does not
+    grow with the payload. A line that is not valid JSON or not a valid
+    ChatMessage is rejected without affecting the others.
+    
+    Args:
+        request: The incoming request with an application/x-ndjson body
+        current_user: The authenticated user
+        
+    Returns:
+        Counts per status and the first rejected or failed lines
+    """
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if media_type not in NDJSON_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send the messages as application/x-ndjson"
+        )
+    
+    counts = {"lines": 0, "inserted": 0, "duplicate": 0, "rejected": 0, "failed": 0}
+    errors: List[Dict[str, Any]] = []
+    batch: List[ChatMessage] = []
+    batch_lines: List[int] = []
+    
+    def record_error(line_number: int, error: str) -> None:
+        if len(errors) < settings.NDJSON_MAX_REPORTED_ERRORS:
+            errors.append({"line": line_number, "error": error})
+    
+    async def write_batch() -> None:
+        results = await ChatRepository.create_messages(batch)
+        for line_number, result in zip(batch_lines, results):
+            counts[result["status"]] += 1
+            if result["status"] == "failed":
+                record_error(line_number, result.get("error"))
+        batch.clear()
+        batch_lines.clear()
+    
+    try:
+        async for line_number, line in _ndjson_lines(request):
+            counts["lines"] += 1
+            try:
+                batch.append(ChatMessage.model_validate(json.loads(line)))
+                batch_lines.append(line_number)
+            except ValidationError as e:
+                counts["rejected"] += 1
+                record_error(line_number, _format_validation_error(e))
+                continue
+            except ValueError as e:
+                # JSONDecodeError and UnicodeDecodeError
+                counts["rejected"] += 1
+                record_error(line_number, f"Invalid JSON: {e}")
+                continue
+            
+            if len(batch) >= settings.BULK_INSERT_BATCH_SIZE:
+                await write_batch()
+        
+        if batch:
+            await write_batch()
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error streaming chat messages: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to store chat messages after {counts['lines']} lines"
+        )
+    
+    return {
+        **counts,
+        "accepted": counts["inserted"] + counts["duplicate"],
+        "errors": errors
+    }
+
+
+@router.get("/search", response_model=Dict[str, Any])
+async def search_chat_messages(
+    q: str = Query(..., min_length=1, max_length=500, description="Keywords or quoted phrases to search for"),
+    user_id: str = Query(..., description="The ID of the user whose messages are searched"),
+    start: Optional[datetime] = Query(None, alias="from", description="Earliest message timestamp"),
+    end: Optional[datetime] = Query(None, alias="to", description="Latest message timestamp"),
+    limit: int = Query(20, ge=1, le=100, description="Maximum number of results to return"),
+    cursor: Optional[str] = Query(None, description="next_cursor or prev_cursor of a previous page"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Search a user's messages by keyword, most relevant first.
+    
+    Args:
+        q: Keywords or quoted phrases to search for
+        user_id: The ID of the user whose messages are searched
+        start: Optional earliest message timestamp ("from")
+        end: Optional latest message timestamp ("to")
+        limit: Maximum number of results to return
+        cursor: Cursor of the page to continue from
+        current_user: The authenticated user
+        
+    Returns:
+        Matching messages with their relevance scores, and cursors
+    """
+    # Simple authorization check
+    if current_user.role != "admin" and str(current_user.id) != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to search this user's chats"
+        )
+    
+    # The text index is only built for the document layout
+    if settings.CHAT_STORAGE_LAYOUT != "document":
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Message search requires CHAT_STORAGE_LAYOUT=document"
+        )
+    
+    try:
+        return await ChatRepository.search_messages(
+            user_id=user_id,
+            query=q,
+            start=start,
+            end=end,
+            limit=limit,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error searching chat messages: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to search chat messages"
+        )
+
+
 @router.get("/{conversation_id}", response_model=List[ChatMessage])
 async def get_conversation(
+    request: Request,
     conversation_id: str = Path(..., description="The ID of the conversation to retrieve"),
     skip: int = Query(0, ge=0, description="Number of messages to skip"),
     limit: int = Query(50, ge=1, le=100, description="Maximum number of messages to return"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor or X-Prev-Cursor of a previous page"),
+    start: Optional[datetime] = Query(None, alias="from", description="Earliest message timestamp"),
+    end: Optional[datetime] = Query(None, alias="to", description="Latest message timestamp"),
+    user_type: Optional[Literal["customer", "support_agent"]] = Query(None, description="Only messages from this type of user"),
+    fields: Optional[str] = Query(None, description="Comma-separated message fields to return, e.g. message_id,message_content"),
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user)
 ):
     """
     Retrieve messages from a conversation.
     
+    Cursors for the adjacent pages are returned in the X-Next-Cursor and
+    X-Prev-Cursor headers. Paging with them costs the same at any depth,
+    unlike skip, which is kept for existing clients.
+    
+    Pages with selected fields, and all pages when TRUSTED_READ_PATH is
+    enabled, are serialized straight from the stored documents without
+    building ChatMessage models. No page is re-validated against the
+    response model.
+    
+    The ETag covers the conversation's message count, its last message
+    timestamp and the query parameters. A matching If-None-Match is
+    answered with 304 Not Modified after one metadata lookup.
+    
     Args:
+        request: The incoming request, for its query parameters
         conversation_id: The ID of the conversation
         skip: Number of messages to skip (for pagination)
         limit: Maximum number of messages to return
+        cursor: Cursor of the page to continue from
+        start: Optional earliest message timestamp ("from")
+        end: Optional latest message timestamp ("to")
+        user_type: Optional author type filter
+        fields: Optional comma-separated fields to return
+        if_none_match: ETag of the client's copy
         current_user: The authenticated user
         
     Returns:
         List of chat messages
     """
+    if cursor and skip:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either cursor or skip, not both"
+        )
+    
     try:
-        messages = await ChatRepository.get_conversation(
+        etag = None
+        version = await ChatRepository.get_conversation_version(conversation_id)
+        if version:
+            etag = make_etag(
+                conversation_id,
+                version["message_count"],
+                version["last_message_at"],
+                sorted(request.query_params.multi_items())
+            )
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+        
+        page = await ChatRepository.get_conversation_page(
             conversation_id=conversation_id,
+            limit=limit,
+            cursor=cursor,
             skip=skip,
-            limit=limit
+            start=start,
+            end=end,
+            user_type=user_type,
+            fields=[field.strip() for field in fields.split(",") if field.strip()] if fields else None,
+            raw=settings.TRUSTED_READ_PATH
         )
         
-        if not messages:
+        # A filtered page may legitimately be empty
+        if not page["messages"] and not (start or end or user_type):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Conversation with ID {conversation_id} not found"
             )
         
-        return messages
+        headers = {"ETag": etag} if etag else {}
+        if page["next_cursor"]:
+            headers["X-Next-Cursor"] = page["next_cursor"]
+        if page["prev_cursor"]:
+            headers["X-Prev-Cursor"] = page["prev_cursor"]
+        
+        return DocumentJSONResponse(content=page["messages"], headers=headers)
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Error retrieving conversation: {e}")
         raise HTTPException(
@@ -81,6 +431,130 @@ async def get_conversation(
         )
 
 
+def _csv_row(values: List[Any]) -> bytes:
+    """
+    Format one CSV row.
+    
+    Args:
+        values: The row's values
+        
+    Returns:
+        The encoded row, including the line terminator
+    """
+    output = io.StringIO()
+    csv.writer(output).writerow(values)
+    return output.getvalue().encode("utf-8")
+
+
+async def _export_chunks(
+    first: Dict[str, Any],
+    documents: AsyncIterator[Dict[str, Any]],
+    export_format: str,
+    compress: bool
+) -> AsyncIterator[bytes]:
+    """
+    Encode exported messages into response chunks of about EXPORT_CHUNK_BYTES.
+    
+    Args:
+        first: The first message, already read to check the conversation exists
+        documents: The remaining messages
+        export_format: "ndjson" or "csv"
+        compress: Whether to gzip the output
+        
+    Yields:
+        Chunks of the (compressed) export
+    """
+    # wbits with 16 added writes a gzip header and trailer
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16) if compress else None
+    buffer = bytearray()
+    if export_format == "csv":
+        # The columns the CSV importer reads, so exports can be re-imported
+        buffer += _csv_row(CSVImporter.FIELDS)
+    
+    async def all_documents() -> AsyncIterator[Dict[str, Any]]:
+        """Yield the first message, then the rest."""
+        yield first
+        async for document in documents:
+            yield document
+    
+    try:
+        async for document in all_documents():
+            if export_format == "csv":
+                buffer += _csv_row([
+                    value.isoformat() if isinstance(value, datetime) else value
+                    for value in (document.get(field) for field in CSVImporter.FIELDS)
+                ])
+            else:
+                buffer += dumps(document) + b"\n"
+            
+            if len(buffer) >= settings.EXPORT_CHUNK_BYTES:
+                chunk = compressor.compress(bytes(buffer)) if compressor else bytes(buffer)
+                buffer.clear()
+                if chunk:
+                    yield chunk
+        
+        chunk = compressor.compress(bytes(buffer)) + compressor.flush() if compressor else bytes(buffer)
+        if chunk:
+            yield chunk
+    except Exception as e:
+        # The status line is already sent; aborting the stream signals the failure
+        logger.error(f"Error exporting conversation: {e}")
+        raise
+    finally:
+        await documents.aclose()
+
+
+@router.get("/{conversation_id}/export")
+async def export_conversation(
+    conversation_id: str = Path(..., description="The ID of the conversation to export"),
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format", description="Export format"),
+    compress: bool = Query(False, alias="gzip", description="Compress the export with gzip"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Stream a whole conversation as NDJSON or CSV.
+    
+    Messages are read from a database cursor and written as they arrive,
+    so memory use does not depend on the conversation's length.
+    
+    Args:
+        conversation_id: The ID of the conversation
+        export_format: "ndjson" (one message per line) or "csv"
+        compress: Whether to gzip the export
+        current_user: The authenticated user
+        
+    Returns:
+        A streaming attachment
+    """
+    documents = ChatRepository.iter_conversation(conversation_id)
+    try:
+        first = await anext(documents, None)
+    except Exception as e:
+        logger.error(f"Error exporting conversation: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to export conversation"
+        )
+    
+    if first is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Conversation with ID {conversation_id} not found"
+        )
+    
+    filename = f"{re.sub(r'[^A-Za-z0-9._-]', '_', conversation_id)}.{export_format}"
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    if compress:
+        filename += ".gz"
+        media_type = "application/gzip"
+    
+    return StreamingResponse(
+        _export_chunks(first, documents, export_format, compress),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 @router.delete("/{conversation_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_conversation(
     conversation_id: str = Path(..., description="The ID of the conversation to delete"),
@@ -1,36 +1,76 @@
 """
 API routes for importing data.
 """
-from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File, BackgroundTasks
+from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File, BackgroundTasks, Path, Request
+import asyncio
 import os
-import tempfile
 import shutil
-from typing import Dict, Any
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Any, List
 from db.models.user import User
+from db.models.import_job import ImportJob
+from db.repositories.import_job_repository import ImportJobRepository
 from utils.csv_importer import CSVImporter
+from utils.import_jobs import ImportJobRunner
 from api.dependencies import get_current_user
+from config.settings import settings
 from config.logging import logger
 
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
 
 router = APIRouter(prefix="/import", tags=["import"])
 
 
-@router.post("/csv", response_model=Dict[str, Any])
+async def _get_authorized_job(job_id: str, current_user: User) -> ImportJob:
+    """
+    Load a job and check that the current user may access it.
+    
+    Args:
+        job_id: The ID of the job
+        current_user: The authenticated user
+    
+    Returns:
+        The import job
+    
+    Raises:
+        HTTPException: If the job does not exist or belongs to another user
+    """
+    job = await ImportJobRepository.get_job(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Import job {job_id} not found"
+        )
+    
+    if current_user.role != "admin" and job.created_by != str(current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this import job"
+        )
+    
+    return job
+
+
+@router.post("/csv", response_model=Dict[str, Any], status_code=status.HTTP_202_ACCEPTED)
 async def import_csv(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Import chat data from a CSV file.
+    Start a background import of an uploaded CSV file.
     
     Args:
         background_tasks: FastAPI background tasks
         file: The CSV file to upload
         current_user: The authenticated user
-        
+    
     Returns:
-        Import statistics
+        The ID and initial status of the import job
     """
     # Check file type
     if not file.filename.endswith(".csv"):
@@ -39,83 +79,250 @@ async def import_csv(
             detail="Only CSV files are allowed"
         )
     
-    # Create temporary file
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".csv")
+    job = ImportJob(
+        filename=file.filename,
+        file_path="",
+        delete_file=True,
+        created_by=str(current_user.id)
+    )
+    # The upload is kept until the job completes so a failed job can resume
+    job.file_path = os.path.join(settings.IMPORT_UPLOAD_DIR, f"{job.id}.csv")
     
     try:
-        # Write uploaded file to temp file
-        shutil.copyfileobj(file.file, temp_file)
-        temp_file.close()
+        os.makedirs(settings.IMPORT_UPLOAD_DIR, exist_ok=True)
+        with open(job.file_path, "wb") as upload_copy:
+            await asyncio.to_thread(shutil.copyfileobj, file.file, upload_copy)
         
-        # Import the CSV data
-        stats = await CSVImporter.import_from_file(temp_file.name)
+        job = await ImportJobRepository.create_job(job)
+    except Exception as e:
+        logger.error(f"Error starting CSV import: {str(e)}")
+        if os.path.exists(job.file_path):
+            os.unlink(job.file_path)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error starting CSV import: {str(e)}"
+        )
+    
+    background_tasks.add_task(ImportJobRunner.run, str(job.id))
+    
+    return ImportJobRunner.describe(job)
+
+
+async def _multipart_file_chunks(request: Request, boundary: bytes) -> AsyncIterator[bytes]:
+    """
+    Yield the bytes of the first file part of a multipart body as they arrive.
+    
+    Args:
+        request: The incoming request
+        boundary: The multipart boundary from the Content-Type header
+    
+    Yields:
+        Chunks of the uploaded file's content
+    """
+    file_data: List[bytes] = []
+    part = {"header_field": b"", "header_value": b"", "is_file": False, "seen_file": False}
+    
+    def on_part_begin():
+        part["is_file"] = False
+    
+    def on_header_field(data, start, end):
+        part["header_field"] += data[start:end]
+    
+    def on_header_value(data, start, end):
+        part["header_value"] += data[start:end]
+    
+    def on_header_end():
+        if (
+            part["header_field"].lower() == b"content-disposition"
+            and b"filename=" in part["header_value"]
+            and not part["seen_file"]
+        ):
+            part["is_file"] = True
+        part["header_field"] = b""
+        part["header_value"] = b""
+    
+    def on_part_data(data, start, end):
+        if part["is_file"]:
+            file_data.append(bytes(data[start:end]))
+    
+    def on_part_end():
+        if part["is_file"]:
+            part["seen_file"] = True
+            part["is_file"] = False
+    
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end
+    })
+    
+    async for chunk in request.stream():
+        parser.write(chunk)
+        if file_data:
+            yield b"".join(file_data)
+            file_data.clear()
+    
+    parser.finalize()
+    if file_data:
+        yield b"".join(file_data)
+
+
+@router.post("/csv/stream", response_model=Dict[str, Any])
+async def import_csv_stream(
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Import a CSV upload while it is being received, without a temp file.
+    
+    Accepts either a multipart/form-data upload (the first file part is
+    imported) or a raw text/csv body. Rows are written in batches as they
+    are parsed, and the body is only read as fast as MongoDB accepts the
+    writes, so a slow database throttles the client.
+    
+    Args:
+        request: The incoming request
+        current_user: The authenticated user
+    
+    Returns:
+        Import statistics
+    """
+    content_type = request.headers.get("content-type", "")
+    media_type, options = parse_options_header(content_type)
+    
+    if media_type == b"multipart/form-data":
+        boundary = options.get(b"boundary")
+        if not boundary:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Missing multipart boundary"
+            )
+        data = _multipart_file_chunks(request, boundary)
+    elif media_type in (b"text/csv", b"application/octet-stream"):
+        data = request.stream()
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send the CSV as multipart/form-data or text/csv"
+        )
+    
+    try:
+        stats = await CSVImporter.import_from_stream(data)
         
         return {
-            "filename": file.filename,
             "status": "success",
             "stats": stats
         }
-        
-    except FileNotFoundError:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="CSV file not found"
-        )
-    except ValueError as e:
+    
+    except (ValueError, UnicodeDecodeError) as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
     except Exception as e:
-        logger.error(f"Error importing CSV: {str(e)}")
+        logger.error(f"Error importing CSV stream: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error importing CSV: {str(e)}"
         )
-    finally:
-        # Clean up the temp file
-        if os.path.exists(temp_file.name):
-            os.unlink(temp_file.name)
 
 
-@router.post("/csv/file", response_model=Dict[str, Any])
+@router.post("/csv/file", response_model=Dict[str, Any], status_code=status.HTTP_202_ACCEPTED)
 async def import_csv_from_path(
     file_path: str,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user)
 ):
     """
-    Import chat data from a CSV file on the server.
+    Start a background import of a CSV file on the server.
     
     Args:
         file_path: The path to the CSV file on the server
+        background_tasks: FastAPI background tasks
         current_user: The authenticated user
-        
+    
     Returns:
-        Import statistics
+        The ID and initial status of the import job
     """
-    try:
-        # Import the CSV data
-        stats = await CSVImporter.import_from_file(file_path)
-        
-        return {
-            "filename": os.path.basename(file_path),
-            "status": "success",
-            "stats": stats
-        }
-        
-    except FileNotFoundError:
+    if not os.path.exists(file_path):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"CSV file not found: {file_path}"
         )
-    except ValueError as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=str(e)
-        )
+    
+    try:
+        job = await ImportJobRepository.create_job(ImportJob(
+            filename=os.path.basename(file_path),
+            file_path=file_path,
+            created_by=str(current_user.id)
+        ))
     except Exception as e:
-        logger.error(f"Error importing CSV: {str(e)}")
+        logger.error(f"Error starting CSV import: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error importing CSV: {str(e)}"
-        ) 
\ No newline at end of file
+            detail=f"Error starting CSV import: {str(e)}"
+        )
+    
+    background_tasks.add_task(ImportJobRunner.run, str(job.id))
+    
+    return ImportJobRunner.describe(job)
+
+
+@router.get("/jobs/{job_id}", response_model=Dict[str, Any])
+async def get_import_job(
+    job_id: str = Path(..., description="The ID of the import job"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Report the progress of an import job.
+    
+    Args:
+        job_id: The ID of the import job
+        current_user: The authenticated user
+    
+    Returns:
+        Rows processed, throughput, failures and ETA for the job
+    """
+    job = await _get_authorized_job(job_id, current_user)
+    return ImportJobRunner.describe(job)
+
+
+@router.post("/jobs/{job_id}/resume", response_model=Dict[str, Any], status_code=status.HTTP_202_ACCEPTED)
+async def resume_import_job(
+    background_tasks: BackgroundTasks,
+    job_id: str = Path(..., description="The ID of the import job"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Resume a failed import job from its last committed offset.
+    
+    Args:
+        background_tasks: FastAPI background tasks
+        job_id: The ID of the import job
+        current_user: The authenticated user
+    
+    Returns:
+        The current status of the import job
+    """
+    job = await _get_authorized_job(job_id, current_user)
+    
+    stale_before = datetime.utcnow() - timedelta(seconds=settings.IMPORT_JOB_STALE_SECONDS)
+    abandoned = job.status == "running" and job.updated_at < stale_before
+    if job.status != "failed" and not abandoned:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Import job {job_id} is {job.status} and cannot be resumed"
+        )
+    
+    if not os.path.exists(job.file_path):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail=f"Source file for import job {job_id} no longer exists"
+        )
+    
+    background_tasks.add_task(ImportJobRunner.run, job_id)
+    
+    return ImportJobRunner.describe(job)
@@ -1,20 +1,82 @@
 """
 API routes for summarization and insights.
 """
-from fastapi import APIRouter, HTTPException, status, Depends, Body, Path
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, status, Depends, Body, Path, Header, Response
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
 from db.models.chat import ConversationSummary, ChatMessage
 from db.models.user import User
-from db.repositories.chat_repository import ChatRepository
+from db.repositories.chat_repository import ChatRepository, MESSAGE_SORT
 from db.repositories.summary_repository import SummaryRepository
 from services.llm.base import LLMService
+from services.llm.structured_output import DEFAULT_INSIGHTS, INSIGHT_FIELDS
 from api.dependencies import get_current_user, get_llm_service
+from api.responses import make_etag, etag_matches, not_modified
+from utils.pagination import KeysetPagination
+from config.settings import settings
 from config.logging import logger
 
 
 router = APIRouter(prefix="/chats", tags=["summarization"])
 
 
+async def _summarize_new_messages(
+    conversation_id: str,
+    previous: Optional[ConversationSummary],
+    llm_service: LLMService
+) -> Tuple[Optional[Dict[str, Any]], Optional[ChatMessage], int, bool]:
+    """
+    Fold the messages after a summary's watermark into its insights.
+    
+    Messages are read from the watermark on, SUMMARY_BATCH_SIZE at a time,
+    and each batch is sent to the LLM with the insights so far, so the work
+    grows with the number of new messages only.
+    
+    Args:
+        conversation_id: The ID of the conversation
+        previous: The stored summary to continue from, or None to start over
+        llm_service: The LLM service
+    
+    Returns:
+        The insights, the last message they cover (None if no message was
+        added), the number of messages added, and False if an LLM call
+        failed before all new messages were covered
+    """
+    insights = {field: getattr(previous, field) for field in INSIGHT_FIELDS} if previous else None
+    cursor = None
+    if previous:
+        cursor = KeysetPagination.encode_cursor(
+            MESSAGE_SORT, [previous.last_message_at, previous.last_message_id], "next"
+        )
+    
+    last_message = None
+    added = 0
+    while True:
+        page = await ChatRepository.get_conversation_page(
+            conversation_id, limit=settings.SUMMARY_BATCH_SIZE, cursor=cursor
+        )
+        messages = page["messages"]
+        if not messages:
+            return insights, last_message, added, True
+        
+        if insights is None:
+            updated = await llm_service.generate_full_insights(messages)
+        else:
+            updated = await llm_service.update_insights(insights, messages)
+        
+        if not updated or updated["summary"] == DEFAULT_INSIGHTS["summary"]:
+            # Keep what was covered so far; the next request resumes from there
+            logger.error(f"LLM failed to summarize messages of conversation {conversation_id}")
+            return insights, last_message, added, False
+        
+        insights, last_message = updated, messages[-1]
+        added += len(messages)
+        
+        cursor = page["next_cursor"]
+        if not cursor:
+            return insights, last_message, added, True
+
+
 @router.post("/summarize", response_model=ConversationSummary)
 async def summarize_conversation(
     conversation_id: str = Body(..., embed=True, description="The ID of the conversation to summarize"),
@@ -22,43 +84,69 @@ async def summarize_conversation(
     llm_service: LLMService = Depends(get_llm_service)
 ):
     """
-    Generate a summary for a conversation.
+    Generate a summary for a conversation, or bring a stored one up to date.
+    
+    A stored summary records the last message it covers. If messages were
+    added since, only those are sent to the LLM, together with the stored
+    insights, and the updated summary is stored.
     
     Args:
         conversation_id: The ID of the conversation
         current_user: The authenticated user
         llm_service: The LLM service
-        
+    
     Returns:
         The generated summary
     """
     try:
-        # Check if summary already exists
+        # Check if summary already exists and covers every message
         existing_summary = await SummaryRepository.get_summary(conversation_id)
-        if existing_summary:
-            return existing_summary
+        version = await ChatRepository.get_conversation_version(conversation_id)
+        if version:
+            message_count = version["message_count"]
+        else:
+            # Metadata missing or stale: count the messages
+            message_count = await ChatRepository.count_messages(conversation_id)
+        # Summaries stored before watermarks existed are regenerated
+        previous = existing_summary if existing_summary and existing_summary.last_message_at else None
+        if previous and previous.message_count >= message_count:
+            return previous
         
-        # Get the conversation messages
-        messages = await ChatRepository.get_conversation(conversation_id)
-        if not messages:
+        insights, last_message, added, complete = await _summarize_new_messages(
+            conversation_id, previous, llm_service
+        )
+        if last_message is None:
+            if previous and complete:
+                # Only messages timestamped before the watermark arrived late; they
+                # are not summarized, but counted so they don't trigger a refresh again
+                return await SummaryRepository.create_or_update_summary(
+                    previous.model_copy(update={"message_count": message_count})
+                )
+            if previous:
+                return previous
+            if complete:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Conversation with ID {conversation_id} not found"
+                )
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Conversation with ID {conversation_id} not found"
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail="LLM provider failed to summarize the conversation"
             )
         
-        # Generate insights using LLM
-        insights = await llm_service.generate_full_insights(messages)
+        covered = (previous.message_count if previous else 0) + added
+        if complete:
+            # Late messages timestamped before the watermark are counted as covered
+            covered = max(covered, message_count)
         
         # Create the summary object
         summary = ConversationSummary(
             conversation_id=conversation_id,
-            summary=insights["summary"],
-            action_items=insights["action_items"],
-            decisions=insights["decisions"],
-            questions=insights["questions"],
-            sentiment=insights["sentiment"],
-            outcome=insights["outcome"],
-            keywords=insights["keywords"]
+            **insights,
+            message_count=covered,
+            last_message_at=last_message.timestamp,
+            last_message_id=last_message.id,
+            created_at=existing_summary.created_at if existing_summary else datetime.utcnow()
         )
         
         # Store the summary
@@ -77,20 +165,38 @@ async def summarize_conversation(
 
 @router.get("/{conversation_id}/summary", response_model=ConversationSummary)
 async def get_conversation_summary(
+    response: Response,
     conversation_id: str = Path(..., description="The ID of the conversation"),
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user)
 ):
     """
     Retrieve an existing summary for a conversation.
     
+    The ETag is derived from the summary's updated_at, so a matching
+    If-None-Match is answered with 304 Not Modified without loading it.
+    
     Args:
+        response: The outgoing response, for the ETag header
         conversation_id: The ID of the conversation
+        if_none_match: ETag of the client's copy
         current_user: The authenticated user
-        
+    
     Returns:
         The conversation summary
     """
     try:
+        updated_at = await SummaryRepository.get_summary_version(conversation_id)
+        if updated_at is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Summary for conversation {conversation_id} not found"
+            )
+        
+        etag = make_etag(conversation_id, updated_at)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        
         summary = await SummaryRepository.get_summary(conversation_id)
         if not summary:
             raise HTTPException(
@@ -98,6 +204,8 @@ async def get_conversation_summary(
                 detail=f"Summary for conversation {conversation_id} not found"
             )
         
+        # Built from the summary itself in case it changed since the lookup
+        response.headers["ETag"] = make_etag(conversation_id, summary.updated_at)
         return summary
     except HTTPException:
         raise
@@ -122,7 +230,7 @@ async def generate_insights(
         messages: List of chat messages to analyze
         current_user: The authenticated user
         llm_service: The LLM service
-        
+    
     Returns:
         Dictionary with generated insights
     """
@@ -2,10 +2,13 @@
 API routes for user operations.
 """
 from fastapi import APIRouter, HTTPException, status, Depends, Query, Path
-from typing import Dict, Any
+from typing import Dict, Any, Literal, Optional
+from datetime import datetime
 from db.models.user import User
 from db.repositories.chat_repository import ChatRepository
+from api.responses import DocumentJSONResponse
 from api.dependencies import get_current_user
+from config.settings import settings
 from config.logging import logger
 
 
@@ -17,6 +20,17 @@ async def get_user_chats(
     user_id: str = Path(..., description="The ID of the user"),
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(10, ge=1, le=50, description="Items per page"),
+    sort: Literal["conversation_id", "recent"] = Query(
+        "conversation_id",
+        description="Order by conversation ID or by latest activity"
+    ),
+    cursor: Optional[str] = Query(None, description="next_cursor or prev_cursor of a previous page"),
+    start: Optional[datetime] = Query(None, alias="from", description="Only conversations active at or after this time"),
+    end: Optional[datetime] = Query(None, alias="to", description="Only conversations active at or before this time"),
+    user_type: Optional[Literal["customer", "support_agent"]] = Query(
+        None,
+        description="Only conversations with a participant of this type"
+    ),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -26,6 +40,11 @@ async def get_user_chats(
         user_id: The ID of the user
         page: Page number (starting from 1)
         limit: Number of conversations per page
+        sort: "conversation_id" (descending) or "recent" (latest activity first)
+        cursor: Cursor of the page to continue from; takes precedence over page
+        start: Optional start of the activity range ("from")
+        end: Optional end of the activity range ("to")
+        user_type: Optional participant type filter
         current_user: The authenticated user
         
     Returns:
@@ -39,10 +58,26 @@ async def get_user_chats(
         )
     
     try:
-        return await ChatRepository.get_user_conversations(
+        history = await ChatRepository.get_user_conversations(
             user_id=user_id,
             page=page,
-            limit=limit
+            limit=limit,
+            sort=sort,
+            cursor=cursor,
+            start=start,
+            end=end,
+            user_type=user_type,
+            raw=settings.TRUSTED_READ_PATH
+        )
+        return DocumentJSONResponse(content=history)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
     except Exception as e:
-        logger.error(f"Error retrieving user chats: {e}") 
\ No newline at end of file
+        logger.error(f"Error retrieving user chats: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve user chats"
+        )
@@ -3,7 +3,10 @@ Configuration settings for the Chat Summarization API.
 """
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Literal
 import logging
+import os
+import tempfile
 
 
 class Settings(BaseSettings):
@@ -18,9 +21,49 @@ class Settings(BaseSettings):
     MONGODB_URL: str = "mongodb://localhost:27017"
     DB_NAME: str = "chat_summarization"
     
+    # Storage layout: one document per message, or per-conversation buckets
+    CHAT_STORAGE_LAYOUT: Literal["document", "bucket"] = "document"
+    CHAT_BUCKET_MAX_MESSAGES: int = 200  # Messages per bucket document
+    
+    # Ingestion settings
+    BULK_INSERT_MAX_MESSAGES: int = 5000  # Upper bound for POST /chats/bulk
+    BULK_INSERT_BATCH_SIZE: int = 1000  # Documents per insert_many round trip
+    IDEMPOTENT_INGESTION: bool = True  # Upsert on (conversation_id, message_id)
+    WRITE_BUFFER_ENABLED: bool = False  # Coalesce single-message inserts into batches
+    WRITE_BUFFER_FLUSH_INTERVAL_MS: int = 5  # Longest a buffered insert waits
+    WRITE_BUFFER_MAX_BATCH: int = 500  # Flush as soon as this many inserts are queued
+    WRITE_BUFFER_WRITE_CONCERN: str = "1"  # "w" value for buffered writes, e.g. "majority"
+    NDJSON_MAX_LINE_BYTES: int = 1048576  # Longest accepted line for POST /chats/stream
+    NDJSON_MAX_REPORTED_ERRORS: int = 100  # Rejected lines listed in the stream summary
+    CSV_IMPORT_CHUNK_SIZE: int = 5000  # Rows parsed and written per CSV chunk
+    IMPORT_MAX_TRACKED_CONVERSATIONS: int = 1000  # Conversation IDs kept for the import summary
+    IMPORT_UPLOAD_DIR: str = os.path.join(tempfile.gettempdir(), "chat_imports")
+    IMPORT_JOB_STALE_SECONDS: int = 300  # Running jobs silent this long may be resumed
+    
+    # Read settings
+    TRUSTED_READ_PATH: bool = False  # Serialize stored messages without re-validating them
+    JSON_SERIALIZER: Literal["json", "orjson"] = "json"  # Encoder for API responses
+    READ_CACHE_ENABLED: bool = False  # Cache conversation pages and summaries in memory
+    READ_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # Estimated size of all cached values
+    READ_CACHE_TTL_SECONDS: int = 30  # Longest an entry is served without a write
+    READ_CACHE_INVALIDATION: Literal["local", "mongodb"] = "local"  # "mongodb" for several workers
+    EXPORT_BATCH_SIZE: int = 1000  # Messages per cursor batch for conversation exports
+    EXPORT_CHUNK_BYTES: int = 65536  # Bytes buffered before each write of an export stream
+    
     # LLM settings
     GROK_API_KEY: str = ""
     GEMINI_API_KEY: str = ""
+    LLM_HTTP_POOL_LIMIT: int = 100  # Open connections across all provider hosts
+    LLM_HTTP_POOL_LIMIT_PER_HOST: int = 20  # Open connections per provider host
+    LLM_HTTP_KEEPALIVE_SECONDS: int = 30  # Idle time before a pooled connection is closed
+    LLM_HTTP_DNS_CACHE_SECONDS: int = 300  # How long resolved provider addresses are reused
+    LLM_HTTP_TIMEOUT_SECONDS: int = 120  # Total time allowed for one provider call
+    LLM_MAX_CONCURRENT_REQUESTS: int = 10  # Calls in flight per provider; more wait for a slot
+    LLM_FALLBACK_CONCURRENCY: int = 3  # Missing insights requested at once when the combined response is incomplete
+    LLM_CACHE_ENABLED: bool = True  # Reuse insights for conversations with the same content
+    LLM_CACHE_MAX_ENTRIES: int = 10000  # Insights kept in memory; the rest are read from MongoDB
+    LLM_CACHE_TTL_SECONDS: int = 7 * 24 * 60 * 60  # How long cached insights are reused
+    SUMMARY_BATCH_SIZE: int = 200  # New messages sent to the LLM per summary update
     
     # Security settings
     SECRET_KEY: str = "your-secret-key-change-in-production"
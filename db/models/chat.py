@@ -3,8 +3,9 @@ Database models for chat messages and related data.
 """
 from datetime import datetime
 from typing import List, Optional, Literal
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, field_validator, validator
 from bson import ObjectId
+from utils.datetimes import to_naive_utc
 
 
 class PyObjectId(ObjectId):
@@ -36,6 +37,12 @@ class ChatMessage(BaseModel):
     user_type: Literal["customer", "support_agent"]
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     
+    @field_validator("timestamp")
+    @classmethod
+    def timestamp_to_naive_utc(cls, value: datetime) -> datetime:
+        """Store timestamps as naive UTC, so mixed offsets stay comparable."""
+        return to_naive_utc(value)
+    
     class Config:
         """Pydantic model configuration."""
         populate_by_name = True  # Updated from allow_population_by_field_name
@@ -53,6 +60,45 @@ class ChatMessage(BaseModel):
         }
 
 
+class Conversation(BaseModel):
+    """Model representing per-conversation metadata maintained at write time."""
+    
+    id: Optional[PyObjectId] = Field(default_factory=PyObjectId, alias="_id")
+    conversation_id: str
+    message_count: int = 0
+    first_message_at: datetime
+    last_message_at: datetime
+    participants: List[str] = Field(default_factory=list)  # user_ids that wrote messages
+    participant_types: List[str] = Field(default_factory=list)  # user_types that wrote messages
+    last_message: ChatMessage
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Config:
+        """Pydantic model configuration."""
+        populate_by_name = True
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str}
+        json_schema_extra = {
+            "example": {
+                "conversation_id": "conv123",
+                "message_count": 12,
+                "first_message_at": "2023-10-15T14:30:00",
+                "last_message_at": "2023-10-15T14:52:00",
+                "participants": ["customer123", "agent7"],
+                "participant_types": ["customer", "support_agent"],
+                "last_message": {
+                    "conversation_id": "conv123",
+                    "message_id": "msg467",
+                    "message_content": "Glad I could help!",
+                    "user_id": "agent7",
+                    "user_type": "support_agent",
+                    "timestamp": "2023-10-15T14:52:00"
+                },
+                "updated_at": "2023-10-15T14:52:00"
+            }
+        }
+
+
 class ConversationSummary(BaseModel):
     """Model representing a conversation summary with insights."""
     
@@ -65,6 +111,10 @@ class ConversationSummary(BaseModel):
     sentiment: Literal["positive", "negative", "neutral", "mixed"]
     outcome: Literal["yes", "no", "maybe", "curious"]
     keywords: List[str] = Field(default_factory=list)
+    # Watermark: the last message covered, in (timestamp, _id) order, and how many were covered
+    message_count: int = 0
+    last_message_at: Optional[datetime] = None
+    last_message_id: Optional[PyObjectId] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     
@@ -83,6 +133,9 @@ class ConversationSummary(BaseModel):
                 "sentiment": "neutral",
                 "outcome": "yes",
                 "keywords": ["refund", "order", "shipping"],
+                "message_count": 12,
+                "last_message_at": "2023-10-15T14:44:10",
+                "last_message_id": "652c0a8e9d1f4b2a7c3e5f61",
                 "created_at": "2023-10-15T14:45:00",
                 "updated_at": "2023-10-15T14:45:00"
             }
@@ -0,0 +1,55 @@
+"""
+Database models for background import jobs.
+"""
+from datetime import datetime
+from typing import Optional, Literal
+from pydantic import BaseModel, Field
+from bson import ObjectId
+from db.models.chat import PyObjectId
+
+
+class ImportJob(BaseModel):
+    """Model representing a background CSV import and its progress."""
+    
+    id: Optional[PyObjectId] = Field(default_factory=PyObjectId, alias="_id")
+    filename: str
+    file_path: str
+    delete_file: bool = False  # Remove the source file once the job completes
+    created_by: str
+    status: Literal["pending", "running", "completed", "failed"] = "pending"
+    rows_processed: int = 0  # Committed offset: rows fully written to the database
+    successful: int = 0
+    failed: int = 0
+    duplicates: int = 0  # Rows already stored, e.g. after a resume
+    bytes_processed: int = 0
+    total_bytes: int = 0
+    rows_per_second: float = 0.0
+    eta_seconds: Optional[float] = None
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    completed_at: Optional[datetime] = None
+    
+    class Config:
+        """Pydantic model configuration."""
+        populate_by_name = True
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str}
+        json_schema_extra = {
+            "example": {
+                "filename": "helpdesk_export.csv",
+                "file_path": "/tmp/chat_imports/6528f1c2a1b2c3d4e5f60718.csv",
+                "created_by": "6528f1c2a1b2c3d4e5f60001",
+                "status": "running",
+                "rows_processed": 250000,
+                "successful": 249990,
+                "failed": 10,
+                "duplicates": 0,
+                "bytes_processed": 52428800,
+                "total_bytes": 524288000,
+                "rows_per_second": 18500.0,
+                "eta_seconds": 121.6,
+                "created_at": "2023-10-15T14:30:00",
+                "updated_at": "2023-10-15T14:30:14"
+            }
+        }
@@ -3,6 +3,7 @@ MongoDB connection and database operations.
 """
 import motor.motor_asyncio
 from typing import Optional
+from pymongo.errors import DuplicateKeyError, OperationFailure
 from config.settings import settings
 import logging
 
@@ -41,13 +42,93 @@ class MongoDB:
         """Create necessary indexes for optimization."""
         try:
             # Chat messages indexes
-            await cls.db.chat_messages.create_index("conversation_id")
-            await cls.db.chat_messages.create_index("user_id")
+            # The compound indexes also serve lookups by their first field alone
+            await cls.db.chat_messages.create_index([("user_id", 1), ("conversation_id", 1)])
+            await cls.db.chat_messages.create_index([("conversation_id", 1), ("timestamp", 1), ("_id", 1)])
+            # Equality fields before the sort fields, so user_type-filtered pages
+            # are still read in index order without an in-memory sort
+            await cls.db.chat_messages.create_index(
+                [("conversation_id", 1), ("user_type", 1), ("timestamp", 1), ("_id", 1)]
+            )
             await cls.db.chat_messages.create_index("timestamp")
+            await cls.db.chat_messages.create_index(
+                "idempotency_key",
+                unique=True,
+                partialFilterExpression={"idempotency_key": {"$exists": True}}
+            )
+            
+            # Per-user keyword search; MongoDB allows one text index per collection
+            if settings.CHAT_STORAGE_LAYOUT == "document":
+                await cls.db.chat_messages.create_index(
+                    [("user_id", 1), ("message_content", "text"), ("timestamp", 1)],
+                    name="user_message_content_text"
+                )
+            
+            # Unique message identity makes replays and retries no-ops
+            try:
+                await cls.db.chat_messages.create_index(
+                    [("conversation_id", 1), ("message_id", 1)],
+                    unique=True
+                )
+            except DuplicateKeyError:
+                logger.error(
+                    "Could not create unique (conversation_id, message_id) index: "
+                    "chat_messages already contains duplicates. Idempotent upserts "
+                    "still apply, but concurrent writes may create duplicates until "
+                    "they are removed."
+                )
+            
+            # Bucket layout indexes: ordered bucket scans, dedup and per-user lookups
+            if settings.CHAT_STORAGE_LAYOUT == "bucket":
+                await cls.db.chat_buckets.create_index([("conversation_id", 1), ("start_time", 1)])
+                await cls.db.chat_buckets.create_index([("conversation_id", 1), ("end_time", -1)])
+                await cls.db.chat_buckets.create_index([("user_ids", 1), ("conversation_id", 1)])
+                await cls.db.chat_buckets.create_index("messages.idempotency_key", sparse=True)
+                # Unique across buckets; appends check the bucket they write to themselves
+                try:
+                    await cls.db.chat_buckets.create_index(
+                        [("conversation_id", 1), ("messages.message_id", 1)],
+                        unique=True
+                    )
+                    await cls.db.chat_buckets.create_index(
+                        "idempotency_keys",
+                        unique=True,
+                        partialFilterExpression={"idempotency_keys": {"$exists": True}}
+                    )
+                except OperationFailure as e:
+                    logger.error(
+                        "Could not create unique chat_buckets indexes: chat_buckets "
+                        "contains duplicates, or a non-unique (conversation_id, "
+                        "messages.message_id) index must be dropped first. Concurrent "
+                        f"writes may create duplicates until this is fixed. {e}"
+                    )
+            
+            # Conversation metadata: history pages by ID or by latest activity. History
+            # date ranges are served here, so chat_messages needs no (user_id, timestamp) index
+            await cls.db.conversations.create_index("conversation_id", unique=True)
+            await cls.db.conversations.create_index([("participants", 1), ("conversation_id", -1)])
+            await cls.db.conversations.create_index(
+                [("participants", 1), ("last_message_at", -1), ("conversation_id", -1)]
+            )
+            await cls.db.conversations.create_index([("last_message_at", -1)])
             
             # Summaries indexes
             await cls.db.conversation_summaries.create_index("conversation_id", unique=True)
             
+            # Cached LLM results expire after the configured TTL
+            try:
+                await cls.db.llm_results.create_index(
+                    "created_at",
+                    expireAfterSeconds=settings.LLM_CACHE_TTL_SECONDS
+                )
+            except OperationFailure:
+                # The index exists with another TTL; update it in place
+                await cls.db.command(
+                    "collMod",
+                    "llm_results",
+                    index={"keyPattern": {"created_at": 1}, "expireAfterSeconds": settings.LLM_CACHE_TTL_SECONDS}
+                )
+            
             logger.info("Created MongoDB indexes.")
         except Exception as e:
             logger.error(f"Failed to create indexes: {e}")
@@ -0,0 +1,327 @@
+"""
+In-process read cache for conversations and summaries.
+"""
+import asyncio
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+from pydantic import BaseModel
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+from db.mongodb import MongoDB
+from config.settings import settings
+from config.logging import logger
+
+InvalidationHandler = Callable[[List[str]], None]
+
+
+class InvalidationBackend:
+    """
+    Delivers invalidations to the other processes serving the API.
+    
+    The base class is the single-process backend: there is nobody else
+    to notify, so publishing does nothing.
+    """
+    
+    async def start(self, on_invalidate: InvalidationHandler) -> None:
+        """
+        Start receiving invalidations published by other processes.
+        
+        Args:
+            on_invalidate: Called with the conversation IDs of each invalidation
+        """
+    
+    async def publish(self, conversation_ids: List[str]) -> None:
+        """
+        Tell the other processes to drop entries of these conversations.
+        
+        Args:
+            conversation_ids: The changed conversations
+        """
+    
+    async def stop(self) -> None:
+        """Stop receiving invalidations."""
+
+
+class MongoInvalidationBackend(InvalidationBackend):
+    """
+    Shares invalidations through a capped MongoDB collection.
+    
+    Every process appends its invalidations to cache_invalidations and
+    follows the collection with a tailable cursor, so it works on any
+    deployment, including a standalone server without change streams.
+    """
+    
+    COLLECTION = "cache_invalidations"
+    COLLECTION_BYTES = 16 * 1024 * 1024
+    
+    def __init__(self):
+        self._origin = uuid.uuid4().hex
+        self._task: Optional[asyncio.Task] = None
+    
+    async def start(self, on_invalidate: InvalidationHandler) -> None:
+        """Create the collection if needed and start following it."""
+        try:
+            await MongoDB.db.create_collection(self.COLLECTION, capped=True, size=self.COLLECTION_BYTES)
+        except CollectionInvalid:
+            pass  # Created by another process
+        
+        self._task = asyncio.create_task(self._follow(on_invalidate))
+    
+    async def publish(self, conversation_ids: List[str]) -> None:
+        """Append an invalidation for the other processes."""
+        try:
+            await MongoDB.db[self.COLLECTION].insert_one({
+                "origin": self._origin,
+                "conversation_ids": conversation_ids,
+                "created_at": datetime.utcnow()
+            })
+        except Exception as e:
+            # Other processes keep their entries until the TTL expires them
+            logger.error(f"Failed to publish cache invalidation: {e}")
+    
+    async def stop(self) -> None:
+        """Stop following the collection."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _follow(self, on_invalidate: InvalidationHandler) -> None:
+        """Apply invalidations from other processes until cancelled."""
+        collection = MongoDB.db[self.COLLECTION]
+        last = await collection.find_one({}, sort=[("$natural", -1)])
+        last_id = last["_id"] if last else None
+        
+        while True:
+            # ObjectIds of different processes are only ordered to the second,
+            # so a reconnect may miss an invalidation; the TTL bounds the staleness
+            query = {"_id": {"$gt": last_id}} if last_id else {}
+            cursor = collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+            try:
+                while cursor.alive:
+                    async for document in cursor:
+                        last_id = document["_id"]
+                        if document["origin"] != self._origin:
+                            on_invalidate(document["conversation_ids"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Cache invalidation feed failed, retrying: {e}")
+            
+            # A tailable cursor dies when the collection is empty or was rolled over
+            await asyncio.sleep(1)
+
+
+def _estimate_size(value: Any) -> int:
+    """
+    Estimate the memory held by a cached value.
+    
+    Args:
+        value: A repository result
+    
+    Returns:
+        Approximate size in bytes
+    """
+    if isinstance(value, BaseModel):
+        return sys.getsizeof(value) + _estimate_size(value.__dict__)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            _estimate_size(key) + _estimate_size(item) for key, item in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class ReadCache:
+    """
+    LRU cache with a TTL for conversation pages and summaries.
+    
+    Entries are grouped by conversation so that any write to a conversation
+    drops all of its entries. The cache holds at most READ_CACHE_MAX_BYTES
+    of estimated value size; the least recently used entries are evicted
+    beyond that. Cached values are shared between callers and must be
+    treated as read-only.
+    """
+    
+    _entries: "OrderedDict[Tuple[str, Hashable], Tuple[float, int, Any]]" = OrderedDict()
+    _keys_by_conversation: Dict[str, Set[Tuple[str, Hashable]]] = {}
+    _size: int = 0
+    # Invalidation counter, and its value at each conversation's last invalidation
+    _invalidation_count: int = 0
+    _generations: "OrderedDict[str, int]" = OrderedDict()
+    # Generations of conversations invalidated longer ago are forgotten, oldest
+    # first; only loads that started before those invalidations are affected
+    MAX_TRACKED_GENERATIONS = 10000
+    _forgotten_generation: int = 0
+    _stats: Dict[str, int] = {
+        "hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0
+    }
+    _backend: InvalidationBackend = InvalidationBackend()
+    
+    @classmethod
+    async def start(cls):
+        """Start the invalidation backend selected by READ_CACHE_INVALIDATION."""
+        if settings.READ_CACHE_INVALIDATION == "mongodb":
+            cls._backend = MongoInvalidationBackend()
+        else:
+            cls._backend = InvalidationBackend()
+        
+        await cls._backend.start(cls._drop)
+        logger.info(
+            f"Started read cache ({settings.READ_CACHE_MAX_BYTES} bytes, "
+            f"{settings.READ_CACHE_TTL_SECONDS}s TTL, {settings.READ_CACHE_INVALIDATION} invalidation)"
+        )
+    
+    @classmethod
+    async def stop(cls):
+        """Stop the invalidation backend."""
+        await cls._backend.stop()
+    
+    @classmethod
+    def enabled(cls) -> bool:
+        """Return True if reads should go through the cache."""
+        return settings.READ_CACHE_ENABLED
+    
+    @classmethod
+    def get(cls, conversation_id: str, key: Hashable) -> Tuple[bool, Any]:
+        """
+        Look up a cached value.
+        
+        Args:
+            conversation_id: The conversation the value belongs to
+            key: The value's key within the conversation
+        
+        Returns:
+            Whether the value was found, and the value
+        """
+        entry_key = (conversation_id, key)
+        entry = cls._entries.get(entry_key)
+        if entry is None:
+            cls._stats["misses"] += 1
+            return False, None
+        
+        if entry[0] < time.monotonic():
+            cls._remove(entry_key)
+            cls._stats["expirations"] += 1
+            cls._stats["misses"] += 1
+            return False, None
+        
+        cls._entries.move_to_end(entry_key)
+        cls._stats["hits"] += 1
+        return True, entry[2]
+    
+    @classmethod
+    def generation(cls, conversation_id: str) -> int:
+        """
+        Return a conversation's generation, to be read before loading a value.
+        
+        Args:
+            conversation_id: The conversation the value belongs to
+        
+        Returns:
+            A number that changes whenever the conversation is invalidated
+        """
+        return cls._generations.get(conversation_id, cls._forgotten_generation)
+    
+    @classmethod
+    def put(cls, conversation_id: str, key: Hashable, value: Any, generation: int) -> None:
+        """
+        Store a value loaded from the database.
+        
+        The value is discarded if the conversation was invalidated since
+        generation was read, because it may have been loaded before that write.
+        
+        Args:
+            conversation_id: The conversation the value belongs to
+            key: The value's key within the conversation
+            value: The value to cache
+            generation: generation(conversation_id) as read before loading the value
+        """
+        if generation != cls.generation(conversation_id):
+            return
+        
+        size = _estimate_size(value)
+        if size > settings.READ_CACHE_MAX_BYTES:
+            return
+        
+        entry_key = (conversation_id, key)
+        if entry_key in cls._entries:
+            cls._remove(entry_key)
+        
+        cls._entries[entry_key] = (time.monotonic() + settings.READ_CACHE_TTL_SECONDS, size, value)
+        cls._keys_by_conversation.setdefault(conversation_id, set()).add(entry_key)
+        cls._size += size
+        
+        while cls._size > settings.READ_CACHE_MAX_BYTES:
+            cls._remove(next(iter(cls._entries)))
+            cls._stats["evictions"] += 1
+    
+    @classmethod
+    async def invalidate(cls, conversation_ids: Iterable[str]) -> None:
+        """
+        Drop all entries of the given conversations, in every process.
+        
+        Args:
+            conversation_ids: The changed conversations
+        """
+        conversation_ids = sorted(set(conversation_ids))
+        if not conversation_ids or not cls.enabled():
+            return
+        
+        cls._drop(conversation_ids)
+        await cls._backend.publish(conversation_ids)
+    
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        """
+        Return the cache counters.
+        
+        Returns:
+            Hit, miss, eviction, expiration and invalidation counts, and
+            the current number of entries and their estimated size
+        """
+        lookups = cls._stats["hits"] + cls._stats["misses"]
+        return {
+            **cls._stats,
+            "hit_rate": cls._stats["hits"] / lookups if lookups else 0.0,
+            "entries": len(cls._entries),
+            "size_bytes": cls._size,
+            "max_bytes": settings.READ_CACHE_MAX_BYTES
+        }
+    
+    @classmethod
+    def _drop(cls, conversation_ids: List[str]) -> None:
+        """Drop the entries of the given conversations in this process."""
+        cls._invalidation_count += 1
+        for conversation_id in conversation_ids:
+            cls._generations[conversation_id] = cls._invalidation_count
+            cls._generations.move_to_end(conversation_id)
+            for entry_key in cls._keys_by_conversation.pop(conversation_id, set()):
+                cls._remove(entry_key, keep_index=True)
+        cls._stats["invalidations"] += 1
+        
+        while len(cls._generations) > cls.MAX_TRACKED_GENERATIONS:
+            _, generation = cls._generations.popitem(last=False)
+            cls._forgotten_generation = max(cls._forgotten_generation, generation)
+    
+    @classmethod
+    def _remove(cls, entry_key: Tuple[str, Hashable], keep_index: bool = False) -> None:
+        """Remove one entry and release its size."""
+        _, size, _ = cls._entries.pop(entry_key)
+        cls._size -= size
+        if keep_index:
+            return
+        
+        keys = cls._keys_by_conversation.get(entry_key[0])
+        if keys is not None:
+            keys.discard(entry_key)
+            if not keys:
+                del cls._keys_by_conversation[entry_key[0]]
@@ -0,0 +1,490 @@
+"""
+Repository for chat messages stored in per-conversation bucket documents.
+"""
+from typing import AsyncIterator, List, Optional, Dict, Any, Literal, Set
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import UpdateOne
+from pymongo.write_concern import WriteConcern
+from pymongo.errors import BulkWriteError
+from db.mongodb import MongoDB
+from db.write_buffer import MessageWriteBuffer
+from db.repositories.conversation_repository import ConversationRepository
+from db.models.chat import ChatMessage
+from utils.datetimes import to_naive_utc
+from config.settings import settings
+from config.logging import logger
+
+# MongoDB error code for unique index violations
+DUPLICATE_KEY_ERROR = 11000
+
+
+class ChatBucketRepository:
+    """
+    Chat message operations for the "bucket" storage layout.
+    
+    Messages are embedded in chat_buckets documents holding at most
+    CHAT_BUCKET_MAX_MESSAGES messages of one conversation, together with
+    the bucket's message count, time range and participating user IDs.
+    Reading a whole conversation touches a handful of buckets instead of
+    one document and several index keys per message.
+    """
+    
+    @staticmethod
+    async def create_message(
+        message: ChatMessage,
+        idempotency_key: Optional[str] = None
+    ) -> ChatMessage:
+        """
+        Append a chat message to its conversation's open bucket.
+        
+        Args:
+            message: The chat message to store
+            idempotency_key: Optional client-supplied key identifying this write
+        
+        Returns:
+            The stored chat message with ID
+        """
+        document = message.model_dump(by_alias=True)
+        
+        try:
+            if idempotency_key is not None:
+                stored = await ChatBucketRepository._find_message(
+                    {"messages.idempotency_key": idempotency_key},
+                    {"idempotency_key": idempotency_key}
+                )
+                if stored:
+                    return stored
+                document["idempotency_key"] = idempotency_key
+            
+            if MessageWriteBuffer.is_running():
+                result = await MessageWriteBuffer.submit(document)
+            else:
+                result = (await ChatBucketRepository.insert_documents([document]))[0]
+            
+            if result["status"] == "inserted":
+                message.id = result["id"]
+                return message
+            if result["status"] == "duplicate":
+                stored = None
+                if idempotency_key is not None:
+                    # A concurrent write with the same key may have stored another message
+                    stored = await ChatBucketRepository._find_message(
+                        {"idempotency_keys": idempotency_key},
+                        {"idempotency_key": idempotency_key}
+                    )
+                return stored or await ChatBucketRepository._find_message(
+                    {"conversation_id": message.conversation_id},
+                    {"message_id": message.message_id}
+                )
+            raise RuntimeError(result.get("error", "Write error"))
+        except Exception as e:
+            logger.error(f"Failed to create chat message: {e}")
+            raise
+    
+    @staticmethod
+    async def insert_documents(
+        documents: List[Dict[str, Any]],
+        batch_size: Optional[int] = None,
+        write_concern: Optional[WriteConcern] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Append already-validated message documents to their buckets.
+        
+        Args:
+            documents: Insert-ready message documents (each with an "_id")
+            batch_size: Documents per bulk_write call
+            write_concern: Optional write concern overriding the client default
+        
+        Returns:
+            One result per document, in input order, with a status of
+            "inserted", "duplicate" or "failed"
+        """
+        batch_size = batch_size or settings.BULK_INSERT_BATCH_SIZE
+        collection = MongoDB.db.chat_buckets
+        if write_concern is not None:
+            collection = collection.with_options(write_concern=write_concern)
+        results: List[Dict[str, Any]] = []
+        
+        for start in range(0, len(documents), batch_size):
+            batch = documents[start:start + batch_size]
+            results.extend(await ChatBucketRepository._write_batch(collection, batch))
+        
+        await ConversationRepository.record_messages([
+            document
+            for document, result in zip(documents, results)
+            if result["status"] == "inserted"
+        ])
+        
+        return results
+    
+    @staticmethod
+    async def _write_batch(
+        collection: AsyncIOMotorCollection,
+        batch: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Write a batch with one unordered bulk_write of bucket appends.
+        
+        Messages of the same conversation are appended together, in groups
+        small enough to fit a bucket. Messages repeated within the batch, or
+        already stored under the same message ID or idempotency key, are
+        reported as duplicates; the appends and the unique bucket indexes
+        enforce this against concurrent writers too. In idempotent mode the
+        stored messages are looked up first, so replays skip the per-message
+        retry of a rejected group.
+        
+        Args:
+            collection: The chat_buckets collection, with any write concern applied
+            batch: Insert-ready message documents
+        
+        Returns:
+            One result per document
+        """
+        results = [{"status": "inserted", "id": document["_id"]} for document in batch]
+        
+        by_conversation: Dict[str, List[int]] = {}
+        for index, document in enumerate(batch):
+            by_conversation.setdefault(document["conversation_id"], []).append(index)
+        
+        stored: Dict[str, Set[str]] = {}
+        if settings.IDEMPOTENT_INGESTION:
+            stored = await ChatBucketRepository._stored_message_ids(collection, batch, by_conversation)
+        
+        seen_keys: Set[str] = set()
+        for conversation_id, indexes in by_conversation.items():
+            seen = stored.get(conversation_id, set())
+            new_indexes = []
+            for index in indexes:
+                message_id = batch[index]["message_id"]
+                key = batch[index].get("idempotency_key")
+                if message_id in seen or key in seen_keys:
+                    results[index] = {"status": "duplicate", "id": None, "error": "Duplicate message"}
+                else:
+                    seen.add(message_id)
+                    if key is not None:
+                        seen_keys.add(key)
+                    new_indexes.append(index)
+            by_conversation[conversation_id] = new_indexes
+        
+        operations = []
+        groups: List[List[int]] = []
+        bucket_size = settings.CHAT_BUCKET_MAX_MESSAGES
+        for conversation_id, indexes in by_conversation.items():
+            for start in range(0, len(indexes), bucket_size):
+                group = indexes[start:start + bucket_size]
+                operations.append(ChatBucketRepository._append_operation(
+                    conversation_id, [batch[index] for index in group]
+                ))
+                groups.append(group)
+        
+        if not operations:
+            return results
+        
+        retry: List[int] = []
+        try:
+            await collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                group = groups[error["index"]]
+                if error.get("code") == DUPLICATE_KEY_ERROR and len(group) > 1:
+                    # Some message of the group is stored already; find out which
+                    retry.extend(group)
+                    continue
+                for index in group:
+                    results[index] = ChatBucketRepository._error_result(error)
+        except Exception as e:
+            logger.error(f"Failed to write chat message buckets: {e}")
+            raise
+        
+        if retry:
+            await ChatBucketRepository._append_singly(collection, batch, retry, results)
+        
+        return results
+    
+    @staticmethod
+    async def _append_singly(
+        collection: AsyncIOMotorCollection,
+        batch: List[Dict[str, Any]],
+        indexes: List[int],
+        results: List[Dict[str, Any]]
+    ) -> None:
+        """
+        Append messages one per operation, after their group was rejected.
+        
+        Args:
+            collection: The chat_buckets collection, with any write concern applied
+            batch: Insert-ready message documents
+            indexes: Batch indexes of the messages to append
+            results: Per-document results, updated in place
+        """
+        operations = [
+            ChatBucketRepository._append_operation(batch[index]["conversation_id"], [batch[index]])
+            for index in indexes
+        ]
+        try:
+            await collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                results[indexes[error["index"]]] = ChatBucketRepository._error_result(error)
+        except Exception as e:
+            logger.error(f"Failed to write chat message buckets: {e}")
+            raise
+    
+    @staticmethod
+    def _error_result(error: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the result of a message whose append failed."""
+        if error.get("code") == DUPLICATE_KEY_ERROR:
+            return {"status": "duplicate", "id": None, "error": "Duplicate message"}
+        return {"status": "failed", "id": None, "error": error.get("errmsg", "Write error")}
+    
+    @staticmethod
+    def _append_operation(conversation_id: str, documents: List[Dict[str, Any]]) -> UpdateOne:
+        """
+        Build an update appending messages to a bucket with room for all of them.
+        
+        If no bucket of the conversation has enough room, the upsert starts
+        a new one. The chosen bucket must not hold any of the message IDs or
+        idempotency keys yet; if another bucket does, the upsert violates
+        one of the unique bucket indexes and fails with a duplicate key error.
+        
+        Args:
+            conversation_id: The conversation the messages belong to
+            documents: Message documents of that conversation
+        
+        Returns:
+            The upsert operation
+        """
+        timestamps = [document["timestamp"] for document in documents]
+        keys = [document["idempotency_key"] for document in documents if "idempotency_key" in document]
+        
+        query = {
+            "conversation_id": conversation_id,
+            "count": {"$lte": settings.CHAT_BUCKET_MAX_MESSAGES - len(documents)},
+            "messages.message_id": {"$nin": [document["message_id"] for document in documents]}
+        }
+        push: Dict[str, Any] = {"messages": {"$each": documents}}
+        if keys:
+            # Kept beside the messages so the unique index has no null entries
+            query["idempotency_keys"] = {"$nin": keys}
+            push["idempotency_keys"] = {"$each": keys}
+        
+        return UpdateOne(
+            query,
+            {
+                "$push": push,
+                "$inc": {"count": len(documents)},
+                "$min": {"start_time": min(timestamps)},
+                "$max": {"end_time": max(timestamps)},
+                "$addToSet": {"user_ids": {"$each": sorted({document["user_id"] for document in documents})}}
+            },
+            upsert=True
+        )
+    
+    @staticmethod
+    async def _stored_message_ids(
+        collection: AsyncIOMotorCollection,
+        batch: List[Dict[str, Any]],
+        by_conversation: Dict[str, List[int]]
+    ) -> Dict[str, Set[str]]:
+        """
+        Look up which conversations already hold messages from the batch.
+        
+        Args:
+            collection: The chat_buckets collection
+            batch: Insert-ready message documents
+            by_conversation: Batch indexes grouped by conversation ID
+        
+        Returns:
+            Stored message IDs per conversation, from every bucket that
+            contains at least one message of the batch
+        """
+        query = {"$or": [
+            {
+                "conversation_id": conversation_id,
+                "messages.message_id": {"$in": [batch[index]["message_id"] for index in indexes]}
+            }
+            for conversation_id, indexes in by_conversation.items()
+        ]}
+        
+        stored: Dict[str, Set[str]] = {}
+        cursor = collection.find(query, {"conversation_id": 1, "messages.message_id": 1})
+        async for bucket in cursor:
+            stored.setdefault(bucket["conversation_id"], set()).update(
+                message["message_id"] for message in bucket["messages"]
+            )
+        
+        return stored
+    
+    @staticmethod
+    async def _find_message(query: Dict[str, Any], match: Dict[str, Any]) -> Optional[ChatMessage]:
+        """
+        Find one embedded message.
+        
+        Args:
+            query: Filter selecting the bucket
+            match: Fields the embedded message must match
+        
+        Returns:
+            The message if found, None otherwise
+        """
+        bucket = await MongoDB.db.chat_buckets.find_one(
+            {**query, "messages": {"$elemMatch": match}},
+            {"messages": {"$elemMatch": match}}
+        )
+        if not bucket:
+            return None
+        
+        return ChatMessage(**bucket["messages"][0])
+    
+    @staticmethod
+    async def get_conversation_window(
+        conversation_id: str,
+        count: int,
+        position: Optional[List[Any]] = None,
+        direction: Literal["next", "prev"] = "next",
+        skip: int = 0,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        user_type: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Read consecutive messages of a conversation in (timestamp, _id) order.
+        
+        Buckets are read in time order starting at the requested position,
+        and reading stops once the window cannot change, so a page only
+        touches the buckets around it.
+        
+        Args:
+            conversation_id: The ID of the conversation
+            count: Number of messages to return
+            position: Optional (timestamp, _id) to read after or before
+            direction: "next" to read forwards from position, "prev" backwards
+            skip: Number of messages to skip first
+            start: Optional earliest message timestamp
+            end: Optional latest message timestamp
+            user_type: Optional author type
+        
+        Returns:
+            Message documents in reading order (descending when going backwards)
+        """
+        # Compared with stored timestamps in Python, which are naive UTC
+        start, end = to_naive_utc(start), to_naive_utc(end)
+        needed = skip + count
+        forward = direction == "next"
+        # Buckets may overlap in time when messages arrive out of order, so
+        # select every bucket overlapping the time range still to be read
+        earliest, latest = start, end
+        if position and forward:
+            earliest = max(earliest, position[0]) if earliest else position[0]
+        elif position:
+            latest = min(latest, position[0]) if latest else position[0]
+        
+        query: Dict[str, Any] = {"conversation_id": conversation_id}
+        if earliest:
+            query["end_time"] = {"$gte": earliest}
+        if latest:
+            query["start_time"] = {"$lte": latest}
+        
+        bucket_sort = [("start_time", 1), ("_id", 1)] if forward else [("end_time", -1), ("_id", -1)]
+        cursor = MongoDB.db.chat_buckets.find(
+            query, {"messages": 1, "start_time": 1, "end_time": 1}
+        ).sort(bucket_sort)
+        
+        documents: List[Dict[str, Any]] = []
+        async for bucket in cursor:
+            if len(documents) >= needed:
+                boundary = documents[needed - 1]["timestamp"]
+                if (bucket["start_time"] > boundary) if forward else (bucket["end_time"] < boundary):
+                    break
+            
+            for document in bucket["messages"]:
+                key = (document["timestamp"], document["_id"])
+                if position is not None and not (key > tuple(position) if forward else key < tuple(position)):
+                    continue
+                if (start and document["timestamp"] < start) or (end and document["timestamp"] > end):
+                    continue
+                if user_type and document["user_type"] != user_type:
+                    continue
+                documents.append(document)
+            documents.sort(key=lambda document: (document["timestamp"], document["_id"]), reverse=not forward)
+        
+        return documents[skip:needed]
+    
+    @staticmethod
+    async def iter_conversation(conversation_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Read a whole conversation in (timestamp, _id) order, one message at a time.
+        
+        Buckets may overlap in time, so the messages are unwound and sorted
+        by the server, which spills to disk for very long conversations.
+        
+        Args:
+            conversation_id: The ID of the conversation
+        
+        Yields:
+            Message documents without internal fields
+        """
+        cursor = MongoDB.db.chat_buckets.aggregate(
+            [
+                {"$match": {"conversation_id": conversation_id}},
+                {"$unwind": "$messages"},
+                {"$replaceRoot": {"newRoot": "$messages"}},
+                {"$sort": {"timestamp": 1, "_id": 1}},
+                {"$project": {"idempotency_key": 0}}
+            ],
+            allowDiskUse=True,
+            batchSize=settings.EXPORT_BATCH_SIZE
+        )
+        try:
+            async for document in cursor:
+                yield document
+        finally:
+            await cursor.close()
+    
+    @staticmethod
+    async def count_messages(conversation_id: str) -> int:
+        """
+        Count a conversation's messages by summing its bucket counts.
+        
+        Args:
+            conversation_id: The ID of the conversation
+        
+        Returns:
+            The number of stored messages
+        """
+        result = await MongoDB.db.chat_buckets.aggregate([
+            {"$match": {"conversation_id": conversation_id}},
+            {"$group": {"_id": None, "count": {"$sum": "$count"}}}
+        ]).to_list(length=1)
+        return result[0]["count"] if result else 0
+    
+    @staticmethod
+    async def delete_conversation(conversation_id: str) -> bool:
+        """
+        Delete a conversation's buckets and its summary.
+        
+        Args:
+            conversation_id: The ID of the conversation to delete
+        
+        Returns:
+            True if anything was deleted, False otherwise
+        """
+        try:
+            result_buckets = await MongoDB.db.chat_buckets.delete_many(
+                {"conversation_id": conversation_id}
+            )
+            
+            result_summary = await MongoDB.db.conversation_summaries.delete_one(
+                {"conversation_id": conversation_id}
+            )
+            
+            await ConversationRepository.delete_conversation(conversation_id)
+            
+            deleted = result_buckets.deleted_count > 0 or result_summary.deleted_count > 0
+            logger.info(f"Deleted conversation {conversation_id}: {deleted}")
+            
+            return deleted
+        except Exception as e:
+            logger.error(f"Failed to delete conversation: {e}")
+            raise
@@ -1,38 +1,276 @@
 """
 Repository for chat-related database operations.
 """
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any, Literal
 from datetime import datetime
 from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.write_concern import WriteConcern
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from db.mongodb import MongoDB
+from db.write_buffer import MessageWriteBuffer
+from db.read_cache import ReadCache
+from db.repositories.chat_bucket_repository import ChatBucketRepository
+from db.repositories.conversation_repository import ConversationRepository
 from db.models.chat import ChatMessage, ConversationSummary
+from utils.pagination import KeysetPagination
+from utils.datetimes import to_naive_utc
+from config.settings import settings
 from config.logging import logger
 
+# MongoDB error code for unique index violations
+DUPLICATE_KEY_ERROR = 11000
+
+# Unique order of messages within a conversation, used by cursors
+MESSAGE_SORT = [("timestamp", 1), ("_id", 1)]
+
+# Fields of a stored message, as named in API responses
+MESSAGE_FIELDS = [field.alias or name for name, field in ChatMessage.model_fields.items()]
+
+# Search results: most relevant first, _id breaks ties
+SEARCH_SORT = [("score", -1), ("_id", -1)]
+
 
 class ChatRepository:
-    """Repository for chat message operations."""
+    """
+    Repository for chat message operations.
+    
+    With CHAT_STORAGE_LAYOUT set to "bucket", every operation is delegated
+    to ChatBucketRepository, so callers work the same with either layout.
+    """
     
     @staticmethod
-    async def create_message(message: ChatMessage) -> ChatMessage:
+    async def create_message(
+        message: ChatMessage,
+        idempotency_key: Optional[str] = None
+    ) -> ChatMessage:
         """
         Store a new chat message in the database.
         
+        Storing a message whose (conversation_id, message_id) already exists
+        returns the stored copy instead of creating a duplicate; in
+        idempotent mode, or when an idempotency key is given, this is done
+        with an upsert rather than by catching the unique index violation.
+        While the write buffer is running, the insert is batched with
+        concurrent ones and returns once the batch is acknowledged.
+        
         Args:
             message: The chat message to store
-            
+            idempotency_key: Optional client-supplied key identifying this write
+        
         Returns:
             The stored chat message with ID
         """
+        if settings.CHAT_STORAGE_LAYOUT == "bucket":
+            return await ChatBucketRepository.create_message(message, idempotency_key)
+        
+        document = message.model_dump(by_alias=True)  # Updated from dict()
+        
         try:
-            result = await MongoDB.db.chat_messages.insert_one(
-                message.model_dump(by_alias=True)  # Updated from dict()
-            )
-            message.id = result.inserted_id
-            return message
+            if idempotency_key is not None:
+                document["idempotency_key"] = idempotency_key
+                key_filter = {"idempotency_key": idempotency_key}
+            elif MessageWriteBuffer.is_running():
+                # Coalesced with concurrent inserts into one batched write
+                result = await MessageWriteBuffer.submit(document)
+                if result["status"] == "inserted":
+                    message.id = result["id"]
+                    return message
+                if result["status"] == "duplicate":
+                    stored = await MongoDB.db.chat_messages.find_one({
+                        "conversation_id": message.conversation_id,
+                        "message_id": message.message_id
+                    })
+                    return ChatMessage(**stored)
+                raise RuntimeError(result.get("error", "Write error"))
+            elif settings.IDEMPOTENT_INGESTION:
+                key_filter = {
+                    "conversation_id": message.conversation_id,
+                    "message_id": message.message_id
+                }
+            else:
+                try:
+                    result = await MongoDB.db.chat_messages.insert_one(document)
+                except DuplicateKeyError:
+                    # The unique (conversation_id, message_id) index applies in every mode
+                    stored = await MongoDB.db.chat_messages.find_one({
+                        "conversation_id": message.conversation_id,
+                        "message_id": message.message_id
+                    })
+                    return ChatMessage(**stored)
+                message.id = result.inserted_id
+                await ConversationRepository.record_messages([document])
+                return message
+            
+            try:
+                stored = await MongoDB.db.chat_messages.find_one_and_update(
+                    key_filter,
+                    {"$setOnInsert": document},
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+                if stored["_id"] == document["_id"]:
+                    # Inserted by this call rather than found
+                    await ConversationRepository.record_messages([document])
+            except DuplicateKeyError:
+                # Same message already stored under another idempotency key
+                stored = await MongoDB.db.chat_messages.find_one({
+                    "conversation_id": message.conversation_id,
+                    "message_id": message.message_id
+                })
+            
+            return ChatMessage(**stored)
         except Exception as e:
             logger.error(f"Failed to create chat message: {e}")
             raise
     
+    @staticmethod
+    async def create_messages(messages: List[ChatMessage]) -> List[Dict[str, Any]]:
+        """
+        Store many chat messages using batched, unordered insert_many calls.
+        
+        Args:
+            messages: The chat messages to store
+        
+        Returns:
+            One result per message, in input order, with a status of
+            "inserted", "duplicate" or "failed"
+        """
+        documents = [message.model_dump(by_alias=True) for message in messages]
+        results = await ChatRepository.insert_documents(documents)
+        
+        for message, result in zip(messages, results):
+            if result["status"] == "inserted":
+                message.id = result["id"]
+        
+        return results
+    
+    @staticmethod
+    async def insert_documents(
+        documents: List[Dict[str, Any]],
+        batch_size: Optional[int] = None,
+        write_concern: Optional[WriteConcern] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Insert already-validated message documents in unordered batches.
+        
+        A failing document does not stop the rest of its batch from being
+        written; its error is reported in the matching result instead. In
+        idempotent mode documents are upserted on (conversation_id,
+        message_id), so replaying a batch only reports duplicates.
+        
+        Args:
+            documents: Insert-ready message documents (each with an "_id")
+            batch_size: Documents per insert_many call
+            write_concern: Optional write concern overriding the client default
+        
+        Returns:
+            One result per document, in input order
+        """
+        if settings.CHAT_STORAGE_LAYOUT == "bucket":
+            return await ChatBucketRepository.insert_documents(documents, batch_size, write_concern)
+        
+        batch_size = batch_size or settings.BULK_INSERT_BATCH_SIZE
+        collection = MongoDB.db.chat_messages
+        if write_concern is not None:
+            collection = collection.with_options(write_concern=write_concern)
+        results: List[Dict[str, Any]] = []
+        
+        for start in range(0, len(documents), batch_size):
+            batch = documents[start:start + batch_size]
+            if settings.IDEMPOTENT_INGESTION:
+                results.extend(await ChatRepository._upsert_batch(collection, batch))
+                continue
+            
+            batch_results = [
+                {"status": "inserted", "id": document["_id"]} for document in batch
+            ]
+            
+            try:
+                await collection.insert_many(batch, ordered=False)
+            except BulkWriteError as e:
+                for error in e.details.get("writeErrors", []):
+                    index = error["index"]
+                    if error.get("code") == DUPLICATE_KEY_ERROR:
+                        batch_results[index] = {
+                            "status": "duplicate",
+                            "id": None,
+                            "error": "Duplicate message"
+                        }
+                    else:
+                        batch_results[index] = {
+                            "status": "failed",
+                            "id": None,
+                            "error": error.get("errmsg", "Write error")
+                        }
+            except Exception as e:
+                logger.error(f"Failed to insert chat message batch: {e}")
+                raise
+            
+            results.extend(batch_results)
+        
+        await ConversationRepository.record_messages([
+            document
+            for document, result in zip(documents, results)
+            if result["status"] == "inserted"
+        ])
+        
+        return results
+    
+    @staticmethod
+    async def _upsert_batch(
+        collection: AsyncIOMotorCollection,
+        batch: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Write a batch with one unordered bulk_write of insert-only upserts.
+        
+        Args:
+            collection: The chat_messages collection, with any write concern applied
+            batch: Insert-ready message documents
+        
+        Returns:
+            One result per document; already stored messages are "duplicate"
+        """
+        operations = [
+            UpdateOne(
+                {
+                    "conversation_id": document["conversation_id"],
+                    "message_id": document["message_id"]
+                },
+                {"$setOnInsert": document},
+                upsert=True
+            )
+            for document in batch
+        ]
+        batch_results = [
+            {"status": "duplicate", "id": None, "error": "Duplicate message"}
+            for _ in batch
+        ]
+        
+        try:
+            result = await collection.bulk_write(operations, ordered=False)
+            upserted_ids = result.upserted_ids
+        except BulkWriteError as e:
+            upserted_ids = {item["index"]: item["_id"] for item in e.details.get("upserted", [])}
+            for error in e.details.get("writeErrors", []):
+                # Concurrent upserts of the same message lose with a duplicate key
+                if error.get("code") != DUPLICATE_KEY_ERROR:
+                    batch_results[error["index"]] = {
+                        "status": "failed",
+                        "id": None,
+                        "error": error.get("errmsg", "Write error")
+                    }
+        except Exception as e:
+            logger.error(f"Failed to upsert chat message batch: {e}")
+            raise
+        
+        for index, inserted_id in upserted_ids.items():
+            batch_results[index] = {"status": "inserted", "id": inserted_id}
+        
+        return batch_results
+    
     @staticmethod
     async def get_conversation(
         conversation_id: str, 
@@ -46,99 +284,335 @@ class ChatRepository:
             conversation_id: The ID of the conversation
             skip: Number of messages to skip (for pagination)
             limit: Maximum number of messages to return
-            
+        
         Returns:
             List of chat messages
         """
+        page = await ChatRepository.get_conversation_page(conversation_id, limit=limit, skip=skip)
+        return page["messages"]
+    
+    @staticmethod
+    async def get_conversation_page(
+        conversation_id: str,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        skip: int = 0,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        user_type: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        raw: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Retrieve a page of a conversation in (timestamp, _id) order.
+        
+        With a cursor from a previous page the query seeks directly to that
+        position on the (conversation_id, timestamp, _id) index, so deep
+        pages cost the same as the first one. skip is still honoured when
+        no cursor is given.
+        
+        Raw pages hold the stored documents, limited to MESSAGE_FIELDS,
+        instead of ChatMessage models. Selecting fields implies a raw page.
+        Pages are served from the read cache when it is enabled.
+        
+        Args:
+            conversation_id: The ID of the conversation
+            limit: Maximum number of messages to return
+            cursor: Optional next_cursor or prev_cursor of a previous page
+            skip: Number of messages to skip when no cursor is given
+            start: Optional earliest message timestamp
+            end: Optional latest message timestamp
+            user_type: Optional author type ("customer" or "support_agent")
+            fields: Optional subset of MESSAGE_FIELDS to return
+            raw: Return documents instead of ChatMessage models
+        
+        Returns:
+            Dictionary with the messages, next_cursor and prev_cursor
+        
+        Raises:
+            ValueError: If the cursor is invalid or a field is unknown
+        """
+        position = None
+        direction = "next"
+        if cursor:
+            position, direction = KeysetPagination.decode_cursor(cursor, MESSAGE_SORT)
+        start, end = to_naive_utc(start), to_naive_utc(end)
+        
+        projection = None
+        if fields is not None or raw:
+            unknown = set(fields or []) - set(MESSAGE_FIELDS)
+            if unknown:
+                raise ValueError(
+                    f"Unknown fields: {', '.join(sorted(unknown))}. "
+                    f"Available fields: {', '.join(MESSAGE_FIELDS)}"
+                )
+            fields = [field for field in MESSAGE_FIELDS if not fields or field in fields]
+            # The sort key is always read, the cursors are built from it
+            projection = {field: 1 for field in set(fields) | {"timestamp", "_id"}}
+        
+        cache_key = ("page", limit, cursor, skip, start, end, user_type, tuple(fields) if projection else None)
+        if ReadCache.enabled():
+            hit, cached = ReadCache.get(conversation_id, cache_key)
+            if hit:
+                return cached
+            generation = ReadCache.generation(conversation_id)
+        
         try:
-            cursor = MongoDB.db.chat_messages.find(
-                {"conversation_id": conversation_id}
-            ).sort("timestamp", 1).skip(skip).limit(limit)
+            if settings.CHAT_STORAGE_LAYOUT == "bucket":
+                documents = await ChatBucketRepository.get_conversation_window(
+                    conversation_id, limit + 1, position, direction, skip,
+                    start=start, end=end, user_type=user_type
+                )
+            else:
+                query = ChatRepository._conversation_filter(
+                    conversation_id, start, end, user_type, position, direction
+                )
+                documents = await MongoDB.db.chat_messages.find(query, projection).sort(
+                    KeysetPagination.query_sort(MESSAGE_SORT, direction)
+                ).skip(0 if position else skip).limit(limit + 1).to_list(length=limit + 1)
             
-            messages = []
-            async for document in cursor:
-                messages.append(ChatMessage(**document))
+            page, next_cursor, prev_cursor = KeysetPagination.build_page(
+                documents, MESSAGE_SORT, limit, direction,
+                has_previous=position is not None or skip > 0
+            )
+            
+            if projection:
+                messages = [
+                    {field: document[field] for field in fields if field in document}
+                    for document in page
+                ]
+            else:
+                messages = [ChatMessage(**document) for document in page]
             
-            return messages
+            result = {
+                "messages": messages,
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor
+            }
+            if ReadCache.enabled():
+                ReadCache.put(conversation_id, cache_key, result, generation)
+            
+            return result
         except Exception as e:
             logger.error(f"Failed to retrieve conversation: {e}")
             raise
     
     @staticmethod
-    async def get_user_conversations(
+    def _conversation_filter(
+        conversation_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        user_type: Optional[str] = None,
+        position: Optional[List[Any]] = None,
+        direction: str = "next"
+    ) -> Dict[str, Any]:
+        """
+        Build the chat_messages filter for a conversation page.
+        
+        Every condition is an equality or range on the (conversation_id,
+        timestamp, _id) index, or on (conversation_id, user_type,
+        timestamp, _id) when user_type is given.
+        
+        Args:
+            conversation_id: The ID of the conversation
+            start: Optional earliest message timestamp
+            end: Optional latest message timestamp
+            user_type: Optional author type
+            position: Optional (timestamp, _id) cursor position
+            direction: "next" or "prev", relative to position
+        
+        Returns:
+            The MongoDB filter
+        """
+        query: Dict[str, Any] = {"conversation_id": conversation_id}
+        if start or end:
+            query["timestamp"] = {}
+            if start:
+                query["timestamp"]["$gte"] = start
+            if end:
+                query["timestamp"]["$lte"] = end
+        if user_type:
+            query["user_type"] = user_type
+        if position:
+            query = {"$and": [query, KeysetPagination.seek_filter(MESSAGE_SORT, position, direction)]}
+        
+        return query
+    
+    @staticmethod
+    async def search_messages(
         user_id: str,
-        page: int = 1,
-        limit: int = 10
+        query: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: int = 20,
+        cursor: Optional[str] = None
     ) -> Dict[str, Any]:
         """
-        Get paginated list of conversations for a user.
+        Full-text search over one user's messages, most relevant first.
+        
+        Uses the compound (user_id, message_content text, timestamp) index,
+        so only the user's messages are scanned. Results are ordered by
+        text score, then _id, and paged with cursors. The index exists only
+        with CHAT_STORAGE_LAYOUT set to "document"; callers check the layout.
         
         Args:
-            user_id: The ID of the user
-            page: Page number (starting from 1)
-            limit: Number of conversations per page
+            user_id: The ID of the user whose messages are searched
+            query: Search terms; quoted phrases and -negations are supported
+            start: Optional earliest message timestamp
+            end: Optional latest message timestamp
+            limit: Maximum number of results to return
+            cursor: Optional next_cursor or prev_cursor of a previous page
             
         Returns:
-            Dictionary with conversations and pagination info
+            Dictionary with the results (message and score) and cursors
+            
+        Raises:
+            ValueError: If the cursor is invalid
         """
+        position = None
+        direction = "next"
+        if cursor:
+            position, direction = KeysetPagination.decode_cursor(cursor, SEARCH_SORT)
+        
+        match: Dict[str, Any] = {"user_id": user_id, "$text": {"$search": query}}
+        if start or end:
+            match["timestamp"] = {}
+            if start:
+                match["timestamp"]["$gte"] = start
+            if end:
+                match["timestamp"]["$lte"] = end
+        
+        pipeline = [
+            {"$match": match},
+            {"$addFields": {"score": {"$meta": "textScore"}}}
+        ]
+        if position:
+            pipeline.append({"$match": KeysetPagination.seek_filter(SEARCH_SORT, position, direction)})
+        pipeline += [
+            {"$sort": dict(KeysetPagination.query_sort(SEARCH_SORT, direction))},
+            {"$limit": limit + 1}
+        ]
+        
         try:
-            skip = (page - 1) * limit
-            
-            # Get distinct conversation IDs for this user
-            pipeline = [
-                {"$match": {"user_id": user_id}},
-                {"$group": {"_id": "$conversation_id"}},
-                {"$sort": {"_id": -1}},  # Sort by conversation_id desc
-                {"$skip": skip},
-                {"$limit": limit}
-            ]
-            
-            cursor = MongoDB.db.chat_messages.aggregate(pipeline)
-            
-            conversation_ids = []
-            async for doc in cursor:
-                conversation_ids.append(doc["_id"])
+            documents = await MongoDB.db.chat_messages.aggregate(pipeline).to_list(length=limit + 1)
             
-            # Get the total count
-            total = await MongoDB.db.chat_messages.distinct(
-                "conversation_id", {"user_id": user_id}
+            page, next_cursor, prev_cursor = KeysetPagination.build_page(
+                documents, SEARCH_SORT, limit, direction,
+                has_previous=position is not None
             )
-            total_count = len(total)
-            
-            # Get the most recent message from each conversation for preview
-            conversations = []
-            for conv_id in conversation_ids:
-                # Get the most recent message
-                latest_msg = await MongoDB.db.chat_messages.find_one(
-                    {"conversation_id": conv_id},
-                    sort=[("timestamp", -1)]
-                )
-                
-                if latest_msg:
-                    # Get the total messages in this conversation
-                    msg_count = await MongoDB.db.chat_messages.count_documents(
-                        {"conversation_id": conv_id}
-                    )
-                    
-                    conversations.append({
-                        "conversation_id": conv_id,
-                        "last_message": ChatMessage(**latest_msg),
-                        "message_count": msg_count
-                    })
             
             return {
-                "conversations": conversations,
-                "pagination": {
-                    "total": total_count,
-                    "page": page,
-                    "limit": limit,
-                    "pages": (total_count + limit - 1) // limit  # Ceiling division
-                }
+                "results": [
+                    {"message": ChatMessage(**document), "score": document["score"]}
+                    for document in page
+                ],
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor
             }
         except Exception as e:
-            logger.error(f"Failed to retrieve user conversations: {e}")
+            logger.error(f"Failed to search messages: {e}")
             raise
     
+    @staticmethod
+    async def get_user_conversations(
+        user_id: str,
+        page: int = 1,
+        limit: int = 10,
+        sort: Literal["conversation_id", "recent"] = "conversation_id",
+        cursor: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        user_type: Optional[str] = None,
+        raw: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Get paginated list of conversations for a user.
+        
+        Reads the conversations metadata collection, which is the same for
+        both storage layouts.
+        
+        Args:
+            user_id: The ID of the user
+            page: Page number (starting from 1), used when no cursor is given
+            limit: Number of conversations per page
+            sort: "conversation_id" (descending) or "recent" (latest activity first)
+            cursor: Optional next_cursor or prev_cursor of a previous page
+            start: Optional start of the activity range
+            end: Optional end of the activity range
+            user_type: Optional participant type the conversation must include
+            raw: Return the stored documents without model validation
+        
+        Returns:
+            Dictionary with conversations and pagination info
+        
+        Raises:
+            ValueError: If the cursor is invalid
+        """
+        return await ConversationRepository.get_user_conversations(
+            user_id, page, limit, sort, cursor, start, end, user_type, raw
+        )
+    
+    @staticmethod
+    async def iter_conversation(conversation_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Read a whole conversation in (timestamp, _id) order, one message at a time.
+        
+        Messages are read from a server-side cursor in batches of
+        EXPORT_BATCH_SIZE, so memory does not grow with the conversation.
+        
+        Args:
+            conversation_id: The ID of the conversation
+        
+        Yields:
+            Stored message documents limited to MESSAGE_FIELDS
+        """
+        if settings.CHAT_STORAGE_LAYOUT == "bucket":
+            async for document in ChatBucketRepository.iter_conversation(conversation_id):
+                yield document
+            return
+        
+        cursor = MongoDB.db.chat_messages.find(
+            {"conversation_id": conversation_id},
+            {field: 1 for field in MESSAGE_FIELDS}
+        ).sort(MESSAGE_SORT).batch_size(settings.EXPORT_BATCH_SIZE)
+        try:
+            async for document in cursor:
+                yield document
+        finally:
+            await cursor.close()
+    
+    @staticmethod
+    async def get_conversation_version(conversation_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Read a conversation's message count and last message timestamp.
+        
+        Args:
+            conversation_id: The ID of the conversation
+        
+        Returns:
+            The message_count and last_message_at, or None if unknown or stale
+        """
+        return await ConversationRepository.get_version(conversation_id)
+    
+    @staticmethod
+    async def count_messages(conversation_id: str) -> int:
+        """
+        Count a conversation's messages without its metadata.
+        
+        Slower than get_conversation_version; for conversations whose
+        metadata is missing, e.g. stored before it was maintained, or stale.
+        
+        Args:
+            conversation_id: The ID of the conversation
+        
+        Returns:
+            The number of stored messages
+        """
+        if settings.CHAT_STORAGE_LAYOUT == "bucket":
+            return await ChatBucketRepository.count_messages(conversation_id)
+        
+        return await MongoDB.db.chat_messages.count_documents({"conversation_id": conversation_id})
+    
     @staticmethod
     async def delete_conversation(conversation_id: str) -> bool:
         """
@@ -146,10 +620,13 @@ class ChatRepository:
         
         Args:
             conversation_id: The ID of the conversation to delete
-            
+        
         Returns:
             True if anything was deleted, False otherwise
         """
+        if settings.CHAT_STORAGE_LAYOUT == "bucket":
+            return await ChatBucketRepository.delete_conversation(conversation_id)
+        
         try:
             # Delete all messages in the conversation
             result_msgs = await MongoDB.db.chat_messages.delete_many(
@@ -161,6 +638,8 @@ class ChatRepository:
                 {"conversation_id": conversation_id}
             )
             
+            await ConversationRepository.delete_conversation(conversation_id)
+            
             deleted = result_msgs.deleted_count > 0 or result_summary.deleted_count > 0
             logger.info(f"Deleted conversation {conversation_id}: {deleted}")
             
@@ -0,0 +1,343 @@
+"""
+Repository for per-conversation metadata.
+"""
+import asyncio
+from typing import List, Optional, Dict, Any, Literal
+from datetime import datetime
+from pymongo import UpdateOne
+from db.mongodb import MongoDB
+from db.read_cache import ReadCache
+from db.models.chat import Conversation, ChatMessage
+from utils.pagination import KeysetPagination
+from config.logging import logger
+
+# History orderings; conversation_id makes every ordering unique for cursors
+CONVERSATION_SORTS = {
+    "conversation_id": [("conversation_id", -1)],
+    "recent": [("last_message_at", -1), ("conversation_id", -1)]
+}
+# Fields of a history entry, in response order
+HISTORY_FIELDS = [
+    "conversation_id", "last_message", "message_count",
+    "first_message_at", "last_message_at", "participants"
+]
+# Reads exactly the fields a history entry is built from
+HISTORY_PROJECTION = {
+    "_id": 0,
+    **{field: 1 for field in HISTORY_FIELDS if field != "last_message"},
+    **{
+        f"last_message.{field.alias or name}": 1
+        for name, field in ChatMessage.model_fields.items()
+    }
+}
+
+
+class ConversationRepository:
+    """
+    Maintains the conversations collection.
+    
+    Each document holds a conversation's message count, first and last
+    message timestamps, participants and last message. It is updated
+    whenever messages are written, so history views read it with indexed
+    range scans instead of aggregating chat_messages.
+    """
+    
+    @staticmethod
+    async def record_messages(documents: List[Dict[str, Any]]) -> None:
+        """
+        Fold newly stored messages into their conversations' metadata.
+        
+        Every message write ends here, so this is also where cached reads
+        of the conversations are invalidated. Only pass messages that were
+        actually inserted, not duplicates.
+        The message write has already succeeded at this point, so a failure
+        here is logged rather than raised. The conversations are marked
+        stale instead, so get_version stops vouching for them, until
+        rebuild_conversations.py recomputes the collection from the stored
+        messages.
+        
+        Args:
+            documents: Stored message documents
+        """
+        if not documents:
+            return
+        
+        by_conversation: Dict[str, List[Dict[str, Any]]] = {}
+        for document in documents:
+            by_conversation.setdefault(document["conversation_id"], []).append(document)
+        
+        now = datetime.utcnow()
+        try:
+            # Built inside the guard too: bad input must not fail a stored write
+            operations = []
+            for conversation_id, messages in by_conversation.items():
+                timestamps = [message["timestamp"] for message in messages]
+                latest = max(messages, key=lambda message: message["timestamp"])
+                
+                operations.append(UpdateOne(
+                    {"conversation_id": conversation_id},
+                    {
+                        "$inc": {"message_count": len(messages)},
+                        "$min": {"first_message_at": min(timestamps)},
+                        "$max": {"last_message_at": max(timestamps)},
+                        "$addToSet": {
+                            "participants": {"$each": sorted({message["user_id"] for message in messages})},
+                            "participant_types": {"$each": sorted({message["user_type"] for message in messages})}
+                        },
+                        "$set": {"updated_at": now}
+                    },
+                    upsert=True
+                ))
+                # Runs after the upsert above; replaces the preview only if it is older
+                operations.append(UpdateOne(
+                    {
+                        "conversation_id": conversation_id,
+                        "last_message.timestamp": {"$not": {"$gt": latest["timestamp"]}}
+                    },
+                    {"$set": {"last_message": latest}}
+                ))
+            
+            await MongoDB.db.conversations.bulk_write(operations, ordered=True)
+        except Exception as e:
+            logger.error(
+                f"Failed to update conversation metadata for "
+                f"{len(by_conversation)} conversations: {e}"
+            )
+            await ConversationRepository._mark_stale(list(by_conversation))
+        
+        await ReadCache.invalidate(by_conversation)
+    
+    @staticmethod
+    async def _mark_stale(conversation_ids: List[str]) -> None:
+        """
+        Flag conversations whose metadata may be missing stored messages.
+        
+        Args:
+            conversation_ids: The conversations whose update failed
+        """
+        try:
+            await MongoDB.db.conversations.update_many(
+                {"conversation_id": {"$in": conversation_ids}},
+                {"$set": {"stale": True, "updated_at": datetime.utcnow()}}
+            )
+        except Exception as e:
+            logger.error(
+                f"Failed to mark {len(conversation_ids)} conversations stale, run "
+                f"rebuild_conversations.py: {e}"
+            )
+    
+    @staticmethod
+    async def get_user_conversations(
+        user_id: str,
+        page: int = 1,
+        limit: int = 10,
+        sort: Literal["conversation_id", "recent"] = "conversation_id",
+        cursor: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        user_type: Optional[str] = None,
+        raw: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Get a page of the conversations a user has written in.
+        
+        A date range selects conversations with activity inside it, that
+        is, whose first message is not after end and whose last message is
+        not before start. Raw pages hold the projected documents instead
+        of entries built through the Conversation model.
+        
+        Args:
+            user_id: The ID of the user
+            page: Page number (starting from 1), used when no cursor is given
+            limit: Number of conversations per page
+            sort: "conversation_id" (descending) or "recent" (latest activity first)
+            cursor: Optional next_cursor or prev_cursor of a previous page
+            start: Optional start of the activity range
+            end: Optional end of the activity range
+            user_type: Optional participant type the conversation must include
+            raw: Return the stored documents without model validation
+        
+        Returns:
+            Dictionary with conversations and pagination info
+        
+        Raises:
+            ValueError: If the cursor is invalid
+        """
+        sort_spec = CONVERSATION_SORTS[sort]
+        position = None
+        direction = "next"
+        if cursor:
+            position, direction = KeysetPagination.decode_cursor(cursor, sort_spec)
+        
+        try:
+            skip = 0 if position else (page - 1) * limit
+            filters = ConversationRepository._history_filter(user_id, start, end, user_type)
+            query = filters
+            if position:
+                query = {"$and": [filters, KeysetPagination.seek_filter(sort_spec, position, direction)]}
+            
+            # Both are seeks on the (participants, <sort fields>) indexes,
+            # issued concurrently so a page costs one round trip of latency
+            documents, total_count = await asyncio.gather(
+                MongoDB.db.conversations.find(query, HISTORY_PROJECTION).sort(
+                    KeysetPagination.query_sort(sort_spec, direction)
+                ).skip(skip).limit(limit + 1).to_list(length=limit + 1),
+                MongoDB.db.conversations.count_documents(filters)
+            )
+            
+            documents, next_cursor, prev_cursor = KeysetPagination.build_page(
+                documents, sort_spec, limit, direction,
+                has_previous=position is not None or skip > 0
+            )
+            
+            conversations = []
+            for doc in documents:
+                if raw:
+                    conversations.append({field: doc.get(field) for field in HISTORY_FIELDS})
+                    continue
+                
+                conversation = Conversation(**doc)
+                conversations.append({
+                    "conversation_id": conversation.conversation_id,
+                    "last_message": conversation.last_message,
+                    "message_count": conversation.message_count,
+                    "first_message_at": conversation.first_message_at,
+                    "last_message_at": conversation.last_message_at,
+                    "participants": conversation.participants
+                })
+            
+            return {
+                "conversations": conversations,
+                "pagination": {
+                    "total": total_count,
+                    "page": page,
+                    "limit": limit,
+                    "pages": (total_count + limit - 1) // limit,  # Ceiling division
+                    "next_cursor": next_cursor,
+                    "prev_cursor": prev_cursor
+                }
+            }
+        except Exception as e:
+            logger.error(f"Failed to retrieve user conversations: {e}")
+            raise
+    
+    @staticmethod
+    def _history_filter(
+        user_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        user_type: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Build the conversations filter for a user's history.
+        
+        Args:
+            user_id: The ID of the user
+            start: Optional start of the activity range
+            end: Optional end of the activity range
+            user_type: Optional participant type the conversation must include
+        
+        Returns:
+            The MongoDB filter
+        """
+        query: Dict[str, Any] = {"participants": user_id}
+        if start:
+            query["last_message_at"] = {"$gte": start}
+        if end:
+            query["first_message_at"] = {"$lte": end}
+        if user_type:
+            query["participant_types"] = user_type
+        
+        return query
+    
+    @staticmethod
+    async def get_version(conversation_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Read what identifies the current state of a conversation's messages.
+        
+        Messages are only ever added, so the count and the latest timestamp
+        change with every write.
+        
+        Args:
+            conversation_id: The ID of the conversation
+        
+        Returns:
+            The message_count and last_message_at, or None if unknown or
+            marked stale by a failed update
+        """
+        version = await MongoDB.db.conversations.find_one(
+            {"conversation_id": conversation_id},
+            {"_id": 0, "message_count": 1, "last_message_at": 1, "stale": 1}
+        )
+        if not version or version.pop("stale", False):
+            return None
+        
+        return version
+    
+    @staticmethod
+    async def delete_conversation(conversation_id: str) -> bool:
+        """
+        Delete a conversation's metadata and its cached reads.
+        
+        Args:
+            conversation_id: The ID of the conversation
+        
+        Returns:
+            True if the metadata existed, False otherwise
+        """
+        result = await MongoDB.db.conversations.delete_one({"conversation_id": conversation_id})
+        await ReadCache.invalidate([conversation_id])
+        return result.deleted_count > 0
+    
+    @staticmethod
+    async def rebuild(layout: Literal["document", "bucket"]) -> int:
+        """
+        Recompute the whole collection from the stored messages.
+        
+        The result replaces the collection in one step ($out keeps its
+        indexes). Updates made by writes that run during the rebuild are
+        lost, so run it while ingestion is paused.
+        
+        Args:
+            layout: Storage layout the messages are read from
+        
+        Returns:
+            Number of conversations written
+        """
+        if layout == "bucket":
+            source = MongoDB.db.chat_buckets
+            pipeline = [
+                {"$unwind": "$messages"},
+                {"$replaceRoot": {"newRoot": "$messages"}}
+            ]
+        else:
+            source = MongoDB.db.chat_messages
+            pipeline = []
+        
+        pipeline += [
+            {"$sort": {"conversation_id": 1, "timestamp": -1}},
+            {"$group": {
+                "_id": "$conversation_id",
+                "message_count": {"$sum": 1},
+                "first_message_at": {"$min": "$timestamp"},
+                "last_message_at": {"$max": "$timestamp"},
+                "participants": {"$addToSet": "$user_id"},
+                "participant_types": {"$addToSet": "$user_type"},
+                "last_message": {"$first": "$$ROOT"}
+            }},
+            {"$project": {
+                "_id": 0,
+                "conversation_id": "$_id",
+                "message_count": 1,
+                "first_message_at": 1,
+                "last_message_at": 1,
+                "participants": 1,
+                "participant_types": 1,
+                "last_message": 1,
+                "updated_at": "$$NOW"
+            }},
+            {"$out": "conversations"}
+        ]
+        
+        await source.aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+        return await MongoDB.db.conversations.count_documents({})
@@ -0,0 +1,107 @@
+"""
+Repository for background import job operations.
+"""
+from typing import Optional, Dict, Any, List
+from datetime import datetime
+from bson import ObjectId
+from db.mongodb import MongoDB
+from db.models.import_job import ImportJob
+from config.logging import logger
+
+
+class ImportJobRepository:
+    """Repository for import job operations."""
+    
+    @staticmethod
+    async def create_job(job: ImportJob) -> ImportJob:
+        """
+        Store a new import job.
+        
+        Args:
+            job: The job to store
+        
+        Returns:
+            The stored job with ID
+        """
+        try:
+            result = await MongoDB.db.import_jobs.insert_one(
+                job.model_dump(by_alias=True)
+            )
+            job.id = result.inserted_id
+            return job
+        except Exception as e:
+            logger.error(f"Failed to create import job: {e}")
+            raise
+    
+    @staticmethod
+    async def get_job(job_id: str) -> Optional[ImportJob]:
+        """
+        Retrieve an import job.
+        
+        Args:
+            job_id: The ID of the job
+        
+        Returns:
+            The job if found, None otherwise
+        """
+        if not ObjectId.is_valid(job_id):
+            return None
+        
+        try:
+            result = await MongoDB.db.import_jobs.find_one({"_id": ObjectId(job_id)})
+            if result:
+                return ImportJob(**result)
+            return None
+        except Exception as e:
+            logger.error(f"Failed to retrieve import job: {e}")
+            raise
+    
+    @staticmethod
+    async def update_job(job_id: ObjectId, fields: Dict[str, Any]) -> None:
+        """
+        Update fields on an import job and refresh its updated_at time.
+        
+        Args:
+            job_id: The ID of the job
+            fields: The fields to set
+        """
+        try:
+            await MongoDB.db.import_jobs.update_one(
+                {"_id": job_id},
+                {"$set": {**fields, "updated_at": datetime.utcnow()}}
+            )
+        except Exception as e:
+            logger.error(f"Failed to update import job: {e}")
+            raise
+    
+    @staticmethod
+    async def claim_job(job_id: ObjectId, allowed_statuses: List[str], stale_before: datetime) -> bool:
+        """
+        Atomically move a job to "running" so only one runner works on it.
+        
+        A job that is still marked "running" but has not reported progress
+        since stale_before is treated as abandoned and can be claimed again.
+        
+        Args:
+            job_id: The ID of the job
+            allowed_statuses: Statuses the job may be claimed from
+            stale_before: Heartbeat cutoff for abandoned running jobs
+        
+        Returns:
+            True if the job was claimed, False otherwise
+        """
+        try:
+            result = await MongoDB.db.import_jobs.update_one(
+                {
+                    "_id": job_id,
+                    "$or": [
+                        {"status": {"$in": allowed_statuses}},
+                        {"status": "running", "updated_at": {"$lt": stale_before}}
+                    ]
+                },
+                {"$set": {"status": "running", "error": None, "updated_at": datetime.utcnow()}}
+            )
+            return result.modified_count > 0
+        except Exception as e:
+            logger.error(f"Failed to claim import job: {e}")
+            raise
@@ -0,0 +1,43 @@
+"""
+Repository for cached LLM results.
+"""
+from typing import Any, Dict, Optional
+from datetime import datetime, timedelta
+from db.mongodb import MongoDB
+from config.settings import settings
+
+
+class LLMResultRepository:
+    """Repository for LLM results stored by content hash."""
+    
+    @staticmethod
+    async def get_result(key: str) -> Optional[Dict[str, Any]]:
+        """
+        Retrieve a cached result that has not expired.
+        
+        The TTL index removes expired documents only periodically, so
+        the age is checked here as well.
+        
+        Args:
+            key: Content hash of the request
+        
+        Returns:
+            The cached result document if found, None otherwise
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.LLM_CACHE_TTL_SECONDS)
+        return await MongoDB.db.llm_results.find_one({"_id": key, "created_at": {"$gt": cutoff}})
+    
+    @staticmethod
+    async def save_result(key: str, result: Dict[str, Any]) -> None:
+        """
+        Store a result, replacing any previous one for the same request.
+        
+        Args:
+            key: Content hash of the request
+            result: The result document; created_at is set here
+        """
+        await MongoDB.db.llm_results.replace_one(
+            {"_id": key},
+            {**result, "created_at": datetime.utcnow()},
+            upsert=True
+        )
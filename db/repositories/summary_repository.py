@@ -4,6 +4,7 @@ Repository for conversation summary operations.
 from typing import Optional
 from datetime import datetime
 from db.mongodb import MongoDB
+from db.read_cache import ReadCache
 from db.models.chat import ConversationSummary
 from config.logging import logger
 
@@ -25,13 +26,15 @@ class SummaryRepository:
         try:
             summary.updated_at = datetime.utcnow()
             
-            # Use find_one_and_replace with upsert for atomic operation
+            # Use find_one_and_replace with upsert for atomic operation; _id is
+            # left out as it cannot change when an existing summary is replaced
             result = await MongoDB.db.conversation_summaries.find_one_and_replace(
                 {"conversation_id": summary.conversation_id},
-                summary.model_dump(by_alias=True),
+                summary.model_dump(by_alias=True, exclude={"id"}),
                 upsert=True,
                 return_document=True
             )
+            await ReadCache.invalidate([summary.conversation_id])
             
             return ConversationSummary(**result) if result else summary
         except Exception as e:
@@ -41,7 +44,7 @@ class SummaryRepository:
     @staticmethod
     async def get_summary(conversation_id: str) -> Optional[ConversationSummary]:
         """
-        Retrieve a conversation summary.
+        Retrieve a conversation summary, from the read cache if enabled.
         
         Args:
             conversation_id: The ID of the conversation
@@ -49,14 +52,40 @@ class SummaryRepository:
         Returns:
             The conversation summary if found, None otherwise
         """
+        if ReadCache.enabled():
+            hit, cached = ReadCache.get(conversation_id, "summary")
+            if hit:
+                return cached
+            generation = ReadCache.generation(conversation_id)
+        
         try:
             result = await MongoDB.db.conversation_summaries.find_one(
                 {"conversation_id": conversation_id}
             )
             
             if result:
-                return ConversationSummary(**result)
+                summary = ConversationSummary(**result)
+                if ReadCache.enabled():
+                    ReadCache.put(conversation_id, "summary", summary, generation)
+                return summary
             return None
         except Exception as e:
             logger.error(f"Failed to retrieve summary: {e}")
-            raise 
\ No newline at end of file
+            raise 
+    
+    @staticmethod
+    async def get_summary_version(conversation_id: str) -> Optional[datetime]:
+        """
+        Read when a conversation summary was last updated.
+        
+        Args:
+            conversation_id: The ID of the conversation
+            
+        Returns:
+            The summary's updated_at if it exists, None otherwise
+        """
+        result = await MongoDB.db.conversation_summaries.find_one(
+            {"conversation_id": conversation_id},
+            {"_id": 0, "updated_at": 1}
+        )
+        return result["updated_at"] if result else None
@@ -0,0 +1,135 @@
+"""
+Write-behind buffer that batches single-message inserts.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from pymongo.write_concern import WriteConcern
+from config.settings import settings
+from config.logging import logger
+
+FlushHandler = Callable[..., Awaitable[List[Dict[str, Any]]]]
+
+
+class MessageWriteBuffer:
+    """
+    Collects concurrent message inserts and writes them with one bulk call.
+    
+    A batch is flushed every WRITE_BUFFER_FLUSH_INTERVAL_MS milliseconds or
+    as soon as WRITE_BUFFER_MAX_BATCH documents are queued, whichever comes
+    first. Each caller waits until its own batch has been acknowledged.
+    """
+    
+    _pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+    _has_items: Optional[asyncio.Event] = None
+    _batch_full: Optional[asyncio.Event] = None
+    _flush_task: Optional[asyncio.Task] = None
+    _flush_handler: Optional[FlushHandler] = None
+    _stopping: bool = False
+    
+    @classmethod
+    async def start(cls, flush_handler: FlushHandler):
+        """
+        Start the background flush loop.
+        
+        Args:
+            flush_handler: Coroutine that writes a list of documents and
+                returns one result per document
+        """
+        cls._pending = []
+        cls._has_items = asyncio.Event()
+        cls._batch_full = asyncio.Event()
+        cls._flush_handler = flush_handler
+        cls._stopping = False
+        cls._flush_task = asyncio.create_task(cls._run())
+        logger.info(
+            f"Started message write buffer "
+            f"({settings.WRITE_BUFFER_FLUSH_INTERVAL_MS}ms / {settings.WRITE_BUFFER_MAX_BATCH} messages)"
+        )
+    
+    @classmethod
+    async def stop(cls):
+        """Stop accepting inserts and flush everything still queued."""
+        if not cls._flush_task:
+            return
+        
+        cls._stopping = True
+        cls._has_items.set()
+        cls._batch_full.set()
+        await cls._flush_task
+        cls._flush_task = None
+        logger.info("Drained message write buffer.")
+    
+    @classmethod
+    def is_running(cls) -> bool:
+        """Return True while the buffer accepts inserts."""
+        return cls._flush_task is not None and not cls._stopping
+    
+    @classmethod
+    async def submit(cls, document: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Queue a document and wait for the batch containing it to be written.
+        
+        Args:
+            document: Insert-ready message document
+        
+        Returns:
+            The write result for this document
+        """
+        future = asyncio.get_running_loop().create_future()
+        cls._pending.append((document, future))
+        cls._has_items.set()
+        if len(cls._pending) >= settings.WRITE_BUFFER_MAX_BATCH:
+            cls._batch_full.set()
+        
+        return await future
+    
+    @classmethod
+    async def _run(cls):
+        """Flush batches until stopped and fully drained."""
+        interval = settings.WRITE_BUFFER_FLUSH_INTERVAL_MS / 1000
+        
+        while True:
+            await cls._has_items.wait()
+            
+            # Give concurrent callers until the interval ends to join the batch
+            if not cls._stopping:
+                try:
+                    await asyncio.wait_for(cls._batch_full.wait(), timeout=interval)
+                except asyncio.TimeoutError:
+                    pass
+            
+            while cls._pending:
+                await cls._flush()
+                if not cls._stopping and len(cls._pending) < settings.WRITE_BUFFER_MAX_BATCH:
+                    break
+            
+            if not cls._pending:
+                cls._has_items.clear()
+            if len(cls._pending) < settings.WRITE_BUFFER_MAX_BATCH:
+                cls._batch_full.clear()
+            
+            if cls._stopping and not cls._pending:
+                return
+    
+    @classmethod
+    async def _flush(cls):
+        """Write up to one batch of queued documents and resolve their callers."""
+        batch = cls._pending[:settings.WRITE_BUFFER_MAX_BATCH]
+        del cls._pending[:len(batch)]
+        
+        documents = [document for document, _ in batch]
+        write_concern = settings.WRITE_BUFFER_WRITE_CONCERN
+        w = int(write_concern) if write_concern.isdigit() else write_concern
+        
+        try:
+            results = await cls._flush_handler(documents, write_concern=WriteConcern(w=w))
+        except Exception as e:
+            logger.error(f"Failed to flush message write buffer: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -10,7 +10,13 @@ import asyncio
 from api.routes import chat, user, summary
 from api.routes import import_data  # Import separately
 from api.middleware import LoggingMiddleware, RateLimitingMiddleware
+from api.responses import APIJSONResponse
 from db.mongodb import MongoDB
+from db.write_buffer import MessageWriteBuffer
+from db.read_cache import ReadCache
+from db.repositories.chat_repository import ChatRepository
+from services.llm.factory import LLMServiceFactory
+from services.llm.result_cache import LLMResultCache
 from config.settings import settings
 from config.logging import logger
 
@@ -21,11 +27,20 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting up application...")
     await MongoDB.connect_to_database()
+    if settings.WRITE_BUFFER_ENABLED:
+        await MessageWriteBuffer.start(ChatRepository.insert_documents)
+    if settings.READ_CACHE_ENABLED:
+        await ReadCache.start()
+    await LLMServiceFactory.start()
     
     yield
     
     # Shutdown
     logger.info("Shutting down application...")
+    # Drain buffered inserts before the client goes away
+    await MessageWriteBuffer.stop()
+    await ReadCache.stop()
+    await LLMServiceFactory.close()
     await MongoDB.close_database_connection()
 
 
@@ -37,6 +52,7 @@ app = FastAPI(
     docs_url="/docs",
     redoc_url="/redoc",
     lifespan=lifespan,
+    default_response_class=APIJSONResponse,
 )
 
 # Add CORS middleware
@@ -46,6 +62,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Prev-Cursor", "ETag"],
 )
 
 # Add custom middleware
@@ -90,5 +107,17 @@ async def health_check():
         )
 
 
+@app.get("/cache/stats", tags=["status"])
+async def cache_stats():
+    """Read cache counters."""
+    return {"enabled": ReadCache.enabled(), **ReadCache.stats()}
+
+
+@app.get("/llm/stats", tags=["status"])
+async def llm_stats():
+    """LLM service counters, including their HTTP connection pools and the result cache."""
+    return {**LLMServiceFactory.stats(), "result_cache": LLMResultCache.stats()}
+
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=settings.DEBUG)
\ No newline at end of file
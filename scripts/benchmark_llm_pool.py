@@ -0,0 +1,221 @@
+"""
+Benchmark the pooled LLM HTTP client against a session per call.
+
+Starts a local HTTPS server that answers like the Gemini API, then makes
+the same GeminiLLMService calls twice: once closing the pool after every
+call (a fresh TCP and TLS handshake each time, as before pooling) and once
+reusing the pool. No API key or network access is needed; the test
+certificate is generated with the cryptography package.
+
+Usage:
+    python scripts/benchmark_llm_pool.py [--calls N] [--concurrency N] [--delay-ms MS]
+"""
+import argparse
+import asyncio
+import datetime
+import ipaddress
+import os
+import ssl
+import statistics
+import sys
+import tempfile
+import time
+from typing import List
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from aiohttp import web
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+from db.models.chat import ChatMessage
+from services.llm.gemini import GeminiLLMService
+from services.llm.http_pool import HTTPClientPool
+
+STUB_RESPONSE = {"candidates": [{"content": {"parts": [{"text": "Stub summary."}]}}]}
+
+
+def create_certificate(directory: str) -> str:
+    """
+    Write a self-signed certificate and key for 127.0.0.1.
+    
+    Args:
+        directory: Where to write cert.pem and key.pem
+    
+    Returns:
+        Path of the certificate; the key is next to it
+    """
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=5))
+        .not_valid_after(now + datetime.timedelta(hours=1))
+        .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    
+    cert_path = os.path.join(directory, "cert.pem")
+    with open(cert_path, "wb") as f:
+        f.write(certificate.public_bytes(serialization.Encoding.PEM))
+    with open(os.path.join(directory, "key.pem"), "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        ))
+    
+    return cert_path
+
+
+async def start_stub_server(cert_path: str, delay_ms: int) -> web.AppRunner:
+    """
+    Start the stub Gemini endpoint on an ephemeral port.
+    
+    Args:
+        cert_path: Certificate to serve, with key.pem next to it
+        delay_ms: Simulated model latency per call
+    
+    Returns:
+        The running server
+    """
+    async def generate(request: web.Request) -> web.Response:
+        """Answer any generateContent call with a fixed summary."""
+        await request.read()
+        if delay_ms:
+            await asyncio.sleep(delay_ms / 1000)
+        return web.json_response(STUB_RESPONSE)
+    
+    app = web.Application()
+    app.router.add_post("/v1beta/models/gemini-pro:generateContent", generate)
+    
+    server_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    server_context.load_cert_chain(cert_path, os.path.join(os.path.dirname(cert_path), "key.pem"))
+    
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0, ssl_context=server_context).start()
+    return runner
+
+
+async def run_calls(
+    service: GeminiLLMService,
+    messages: List[ChatMessage],
+    calls: int,
+    concurrency: int,
+    reuse: bool
+) -> List[float]:
+    """
+    Make summary calls and time each one.
+    
+    Args:
+        service: Service pointed at the stub server
+        messages: Conversation to summarize
+        calls: Number of calls
+        concurrency: Calls in flight at once
+        reuse: Keep the pool open between calls
+    
+    Returns:
+        Latency of each call in milliseconds
+    """
+    latencies: List[float] = []
+    
+    for start in range(0, calls, concurrency):
+        if not reuse:
+            # What every call paid before pooling: a new session and connection
+            await service.http_pool.close()
+        
+        async def timed_call() -> None:
+            """Make one call and record its latency."""
+            started = time.perf_counter()
+            await service.generate_summary(messages)
+            latencies.append((time.perf_counter() - started) * 1000)
+        
+        await asyncio.gather(*(timed_call() for _ in range(min(concurrency, calls - start))))
+    
+    return latencies
+
+
+def report(label: str, latencies: List[float]) -> None:
+    """Print latency statistics for one mode."""
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(
+        f"{label}: mean {statistics.mean(ordered):.2f}ms, "
+        f"p50 {statistics.median(ordered):.2f}ms, p95 {p95:.2f}ms, "
+        f"total {sum(ordered):.0f}ms"
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    """Run both modes against the stub server and print the comparison."""
+    with tempfile.TemporaryDirectory() as directory:
+        cert_path = create_certificate(directory)
+        runner = await start_stub_server(cert_path, args.delay_ms)
+        port = runner.addresses[0][1]
+        
+        client_context = ssl.create_default_context(cafile=cert_path)
+        service = GeminiLLMService(http_pool=HTTPClientPool("benchmark", client_context))
+        service.api_key = "benchmark"
+        service.api_url = f"https://127.0.0.1:{port}/v1beta/models/gemini-pro:generateContent"
+        
+        messages = [
+            ChatMessage(
+                conversation_id="benchmark",
+                message_id=f"m{i}",
+                message_content="Hello, I need help with my order.",
+                user_id="customer" if i % 2 == 0 else "agent",
+                user_type="customer" if i % 2 == 0 else "support_agent"
+            )
+            for i in range(10)
+        ]
+        
+        try:
+            # Warm up imports, the event loop and the server
+            await run_calls(service, messages, 2, 1, reuse=False)
+            
+            per_call = await run_calls(service, messages, args.calls, args.concurrency, reuse=False)
+            await service.http_pool.close()
+            # A fresh pool so its counters cover the pooled run only
+            service.http_pool = HTTPClientPool("benchmark", client_context)
+            pooled = await run_calls(service, messages, args.calls, args.concurrency, reuse=True)
+            stats = service.http_pool.stats()
+        finally:
+            await service.http_pool.close()
+            await runner.cleanup()
+    
+    print(f"Benchmark: {args.calls} calls, concurrency {args.concurrency}, server delay {args.delay_ms}ms")
+    report("- Session per call", per_call)
+    report("- Pooled session", pooled)
+    saved = statistics.mean(per_call) - statistics.mean(pooled)
+    print(f"- Saved per call: {saved:.2f}ms ({saved / statistics.mean(per_call) * 100:.0f}%)")
+    print(
+        f"- Pooled connections: {stats['connections_created']} created, "
+        f"{stats['connections_reused']} reused for {stats['requests']} requests"
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark pooled LLM HTTP connections.")
+    parser.add_argument("--calls", type=int, default=200, help="Calls per mode (default: 200)")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Calls in flight at once; 7 matches the generate_full_insights fallback (default: 1)"
+    )
+    parser.add_argument("--delay-ms", type=int, default=0, help="Simulated model latency (default: 0)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
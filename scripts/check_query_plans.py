@@ -0,0 +1,160 @@
+"""
+Script to check that the filtered read queries are served by indexes.
+
+Runs explain() on the conversation page and history queries, built by the
+same repository helpers the API uses, and reports the winning plan of
+each, with the index every IXSCAN uses. Exits with status 1 if any plan
+scans the whole collection or sorts in memory, so it can run in CI against
+a database with the indexes created.
+
+History date ranges are answered from the conversations collection by the
+(participants, ...) indexes, not from chat_messages, which is why there is
+no (user_id, timestamp) index on chat_messages.
+
+Usage:
+    python scripts/check_query_plans.py [--conversation-id ID] [--user-id ID]
+"""
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bson import ObjectId
+from db.mongodb import MongoDB
+from db.repositories.chat_repository import ChatRepository, MESSAGE_SORT
+from db.repositories.conversation_repository import ConversationRepository, CONVERSATION_SORTS
+from utils.pagination import KeysetPagination
+from config.logging import logger
+
+# Stages that mean the query is not (fully) answered by an index
+REJECTED_STAGES = {"COLLSCAN", "SORT"}
+
+
+def plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """
+    List the stages of a query plan, outermost first.
+    
+    Args:
+        plan: A winningPlan document from explain()
+    
+    Returns:
+        Stage names, including those of nested and OR-ed input stages;
+        index scans name their index
+    """
+    stage = plan.get("stage", "")
+    stages = [f"{stage}({plan['indexName']})" if "indexName" in plan else stage]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages.extend(plan_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(plan_stages(child))
+    
+    return stages
+
+
+def build_queries(conversation_id: str, user_id: str) -> List[Dict[str, Any]]:
+    """
+    Build the queries to check.
+    
+    Args:
+        conversation_id: Conversation the message queries read
+        user_id: User the history queries read
+    
+    Returns:
+        Named (collection, filter, sort) combinations
+    """
+    end = datetime.utcnow()
+    start = end - timedelta(days=30)
+    position = [start, ObjectId()]
+    queries = []
+    
+    message_filters = {
+        "conversation page": ChatRepository._conversation_filter(conversation_id),
+        "conversation page by date": ChatRepository._conversation_filter(conversation_id, start, end),
+        "conversation page by user_type": ChatRepository._conversation_filter(
+            conversation_id, user_type="customer"
+        ),
+        "conversation page by date and user_type": ChatRepository._conversation_filter(
+            conversation_id, start, end, "support_agent"
+        ),
+        "conversation page by date after cursor": ChatRepository._conversation_filter(
+            conversation_id, start, end, position=position, direction="next"
+        )
+    }
+    for name, query in message_filters.items():
+        queries.append({"name": name, "collection": "chat_messages", "filter": query, "sort": MESSAGE_SORT})
+    
+    for sort in ("conversation_id", "recent"):
+        history_filters = {
+            f"history by {sort}": ConversationRepository._history_filter(user_id),
+            f"history by {sort} and date": ConversationRepository._history_filter(user_id, start, end),
+            f"history by {sort} and user_type": ConversationRepository._history_filter(
+                user_id, user_type="support_agent"
+            )
+        }
+        for name, query in history_filters.items():
+            queries.append({
+                "name": name,
+                "collection": "conversations",
+                "filter": query,
+                "sort": KeysetPagination.query_sort(CONVERSATION_SORTS[sort], "next")
+            })
+    
+    return queries
+
+
+async def main(args: argparse.Namespace) -> int:
+    """Explain every query and report the ones not served by an index."""
+    # Connect to database
+    logger.info("Connecting to MongoDB...")
+    await MongoDB.connect_to_database()
+    
+    queries = build_queries(args.conversation_id, args.user_id)
+    failures = 0
+    try:
+        for query in queries:
+            collection = MongoDB.db[query["collection"]]
+            explanation = await collection.find(query["filter"]).sort(query["sort"]).limit(51).explain()
+            stages = plan_stages(explanation["queryPlanner"]["winningPlan"])
+            rejected = REJECTED_STAGES.intersection(stage.split("(")[0] for stage in stages)
+            
+            status = "FAIL" if rejected else "ok"
+            print(f"[{status}] {query['name']}: {' <- '.join(stages)}")
+            if rejected:
+                failures += 1
+        
+        print(f"Checked {len(queries)} queries, {failures} failed")
+    except Exception as e:
+        logger.error(f"Error checking query plans: {e}")
+        print(f"Error checking query plans: {e}")
+        failures += 1
+    
+    # Close database connection
+    await MongoDB.close_database_connection()
+    
+    return 1 if failures else 0
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Check that filtered read queries use indexes.")
+    parser.add_argument(
+        "--conversation-id",
+        default="conv_plan_check",
+        help="Conversation ID to use in the message queries"
+    )
+    parser.add_argument(
+        "--user-id",
+        default="user_plan_check",
+        help="User ID to use in the history queries"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -1,9 +1,25 @@
 """
-Script to import cleaned_data.csv into the database.
+Script to import chat data files into the database.
+
+Files are parsed in parallel worker processes and the parsed batches are
+written by a pool of concurrent async writers sharing one MongoDB client.
+
+Usage:
+    python scripts/import_cleaned_data.py [PATH ...] [--workers N] [--writers N]
+
+Each PATH may be a file, a directory (all .csv, .ndjson and .jsonl files in
+it are imported) or a glob pattern. Defaults to cleaned_data.csv.
 """
+import argparse
 import asyncio
-import sys
+import glob
+import multiprocessing
 import os
+import queue
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
 
 # Add parent directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -13,35 +29,187 @@ from db.mongodb import MongoDB
 from config.settings import settings
 from config.logging import logger
 
+SUPPORTED_EXTENSIONS = (".csv", ".ndjson", ".jsonl")
+
+
+def resolve_paths(patterns: List[str]) -> List[str]:
+    """
+    Expand files, directories and glob patterns into a sorted file list.
+    
+    Args:
+        patterns: Paths given on the command line
+    
+    Returns:
+        Supported data files, without duplicates
+    """
+    files = set()
+    
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            candidates = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            candidates = glob.glob(pattern) or [pattern]
+        
+        for candidate in candidates:
+            if os.path.isfile(candidate) and candidate.endswith(SUPPORTED_EXTENSIONS):
+                files.add(os.path.abspath(candidate))
+            elif not os.path.isdir(pattern):
+                logger.error(f"File not found or unsupported: {candidate}")
+                print(f"File not found or unsupported: {candidate}")
+    
+    return sorted(files)
+
+
+def parse_file(file_path: str, batch_size: int, batches) -> None:
+    """
+    Parse one file in a worker process and hand its batches to the writers.
+    
+    Always finishes with a ("done", ...) message, so the parent knows the
+    file is finished even if parsing fails.
+    
+    Args:
+        file_path: The file to parse
+        batch_size: Rows per batch
+        batches: Bounded multiprocessing queue shared with the parent
+    """
+    error = None
+    try:
+        for documents, row_indexes, failed in CSVImporter.iter_file_batches(file_path, batch_size):
+            batches.put(("batch", file_path, documents, row_indexes, failed))
+    except Exception as e:
+        error = str(e)
+    finally:
+        batches.put(("done", file_path, error))
+
 
-async def import_cleaned_data():
-    """Import the cleaned_data.csv file into the database."""
+async def import_files(files: List[str], workers: int, writers: int, batch_size: int) -> Dict[str, dict]:
+    """
+    Import files using a process pool for parsing and async writers for I/O.
+    
+    Args:
+        files: Files to import
+        workers: Number of parser processes
+        writers: Number of concurrent database writers
+        batch_size: Rows per batch
+    
+    Returns:
+        Import statistics per file
+    """
+    loop = asyncio.get_running_loop()
+    stats = {file_path: CSVImporter.new_stats() for file_path in files}
+    errors: Dict[str, str] = {}
+    
+    # Bounded queues keep parsed-but-unwritten data to a few batches
+    manager = multiprocessing.Manager()
+    parsed = manager.Queue(maxsize=writers * 2)
+    pending: asyncio.Queue = asyncio.Queue(maxsize=writers * 2)
+    parsing = []
+    
+    async def forward_batches() -> None:
+        """Move parsed batches from the worker processes to the writers."""
+        remaining = len(files)
+        while remaining:
+            try:
+                message = await loop.run_in_executor(None, parsed.get, True, 1.0)
+            except queue.Empty:
+                # A crashed worker never sends "done"; stop instead of waiting forever
+                if all(future.done() for future in parsing) and parsed.empty():
+                    raise RuntimeError("Parser processes exited before finishing")
+                continue
+            
+            if message[0] == "done":
+                remaining -= 1
+                if message[2]:
+                    errors[message[1]] = message[2]
+                continue
+            await pending.put(message[1:])
+        
+        for _ in range(writers):
+            await pending.put(None)
+    
+    async def write_batches() -> None:
+        """Write batches until the forwarder signals the end."""
+        while True:
+            item = await pending.get()
+            if item is None:
+                return
+            
+            file_path, documents, row_indexes, failed = item
+            file_stats = stats[file_path]
+            file_stats["processed"] += len(documents) + failed
+            file_stats["failed"] += failed
+            await CSVImporter.write_documents(documents, row_indexes, file_stats)
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        try:
+            parsing.extend(
+                pool.submit(parse_file, file_path, batch_size, parsed)
+                for file_path in files
+            )
+            
+            await asyncio.gather(
+                forward_batches(),
+                *(write_batches() for _ in range(writers))
+            )
+        finally:
+            # Unblocks workers waiting on a full queue if the writers stopped early
+            manager.shutdown()
+    
+    results = {}
+    for file_path in files:
+        results[file_path] = CSVImporter.finish_stats(stats[file_path])
+        if file_path in errors:
+            results[file_path]["error"] = errors[file_path]
+    
+    return results
+
+
+async def main(args: argparse.Namespace) -> None:
+    """Import the requested files into the database."""
+    files = resolve_paths(args.paths)
+    if not files:
+        print("No files to import")
+        return
+    
     # Connect to database
     logger.info("Connecting to MongoDB...")
     await MongoDB.connect_to_database()
     
-    # Path to CSV file
-    csv_path = "cleaned_data.csv"
-    
-    # Check if file exists
-    if not os.path.exists(csv_path):
-        logger.error(f"File not found: {csv_path}")
-        print(f"File not found: {csv_path}")
-        return
+    started = time.monotonic()
     
     # Import data
     try:
-        logger.info(f"Starting import of {csv_path}...")
-        stats = await CSVImporter.import_from_file(csv_path)
+        logger.info(
+            f"Starting import of {len(files)} files with {args.workers} parser "
+            f"processes and {args.writers} writers..."
+        )
+        results = await import_files(files, args.workers, args.writers, args.batch_size)
+        elapsed = time.monotonic() - started
         
         # Print results
-        print(f"Import completed:")
-        print(f"- Total rows: {stats['total_rows']}")
-        print(f"- Processed: {stats['processed']}")
-        print(f"- Successful: {stats['successful']}")
-        print(f"- Failed: {stats['failed']}")
-        print(f"- Conversations: {stats['conversation_count']}")
+        totals = {"processed": 0, "successful": 0, "failed": 0, "duplicates": 0, "conversation_count": 0}
+        for file_path, stats in results.items():
+            print(f"{file_path}:")
+            if "error" in stats:
+                print(f"- Error: {stats['error']}")
+            print(f"- Processed: {stats['processed']}")
+            print(f"- Successful: {stats['successful']}")
+            print(f"- Failed: {stats['failed']}")
+            print(f"- Already imported: {stats['duplicates']}")
+            print(f"- Conversations: {stats['conversation_count']}")
+            for key in totals:
+                totals[key] += stats[key]
         
+        print(f"Import completed:")
+        print(f"- Files: {len(results)}")
+        print(f"- Processed: {totals['processed']}")
+        print(f"- Successful: {totals['successful']}")
+        print(f"- Failed: {totals['failed']}")
+        print(f"- Already imported: {totals['duplicates']}")
+        # Conversations spread over several files are counted once per file
+        print(f"- Conversations: {totals['conversation_count']}")
+        print(f"- Elapsed: {elapsed:.1f}s ({totals['processed'] / elapsed if elapsed else 0:.0f} rows/sec)")
+    
     except Exception as e:
         logger.error(f"Error importing data: {e}")
         print(f"Error importing data: {e}")
@@ -50,5 +218,35 @@ async def import_cleaned_data():
     await MongoDB.close_database_connection()
 
 
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Import chat data files into MongoDB.")
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        default=["cleaned_data.csv"],
+        help="Files, directories or glob patterns of .csv/.ndjson/.jsonl files"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of parser processes (default: number of CPUs)"
+    )
+    parser.add_argument(
+        "--writers",
+        type=int,
+        default=4,
+        help="Number of concurrent database writers (default: 4)"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=settings.CSV_IMPORT_CHUNK_SIZE,
+        help="Rows per parsed batch"
+    )
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    asyncio.run(import_cleaned_data()) 
\ No newline at end of file
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,95 @@
+"""
+Script to copy chat messages from chat_messages into bucket documents.
+
+Run it before switching CHAT_STORAGE_LAYOUT to "bucket". Messages already
+in a bucket are skipped, so an interrupted migration can simply be rerun.
+
+Usage:
+    python scripts/migrate_to_buckets.py [--batch-size N]
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from db.mongodb import MongoDB
+from db.repositories.chat_bucket_repository import ChatBucketRepository
+from config.settings import settings
+from config.logging import logger
+
+
+async def migrate(batch_size: int) -> dict:
+    """
+    Append every stored message to its conversation's buckets.
+    
+    Messages are read in (conversation_id, timestamp) order so each bucket
+    covers a contiguous stretch of its conversation.
+    
+    Args:
+        batch_size: Messages per bucket write
+    
+    Returns:
+        Counts per write status
+    """
+    counts = {"inserted": 0, "duplicate": 0, "failed": 0}
+    batch = []
+    
+    async def write_batch() -> None:
+        for result in await ChatBucketRepository.insert_documents(batch, batch_size):
+            counts[result["status"]] += 1
+        batch.clear()
+        logger.info(f"Migrated {sum(counts.values())} messages")
+    
+    cursor = MongoDB.db.chat_messages.find({}).sort([("conversation_id", 1), ("timestamp", 1)])
+    async for document in cursor:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            await write_batch()
+    
+    if batch:
+        await write_batch()
+    
+    return counts
+
+
+async def main(args: argparse.Namespace) -> None:
+    """Migrate all messages to the bucket layout."""
+    # Connect to database
+    logger.info("Connecting to MongoDB...")
+    await MongoDB.connect_to_database()
+    
+    # Bucket indexes are only created automatically in bucket mode
+    settings.CHAT_STORAGE_LAYOUT = "bucket"
+    await MongoDB.create_indexes()
+    
+    try:
+        counts = await migrate(args.batch_size)
+        print(f"Migration completed:")
+        print(f"- Migrated: {counts['inserted']}")
+        print(f"- Already in buckets: {counts['duplicate']}")
+        print(f"- Failed: {counts['failed']}")
+    except Exception as e:
+        logger.error(f"Error migrating messages: {e}")
+        print(f"Error migrating messages: {e}")
+    
+    # Close database connection
+    await MongoDB.close_database_connection()
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Copy chat messages into bucket documents.")
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=settings.BULK_INSERT_BATCH_SIZE,
+        help="Messages per bucket write"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
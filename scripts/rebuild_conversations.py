@@ -0,0 +1,48 @@
+"""
+Script to rebuild the conversations metadata collection from stored messages.
+
+Run it once after upgrading, and whenever the metadata may have drifted
+from the messages (for example after a failed metadata update). Pause
+ingestion while it runs: the rebuilt collection replaces the old one.
+
+Usage:
+    python scripts/rebuild_conversations.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from db.mongodb import MongoDB
+from db.repositories.conversation_repository import ConversationRepository
+from config.settings import settings
+from config.logging import logger
+
+
+async def main() -> None:
+    """Rebuild conversation metadata for the configured storage layout."""
+    # Connect to database
+    logger.info("Connecting to MongoDB...")
+    await MongoDB.connect_to_database()
+    
+    started = time.monotonic()
+    
+    try:
+        logger.info(f"Rebuilding conversations from the {settings.CHAT_STORAGE_LAYOUT} layout...")
+        count = await ConversationRepository.rebuild(settings.CHAT_STORAGE_LAYOUT)
+        print(f"Rebuild completed:")
+        print(f"- Conversations: {count}")
+        print(f"- Elapsed: {time.monotonic() - started:.1f}s")
+    except Exception as e:
+        logger.error(f"Error rebuilding conversations: {e}")
+        print(f"Error rebuilding conversations: {e}")
+    
+    # Close database connection
+    await MongoDB.close_database_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
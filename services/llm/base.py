@@ -2,12 +2,37 @@
 Base class for LLM service integration.
 """
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from db.models.chat import ChatMessage, ConversationSummary
 
 
 class LLMService(ABC):
-    """Abstract base class for LLM services."""
+    """
+    Abstract base class for LLM services.
+    
+    Services are long-lived: the LLMServiceFactory registry creates one per
+    provider at startup and shares it between requests, so per-provider
+    state such as connection pools belongs on the instance.
+    """
+    
+    # Identify the results of a service in the LLM result cache
+    provider: str = ""
+    model: str = ""
+    
+    async def start(self) -> None:
+        """Acquire shared resources, e.g. open connection pools."""
+    
+    async def close(self) -> None:
+        """Release shared resources."""
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the service's counters.
+        
+        Returns:
+            Provider-specific statistics, empty by default
+        """
+        return {}
     
     @abstractmethod
     async def generate_summary(self, messages: List[ChatMessage]) -> str:
@@ -111,4 +136,26 @@ class LLMService(ABC):
         Returns:
             Dictionary with all insights
         """
+        pass
+    
+    @abstractmethod
+    async def update_insights(
+        self,
+        previous: Dict[str, Any],
+        messages: List[ChatMessage]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Update the insights of a conversation with messages added since.
+        
+        Only the new messages are sent, with the previous insights, so the
+        cost depends on the number of new messages alone.
+        
+        Args:
+            previous: Insights of the conversation up to the new messages
+            messages: The new chat messages
+            
+        Returns:
+            Dictionary with all insights of the whole conversation, or None
+            if the provider call failed
+        """
         pass 
\ No newline at end of file
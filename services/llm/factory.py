@@ -1,7 +1,7 @@
 """
-Factory for creating LLM service instances.
+Registry of the LLM service instances.
 """
-from typing import Optional
+from typing import Any, Dict, Optional
 from services.llm.base import LLMService
 from services.llm.mock_llm import MockLLMService
 from services.llm.grok import GrokLLMService
@@ -9,57 +9,108 @@ from services.llm.gemini import GeminiLLMService
 from config.settings import settings
 from config.logging import logger
 
+# Providers in priority order for requests that do not name one
+PROVIDER_PRIORITY = ("grok", "gemini")
+
 
 class LLMServiceFactory:
-    """Factory for creating appropriate LLM service instances."""
+    """
+    Registry of long-lived LLM service instances.
+    
+    One instance per available provider is created at startup and shared
+    by all requests, so connection pools and other per-provider state are
+    reused. Requests select an instance by provider name.
+    """
+    
+    _services: Dict[str, LLMService] = {}
+    _default: str = "mock"
     
     @staticmethod
-    def create_llm_service(provider: Optional[str] = None) -> LLMService:
+    def create_llm_service(provider: str) -> LLMService:
         """
-        Create and return an LLM service instance.
+        Create a new instance of one provider's service.
         
         Args:
-            provider: Optional provider name ('grok', 'gemini', or 'mock')
-                     If None, uses the best available provider
-                     
+            provider: Provider name ('grok', 'gemini', or 'mock')
+        
         Returns:
             LLM service instance
+        
+        Raises:
+            ValueError: If the provider is unknown
         """
-        # If provider is specified, use that
-        if provider:
-            if provider.lower() == "grok":
-                if settings.GROK_API_KEY:
-                    logger.info("Using Grok LLM service")
-                    return GrokLLMService()
-                else:
-                    logger.warning("Grok API key not available, falling back to mock")
-                    return MockLLMService()
-            
-            elif provider.lower() == "gemini":
-                if settings.GEMINI_API_KEY:
-                    logger.info("Using Gemini LLM service")
-                    return GeminiLLMService()
-                else:
-                    logger.warning("Gemini API key not available, falling back to mock")
-                    return MockLLMService()
-            
-            elif provider.lower() == "mock":
-                logger.info("Using Mock LLM service")
-                return MockLLMService()
-            
+        if provider == "grok":
+            return GrokLLMService()
+        if provider == "gemini":
+            return GeminiLLMService()
+        if provider == "mock":
+            return MockLLMService()
+        raise ValueError(f"Unknown LLM provider '{provider}'")
+    
+    @classmethod
+    def _register(cls) -> None:
+        """Create the instances of the providers that have an API key."""
+        api_keys = {"grok": settings.GROK_API_KEY, "gemini": settings.GEMINI_API_KEY}
+        services = {"mock": cls.create_llm_service("mock")}
+        for provider in PROVIDER_PRIORITY:
+            if api_keys[provider]:
+                services[provider] = cls.create_llm_service(provider)
             else:
-                logger.warning(f"Unknown provider '{provider}', using Mock LLM service")
-                return MockLLMService()
+                logger.warning(f"{provider.capitalize()} API key not available, requests for it will use mock")
         
-        # If no provider specified, try them in priority order
-        if settings.GROK_API_KEY:
-            logger.info("Using Grok LLM service")
-            return GrokLLMService()
+        cls._services = services
+        cls._default = next((provider for provider in PROVIDER_PRIORITY if provider in services), "mock")
+        logger.info(f"Registered LLM services: {', '.join(services)} (default: {cls._default})")
+    
+    @classmethod
+    async def start(cls) -> None:
+        """Create the service instances and open their resources."""
+        cls._register()
+        for service in cls._services.values():
+            await service.start()
+    
+    @classmethod
+    async def close(cls) -> None:
+        """Release the resources of all service instances."""
+        for service in cls._services.values():
+            await service.close()
+        cls._services = {}
+    
+    @classmethod
+    def get_llm_service(cls, provider: Optional[str] = None) -> LLMService:
+        """
+        Return the shared service instance for a provider.
         
-        elif settings.GEMINI_API_KEY:
-            logger.info("Using Gemini LLM service")
-            return GeminiLLMService()
+        Args:
+            provider: Optional provider name ('grok', 'gemini', or 'mock')
+                     If None, uses the best available provider
+        
+        Returns:
+            LLM service instance; the mock service if the provider is
+            unknown or has no API key
+        """
+        if not cls._services:
+            # Used outside the application lifespan, e.g. from a script
+            cls._register()
+        
+        if not provider:
+            return cls._services[cls._default]
         
-        else:
-            logger.warning("No API keys available, using Mock LLM service")
-            return MockLLMService() 
\ No newline at end of file
+        service = cls._services.get(provider.lower())
+        if service is None:
+            logger.debug(f"LLM provider '{provider}' not available, using mock")
+            return cls._services["mock"]
+        return service
+    
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        """
+        Return the counters of every registered service.
+        
+        Returns:
+            Statistics keyed by provider name, and the default provider
+        """
+        return {
+            "default": cls._default,
+            "services": {provider: service.stats() for provider, service in cls._services.items()}
+        }
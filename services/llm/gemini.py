@@ -2,9 +2,14 @@
 Gemini API integration for LLM services.
 """
 import json
-import aiohttp
 from typing import List, Dict, Any, Optional
 from services.llm.base import LLMService
+from services.llm.result_cache import cached_insights
+from services.llm.http_pool import HTTPClientPool, RequestLimiter
+from services.llm.structured_output import (
+    INSIGHT_FIELDS, default_insights, merge_updated_insights, parse_insights,
+    request_missing_insights, update_insights_prompt
+)
 from db.models.chat import ChatMessage
 from config.settings import settings
 from config.logging import logger
@@ -13,14 +18,41 @@ from config.logging import logger
 class GeminiLLMService(LLMService):
     """LLM service implementation using Google's Gemini API."""
     
-    def __init__(self):
-        """Initialize the Gemini LLM service."""
+    provider = "gemini"
+    model = "gemini-pro"
+    
+    def __init__(self, http_pool: Optional[HTTPClientPool] = None):
+        """
+        Initialize the Gemini LLM service.
+        
+        Args:
+            http_pool: Connection pool for API calls; defaults to a pool of its own
+        """
+        self.http_pool = http_pool or HTTPClientPool("gemini")
+        # Caps the calls in flight to the provider across all requests
+        self.limiter = RequestLimiter(settings.LLM_MAX_CONCURRENT_REQUESTS)
         self.api_key = settings.GEMINI_API_KEY
-        self.api_url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent"
+        self.api_url = f"https://generativelanguage.googleapis.com/v1beta/models/{self.model}:generateContent"
         
         if not self.api_key:
             logger.warning("No Gemini API key provided. LLM features will not work properly.")
     
+    async def start(self) -> None:
+        """Open the connection pool."""
+        await self.http_pool.start()
+    
+    async def close(self) -> None:
+        """Close the connection pool."""
+        await self.http_pool.close()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return connection pool and concurrency counters."""
+        return {
+            "http_pool": self.http_pool.stats(),
+            "max_concurrent_requests": settings.LLM_MAX_CONCURRENT_REQUESTS,
+            "requests_in_flight": self.limiter.in_flight
+        }
+    
     def _format_chat_history(self, messages: List[ChatMessage]) -> List[Dict[str, Any]]:
         """
         Format chat messages for Gemini API.
@@ -58,12 +90,13 @@ class GeminiLLMService(LLMService):
             logger.error("Cannot call Gemini API: No API key provided")
             return None
         
-        # Insert system prompt as first user message if provided
+        # Insert system prompt as first user message if provided; the caller's
+        # list is left alone as it may be shared by concurrent calls
         if system_prompt:
-            messages.insert(0, {
+            messages = [{
                 "role": "user",
                 "parts": [{"text": f"System: {system_prompt}\n\nUser: "}]
-            })
+            }, *messages]
         
         # Create the request payload
         payload = {
@@ -81,31 +114,32 @@ class GeminiLLMService(LLMService):
             url = f"{self.api_url}?key={self.api_key}"
             headers = {"Content-Type": "application/json"}
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    url, 
-                    headers=headers, 
-                    json=payload
-                ) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        logger.error(f"Gemini API error: {response.status}, {error_text}")
-                        return None
-                    
-                    result = await response.json()
-                    try:
-                        return result["candidates"][0]["content"]["parts"][0]["text"]
-                    except (KeyError, IndexError) as e:
-                        logger.error(f"Unexpected Gemini API response structure: {e}")
-                        return None
+            async with self.limiter, self.http_pool.session.post(
+                url, 
+                headers=headers, 
+                json=payload
+            ) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    logger.error(f"Gemini API error: {response.status}, {error_text}")
+                    return None
+                
+                result = await response.json()
+                try:
+                    return result["candidates"][0]["content"]["parts"][0]["text"]
+                except (KeyError, IndexError) as e:
+                    logger.error(f"Unexpected Gemini API response structure: {e}")
+                    return None
         
         except Exception as e:
             logger.error(f"Error calling Gemini API: {e}")
             return None
     
-    async def generate_summary(self, messages: List[ChatMessage]) -> str:
+    async def generate_summary(self, messages: List[ChatMessage],
+                               formatted_messages: Optional[List[Dict[str, Any]]] = None) -> str:
         """Generate a summary of a conversation."""
-        formatted_messages = self._format_chat_history(messages)
+        if formatted_messages is None:
+            formatted_messages = self._format_chat_history(messages)
         
         system_prompt = (
             "You are a helpful assistant that summarizes customer service conversations. "
@@ -120,9 +154,11 @@ class GeminiLLMService(LLMService):
         
         return response
     
-    async def extract_action_items(self, messages: List[ChatMessage]) -> List[str]:
+    async def extract_action_items(self, messages: List[ChatMessage],
+                                   formatted_messages: Optional[List[Dict[str, Any]]] = None) -> List[str]:
         """Extract action items from a conversation."""
-        formatted_messages = self._format_chat_history(messages)
+        if formatted_messages is None:
+            formatted_messages = self._format_chat_history(messages)
         
         system_prompt = (
             "Extract a list of action items from this customer service conversation. "
@@ -144,9 +180,11 @@ class GeminiLLMService(LLMService):
             # Remove empty lines and lines that seem to be headers
             return [line for line in lines if line and not line.endswith(':')]
     
-    async def extract_decisions(self, messages: List[ChatMessage]) -> List[str]:
+    async def extract_decisions(self, messages: List[ChatMessage],
+                                formatted_messages: Optional[List[Dict[str, Any]]] = None) -> List[str]:
         """Extract decisions from a conversation."""
-        formatted_messages = self._format_chat_history(messages)
+        if formatted_messages is None:
+            formatted_messages = self._format_chat_history(messages)
         
         system_prompt = (
             "Extract a list of decisions made during this customer service conversation. "
@@ -165,9 +203,11 @@ class GeminiLLMService(LLMService):
             lines = [line.strip() for line in response.split('\n')]
             return [line for line in lines if line and not line.endswith(':')]
     
-    async def extract_questions(self, messages: List[ChatMessage]) -> List[str]:
+    async def extract_questions(self, messages: List[ChatMessage],
+                                formatted_messages: Optional[List[Dict[str, Any]]] = None) -> List[str]:
         """Extract questions from a conversation."""
-        formatted_messages = self._format_chat_history(messages)
+        if formatted_messages is None:
+            formatted_messages = self._format_chat_history(messages)
         
         system_prompt = (
             "Extract a list of questions raised during this customer service conversation. "
@@ -186,9 +226,11 @@ class GeminiLLMService(LLMService):
             lines = [line.strip() for line in response.split('\n')]
             return [line for line in lines if line and line.endswith('?')]
     
-    async def analyze_sentiment(self, messages: List[ChatMessage]) -> str:
+    async def analyze_sentiment(self, messages: List[ChatMessage],
+                                formatted_messages: Optional[List[Dict[str, Any]]] = None) -> str:
         """Analyze the sentiment of a conversation."""
-        formatted_messages = self._format_chat_history(messages)
+        if formatted_messages is None:
+            formatted_messages = self._format_chat_history(messages)
         
         system_prompt = (
             "Analyze the overall sentiment of this customer service conversation. "
@@ -218,9 +260,11 @@ class GeminiLLMService(LLMService):
         else:
             return "neutral"
     
-    async def determine_outcome(self, messages: List[ChatMessage]) -> str:
+    async def determine_outcome(self, messages: List[ChatMessage],
+                                formatted_messages: Optional[List[Dict[str, Any]]] = None) -> str:
         """Determine the outcome of a conversation."""
-        formatted_messages = self._format_chat_history(messages)
+        if formatted_messages is None:
+            formatted_messages = self._format_chat_history(messages)
         
         system_prompt = (
             "Determine the outcome of this customer service conversation. "
@@ -254,9 +298,11 @@ class GeminiLLMService(LLMService):
         else:
             return "maybe"
     
-    async def extract_keywords(self, messages: List[ChatMessage]) -> List[str]:
+    async def extract_keywords(self, messages: List[ChatMessage],
+                               formatted_messages: Optional[List[Dict[str, Any]]] = None) -> List[str]:
         """Extract keywords from a conversation."""
-        formatted_messages = self._format_chat_history(messages)
+        if formatted_messages is None:
+            formatted_messages = self._format_chat_history(messages)
         
         system_prompt = (
             "Extract the 5-10 most important keywords or phrases from this customer service conversation. "
@@ -276,6 +322,7 @@ class GeminiLLMService(LLMService):
             keywords = [k.strip() for k in response.split(',')]
             return [k for k in keywords if k and len(k) > 1]
     
+    @cached_insights
     async def generate_full_insights(self, messages: List[ChatMessage]) -> Dict[str, Any]:
         """Generate all insights for a conversation in a single call."""
         formatted_messages = self._format_chat_history(messages)
@@ -296,47 +343,27 @@ class GeminiLLMService(LLMService):
         
         if not response:
             # Return default values if API call fails
-            return {
-                "summary": "Failed to generate summary.",
-                "action_items": [],
-                "decisions": [],
-                "questions": [],
-                "sentiment": "neutral",
-                "outcome": "maybe",
-                "keywords": []
-            }
+            return default_insights()
         
-        try:
-            # Try to parse the response as JSON
-            insights = json.loads(response)
-            
-            # Ensure all expected fields are present
-            default_insights = {
-                "summary": "Failed to generate summary.",
-                "action_items": [],
-                "decisions": [],
-                "questions": [],
-                "sentiment": "neutral",
-                "outcome": "maybe",
-                "keywords": []
-            }
-            
-            for key in default_insights:
-                if key not in insights:
-                    insights[key] = default_insights[key]
-            
-            return insights
+        insights = parse_insights(response)
+        missing = [field for field in INSIGHT_FIELDS if field not in insights]
+        if missing:
+            # Only request what the combined response did not provide
+            logger.warning(f"Gemini insights response lacked {', '.join(missing)}, requesting them separately")
+            insights.update(await request_missing_insights(self, missing, messages, formatted_messages))
         
-        except json.JSONDecodeError:
-            logger.error("Failed to parse Gemini API response as JSON")
-            
-            # If we can't parse JSON, fall back to individual API calls
-            return {
-                "summary": await self.generate_summary(messages),
-                "action_items": await self.extract_action_items(messages),
-                "decisions": await self.extract_decisions(messages),
-                "questions": await self.extract_questions(messages),
-                "sentiment": await self.analyze_sentiment(messages),
-                "outcome": await self.determine_outcome(messages),
-                "keywords": await self.extract_keywords(messages)
-            }
\ No newline at end of file
+        return insights
+    
+    async def update_insights(
+        self,
+        previous: Dict[str, Any],
+        messages: List[ChatMessage]
+    ) -> Optional[Dict[str, Any]]:
+        """Update the insights of a conversation with messages added since."""
+        formatted_messages = self._format_chat_history(messages)
+        response = await self._call_gemini_api(formatted_messages, update_insights_prompt(previous))
+        
+        if not response:
+            return None
+        
+        return merge_updated_insights(previous, response)
@@ -2,9 +2,14 @@
 Grok API integration for LLM services.
 """
 import json
-import aiohttp
 from typing import List, Dict, Any, Optional
 from services.llm.base import LLMService
+from services.llm.result_cache import cached_insights
+from services.llm.http_pool import HTTPClientPool, RequestLimiter
+from services.llm.structured_output import (
+    INSIGHT_FIELDS, default_insights, merge_updated_insights, parse_insights,
+    request_missing_insights, update_insights_prompt
+)
 from db.models.chat import ChatMessage
 from config.settings import settings
 from config.logging import logger
@@ -13,14 +18,41 @@ from config.logging import logger
 class GrokLLMService(LLMService):
     """LLM service implementation using Grok API."""
     
-    def __init__(self):
-        """Initialize the Grok LLM service."""
+    provider = "grok"
+    model = "grok-1"
+    
+    def __init__(self, http_pool: Optional[HTTPClientPool] = None):
+        """
+        Initialize the Grok LLM service.
+        
+        Args:
+            http_pool: Connection pool for API calls; defaults to a pool of its own
+        """
+        self.http_pool = http_pool or HTTPClientPool("grok")
+        # Caps the calls in flight to the provider across all requests
+        self.limiter = RequestLimiter(settings.LLM_MAX_CONCURRENT_REQUESTS)
         self.api_key = settings.GROK_API_KEY
         self.api_url = "https://api.grok.com/v1/chat/completions"  # This is a placeholder URL
         
         if not self.api_key:
             logger.warning("No Grok API key provided. LLM features will not work properly.")
     
+    async def start(self) -> None:
+        """Open the connection pool."""
+        await self.http_pool.start()
+    
+    async def close(self) -> None:
+        """Close the connection pool."""
+        await self.http_pool.close()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return connection pool and concurrency counters."""
+        return {
+            "http_pool": self.http_pool.stats(),
+            "max_concurrent_requests": settings.LLM_MAX_CONCURRENT_REQUESTS,
+            "requests_in_flight": self.limiter.in_flight
+        }
+    
     def _format_chat_history(self, messages: List[ChatMessage]) -> List[Dict[str, str]]:
         """
         Format chat messages for Grok API.
@@ -60,7 +92,7 @@ class GrokLLMService(LLMService):
         
         # Create the request payload
         payload = {
-            "model": "grok-1",
+            "model": self.model,
             "messages": [
                 {"role": "system", "content": system_prompt},
                 *messages
@@ -76,27 +108,28 @@ class GrokLLMService(LLMService):
                 "Authorization": f"Bearer {self.api_key}"
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.api_url, 
-                    headers=headers, 
-                    json=payload
-                ) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        logger.error(f"Grok API error: {response.status}, {error_text}")
-                        return None
-                    
-                    result = await response.json()
-                    return result.get("choices", [{}])[0].get("message", {}).get("content")
+            async with self.limiter, self.http_pool.session.post(
+                self.api_url, 
+                headers=headers, 
+                json=payload
+            ) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    logger.error(f"Grok API error: {response.status}, {error_text}")
+                    return None
+                
+                result = await response.json()
+                return result.get("choices", [{}])[0].get("message", {}).get("content")
         
         except Exception as e:
             logger.error(f"Error calling Grok API: {e}")
             return None
     
-    async def generate_summary(self, messages: List[ChatMessage]) -> str:
+    async def generate_summary(self, messages: List[ChatMessage],
+                               formatted_messages: Optional[List[Dict[str, Any]]] = None) -> str:
         """Generate a summary of a conversation."""
-        formatted_messages = self._format_chat_history(messages)
+        if formatted_messages is None:
+            formatted_messages = self._format_chat_history(messages)
         
         system_prompt = (
             "You are a helpful assistant that summarizes customer service conversations. "
@@ -111,9 +144,11 @@ class GrokLLMService(LLMService):
         
         return response
     
-    async def extract_action_items(self, messages: List[ChatMessage]) -> List[str]:
+    async def extract_action_items(self, messages: List[ChatMessage],
+                                   formatted_messages: Optional[List[Dict[str, Any]]] = None) -> List[str]:
         """Extract action items from a conversation."""
-        formatted_messages = self._format_chat_history(messages)
+        if formatted_messages is None:
+            formatted_messages = self._format_chat_history(messages)
         
         system_prompt = (
             "Extract a list of action items from this customer service conversation. "
@@ -135,9 +170,11 @@ class GrokLLMService(LLMService):
             # Remove empty lines and lines that seem to be headers
             return [line for line in lines if line and not line.endswith(':')]
     
-    async def extract_decisions(self, messages: List[ChatMessage]) -> List[str]:
+    async def extract_decisions(self, messages: List[ChatMessage],
+                                formatted_messages: Optional[List[Dict[str, Any]]] = None) -> List[str]:
         """Extract decisions from a conversation."""
-        formatted_messages = self._format_chat_history(messages)
+        if formatted_messages is None:
+            formatted_messages = self._format_chat_history(messages)
         
         system_prompt = (
             "Extract a list of decisions made during this customer service conversation. "
@@ -156,9 +193,11 @@ class GrokLLMService(LLMService):
             lines = [line.strip() for line in response.split('\n')]
             return [line for line in lines if line and not line.endswith(':')]
     
-    async def extract_questions(self, messages: List[ChatMessage]) -> List[str]:
+    async def extract_questions(self, messages: List[ChatMessage],
+                                formatted_messages: Optional[List[Dict[str, Any]]] = None) -> List[str]:
         """Extract questions from a conversation."""
-        formatted_messages = self._format_chat_history(messages)
+        if formatted_messages is None:
+            formatted_messages = self._format_chat_history(messages)
         
         system_prompt = (
             "Extract a list of questions raised during this customer service conversation. "
@@ -177,9 +216,11 @@ class GrokLLMService(LLMService):
             lines = [line.strip() for line in response.split('\n')]
             return [line for line in lines if line and line.endswith('?')]
     
-    async def analyze_sentiment(self, messages: List[ChatMessage]) -> str:
+    async def analyze_sentiment(self, messages: List[ChatMessage],
+                                formatted_messages: Optional[List[Dict[str, Any]]] = None) -> str:
         """Analyze the sentiment of a conversation."""
-        formatted_messages = self._format_chat_history(messages)
+        if formatted_messages is None:
+            formatted_messages = self._format_chat_history(messages)
         
         system_prompt = (
             "Analyze the overall sentiment of this customer service conversation. "
@@ -209,9 +250,11 @@ class GrokLLMService(LLMService):
         else:
             return "neutral"
     
-    async def determine_outcome(self, messages: List[ChatMessage]) -> str:
+    async def determine_outcome(self, messages: List[ChatMessage],
+                                formatted_messages: Optional[List[Dict[str, Any]]] = None) -> str:
         """Determine the outcome of a conversation."""
-        formatted_messages = self._format_chat_history(messages)
+        if formatted_messages is None:
+            formatted_messages = self._format_chat_history(messages)
         
         system_prompt = (
             "Determine the outcome of this customer service conversation. "
@@ -245,9 +288,11 @@ class GrokLLMService(LLMService):
         else:
             return "maybe"
     
-    async def extract_keywords(self, messages: List[ChatMessage]) -> List[str]:
+    async def extract_keywords(self, messages: List[ChatMessage],
+                               formatted_messages: Optional[List[Dict[str, Any]]] = None) -> List[str]:
         """Extract keywords from a conversation."""
-        formatted_messages = self._format_chat_history(messages)
+        if formatted_messages is None:
+            formatted_messages = self._format_chat_history(messages)
         
         system_prompt = (
             "Extract the 5-10 most important keywords or phrases from this customer service conversation. "
@@ -267,6 +312,7 @@ class GrokLLMService(LLMService):
             keywords = [k.strip() for k in response.split(',')]
             return [k for k in keywords if k and len(k) > 1]
     
+    @cached_insights
     async def generate_full_insights(self, messages: List[ChatMessage]) -> Dict[str, Any]:
         """Generate all insights for a conversation in a single call."""
         formatted_messages = self._format_chat_history(messages)
@@ -287,47 +333,27 @@ class GrokLLMService(LLMService):
         
         if not response:
             # Return default values if API call fails
-            return {
-                "summary": "Failed to generate summary.",
-                "action_items": [],
-                "decisions": [],
-                "questions": [],
-                "sentiment": "neutral",
-                "outcome": "maybe",
-                "keywords": []
-            }
+            return default_insights()
         
-        try:
-            # Try to parse the response as JSON
-            insights = json.loads(response)
-            
-            # Ensure all expected fields are present
-            default_insights = {
-                "summary": "Failed to generate summary.",
-                "action_items": [],
-                "decisions": [],
-                "questions": [],
-                "sentiment": "neutral",
-                "outcome": "maybe",
-                "keywords": []
-            }
-            
-            for key in default_insights:
-                if key not in insights:
-                    insights[key] = default_insights[key]
-            
-            return insights
+        insights = parse_insights(response)
+        missing = [field for field in INSIGHT_FIELDS if field not in insights]
+        if missing:
+            # Only request what the combined response did not provide
+            logger.warning(f"Grok insights response lacked {', '.join(missing)}, requesting them separately")
+            insights.update(await request_missing_insights(self, missing, messages, formatted_messages))
         
-        except json.JSONDecodeError:
-            logger.error("Failed to parse Grok API response as JSON")
-            
-            # If we can't parse JSON, fall back to individual API calls
-            return {
-                "summary": await self.generate_summary(messages),
-                "action_items": await self.extract_action_items(messages),
-                "decisions": await self.extract_decisions(messages),
-                "questions": await self.extract_questions(messages),
-                "sentiment": await self.analyze_sentiment(messages),
-                "outcome": await self.determine_outcome(messages),
-                "keywords": await self.extract_keywords(messages)
-            }
\ No newline at end of file
+        return insights
+    
+    async def update_insights(
+        self,
+        previous: Dict[str, Any],
+        messages: List[ChatMessage]
+    ) -> Optional[Dict[str, Any]]:
+        """Update the insights of a conversation with messages added since."""
+        formatted_messages = self._format_chat_history(messages)
+        response = await self._call_grok_api(formatted_messages, update_insights_prompt(previous))
+        
+        if not response:
+            return None
+        
+        return merge_updated_insights(previous, response)
@@ -0,0 +1,138 @@
+"""
+Long-lived HTTP connection pool for LLM provider APIs.
+"""
+import asyncio
+import ssl
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+import aiohttp
+from config.settings import settings
+from config.logging import logger
+
+
+class HTTPClientPool:
+    """
+    A shared aiohttp session with a tuned connection pool.
+    
+    Connections are kept alive between calls and DNS answers are cached,
+    so only the first call to a host pays for the TCP and TLS handshakes.
+    The session is created on first use and closed by close().
+    """
+    
+    def __init__(self, name: str, ssl_context: Optional[ssl.SSLContext] = None):
+        """
+        Initialize the pool.
+        
+        Args:
+            name: Name used in logs and statistics
+            ssl_context: Optional TLS context, e.g. one trusting a test certificate
+        """
+        self.name = name
+        self._ssl_context = ssl_context
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._stats = {
+            "requests": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+            "dns_cache_hits": 0,
+            "dns_cache_misses": 0
+        }
+    
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The shared session, created on first use."""
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+        return self._session
+    
+    async def start(self) -> None:
+        """Create the session up front instead of on the first call."""
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+    
+    def _create_session(self) -> aiohttp.ClientSession:
+        """Create the session, its connector and the tracing that feeds stats()."""
+        connector = aiohttp.TCPConnector(
+            limit=settings.LLM_HTTP_POOL_LIMIT,
+            limit_per_host=settings.LLM_HTTP_POOL_LIMIT_PER_HOST,
+            keepalive_timeout=settings.LLM_HTTP_KEEPALIVE_SECONDS,
+            ttl_dns_cache=settings.LLM_HTTP_DNS_CACHE_SECONDS,
+            use_dns_cache=True,
+            ssl=self._ssl_context if self._ssl_context is not None else True
+        )
+        
+        trace_config = aiohttp.TraceConfig()
+        counters = [
+            (trace_config.on_request_start, "requests"),
+            (trace_config.on_connection_create_end, "connections_created"),
+            (trace_config.on_connection_reuseconn, "connections_reused"),
+            (trace_config.on_dns_cache_hit, "dns_cache_hits"),
+            (trace_config.on_dns_cache_miss, "dns_cache_misses")
+        ]
+        for signal, counter in counters:
+            signal.append(self._counter(counter))
+        
+        logger.info(
+            f"Created {self.name} HTTP pool ({settings.LLM_HTTP_POOL_LIMIT} connections, "
+            f"{settings.LLM_HTTP_POOL_LIMIT_PER_HOST} per host)"
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=settings.LLM_HTTP_TIMEOUT_SECONDS),
+            trace_configs=[trace_config]
+        )
+    
+    def _counter(self, name: str):
+        """Build a trace callback incrementing one counter."""
+        async def increment(session: aiohttp.ClientSession, context: SimpleNamespace, params: Any) -> None:
+            self._stats[name] += 1
+        return increment
+    
+    async def close(self) -> None:
+        """Close the session and all pooled connections."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info(f"Closed {self.name} HTTP pool.")
+        self._session = None
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return pool counters.
+        
+        Returns:
+            Request, connection and DNS cache counts, whether the session
+            is open, and the connector's limits
+        """
+        return {
+            **self._stats,
+            "open": self._session is not None and not self._session.closed,
+            "limit": settings.LLM_HTTP_POOL_LIMIT,
+            "limit_per_host": settings.LLM_HTTP_POOL_LIMIT_PER_HOST
+        }
+
+
+class RequestLimiter:
+    """
+    Caps the calls in flight to a provider, counting them for stats().
+    
+    Use as an async context manager around each call.
+    """
+    
+    def __init__(self, limit: int):
+        """
+        Initialize the limiter.
+        
+        Args:
+            limit: Most calls allowed in flight at once
+        """
+        self._semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+    
+    async def __aenter__(self) -> "RequestLimiter":
+        await self._semaphore.acquire()
+        self.in_flight += 1
+        return self
+    
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
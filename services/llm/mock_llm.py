@@ -1,10 +1,10 @@
 """
 Mock LLM service for development and testing.
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import asyncio
-import random
 from services.llm.base import LLMService
+from services.llm.result_cache import cached_insights
 from db.models.chat import ChatMessage
 from config.logging import logger
 
@@ -12,6 +12,9 @@ from config.logging import logger
 class MockLLMService(LLMService):
     """Mock LLM service that returns predefined responses."""
     
+    provider = "mock"
+    model = "mock"
+    
     async def generate_summary(self, messages: List[ChatMessage]) -> str:
         """Generate a mock summary."""
         logger.info("Generating mock summary")
@@ -20,4 +23,67 @@ class MockLLMService(LLMService):
         
         return (
             "This is a mock summary of the conversation. "
-        ) 
\ No newline at end of file
+        )
+    
+    async def extract_action_items(self, messages: List[ChatMessage]) -> List[str]:
+        """Return mock action items."""
+        await asyncio.sleep(0.5)
+        return ["Follow up with the customer"]
+    
+    async def extract_decisions(self, messages: List[ChatMessage]) -> List[str]:
+        """Return mock decisions."""
+        await asyncio.sleep(0.5)
+        return []
+    
+    async def extract_questions(self, messages: List[ChatMessage]) -> List[str]:
+        """Return the messages that end with a question mark."""
+        await asyncio.sleep(0.5)
+        return [msg.message_content for msg in messages if msg.message_content.rstrip().endswith("?")]
+    
+    async def analyze_sentiment(self, messages: List[ChatMessage]) -> str:
+        """Return a mock sentiment."""
+        await asyncio.sleep(0.5)
+        return "neutral"
+    
+    async def determine_outcome(self, messages: List[ChatMessage]) -> str:
+        """Return a mock outcome."""
+        await asyncio.sleep(0.5)
+        return "maybe"
+    
+    async def extract_keywords(self, messages: List[ChatMessage]) -> List[str]:
+        """Return mock keywords."""
+        await asyncio.sleep(0.5)
+        return ["mock", "conversation"]
+    
+    @cached_insights
+    async def generate_full_insights(self, messages: List[ChatMessage]) -> Dict[str, Any]:
+        """Generate all mock insights with one simulated call."""
+        logger.info("Generating mock insights")
+        await asyncio.sleep(0.5)
+        
+        return {
+            "summary": "This is a mock summary of the conversation. ",
+            "action_items": ["Follow up with the customer"],
+            "decisions": [],
+            "questions": [msg.message_content for msg in messages if msg.message_content.rstrip().endswith("?")],
+            "sentiment": "neutral",
+            "outcome": "maybe",
+            "keywords": ["mock", "conversation"]
+        }
+    
+    async def update_insights(
+        self,
+        previous: Dict[str, Any],
+        messages: List[ChatMessage]
+    ) -> Optional[Dict[str, Any]]:
+        """Extend the previous mock insights with the new messages."""
+        logger.info("Updating mock insights")
+        await asyncio.sleep(0.5)
+        
+        return {
+            **previous,
+            "summary": f"{previous['summary']}Updated with {len(messages)} new messages. ",
+            "questions": previous["questions"] + [
+                msg.message_content for msg in messages if msg.message_content.rstrip().endswith("?")
+            ]
+        }
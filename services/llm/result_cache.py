@@ -0,0 +1,230 @@
+"""
+Content-addressed cache of LLM insights.
+"""
+import asyncio
+import copy
+import functools
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from db.models.chat import ChatMessage
+from db.repositories.llm_result_repository import LLMResultRepository
+from services.llm.structured_output import DEFAULT_INSIGHTS, INSIGHTS_PROMPT_VERSION
+from config.settings import settings
+from config.logging import logger
+
+# Rough characters per token of English text, for the savings estimate
+CHARS_PER_TOKEN = 4
+
+
+def insights_key(provider: str, model: str, messages: List[ChatMessage]) -> str:
+    """
+    Build the cache key of an insights request.
+    
+    Only what the LLM sees is hashed: the speaker type and text of each
+    message, in order, with whitespace normalized. Message IDs, user IDs
+    and timestamps are left out, so identical templated conversations
+    share an entry.
+    
+    Args:
+        provider: Provider name
+        model: Model name
+        messages: The conversation
+    
+    Returns:
+        Hex SHA-256 of the normalized request
+    """
+    payload = json.dumps(
+        {
+            "provider": provider,
+            "model": model,
+            "prompt_version": INSIGHTS_PROMPT_VERSION,
+            "messages": [[msg.user_type, " ".join(msg.message_content.split())] for msg in messages]
+        },
+        ensure_ascii=False,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResultCache:
+    """
+    Two-tier cache of generate_full_insights results.
+    
+    Results are kept in a bounded in-memory LRU and in the llm_results
+    collection, whose TTL index expires them after LLM_CACHE_TTL_SECONDS.
+    Concurrent requests for the same key share a single LLM call.
+    """
+    
+    _entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+    _pending: Dict[str, "asyncio.Task[Dict[str, Any]]"] = {}
+    _stats: Dict[str, float] = {
+        "memory_hits": 0,
+        "database_hits": 0,
+        "shared_calls": 0,
+        "misses": 0,
+        "llm_seconds_saved": 0.0,
+        "tokens_saved": 0
+    }
+    
+    @classmethod
+    def enabled(cls) -> bool:
+        """Return True if insights should go through the cache."""
+        return settings.LLM_CACHE_ENABLED
+    
+    @classmethod
+    async def get_or_generate(
+        cls,
+        key: str,
+        generate: Callable[[], Awaitable[Dict[str, Any]]],
+        messages: List[ChatMessage]
+    ) -> Dict[str, Any]:
+        """
+        Return the cached insights for a key, generating them on a miss.
+        
+        Args:
+            key: The request's insights_key()
+            generate: Produces the insights with the LLM
+            messages: The conversation, for the token estimate
+        
+        Returns:
+            The insights; a copy the caller may modify
+        """
+        entry = cls._get_memory(key)
+        if entry is not None:
+            cls._count_hit("memory_hits", entry)
+            return copy.deepcopy(entry["insights"])
+        
+        pending = cls._pending.get(key)
+        if pending is not None:
+            entry = await asyncio.shield(pending)
+            cls._count_hit("shared_calls", entry)
+            return copy.deepcopy(entry["insights"])
+        
+        task = asyncio.create_task(cls._load(key, generate, messages))
+        cls._pending[key] = task
+        task.add_done_callback(lambda _: cls._pending.pop(key, None))
+        entry = await asyncio.shield(task)
+        return copy.deepcopy(entry["insights"])
+    
+    @classmethod
+    async def _load(
+        cls,
+        key: str,
+        generate: Callable[[], Awaitable[Dict[str, Any]]],
+        messages: List[ChatMessage]
+    ) -> Dict[str, Any]:
+        """Read a result from the database, or generate and store it."""
+        try:
+            stored = await LLMResultRepository.get_result(key)
+        except Exception as e:
+            logger.error(f"Failed to read cached LLM result: {e}")
+            stored = None
+        
+        if stored is not None:
+            entry = {field: stored[field] for field in ("insights", "llm_seconds", "estimated_tokens")}
+            cls._put_memory(key, entry, age=(datetime.utcnow() - stored["created_at"]).total_seconds())
+            cls._count_hit("database_hits", entry)
+            return entry
+        
+        cls._stats["misses"] += 1
+        started = time.perf_counter()
+        insights = await generate()
+        entry = {
+            "insights": insights,
+            "llm_seconds": time.perf_counter() - started,
+            "estimated_tokens": (
+                sum(len(msg.message_content) for msg in messages)
+                + len(json.dumps(insights, ensure_ascii=False))
+            ) // CHARS_PER_TOKEN
+        }
+        
+        # A failed call returns the defaults; the next request should retry
+        if insights.get("summary") == DEFAULT_INSIGHTS["summary"]:
+            return entry
+        
+        cls._put_memory(key, entry)
+        try:
+            await LLMResultRepository.save_result(key, entry)
+        except Exception as e:
+            logger.error(f"Failed to store LLM result: {e}")
+        
+        return entry
+    
+    @classmethod
+    def _get_memory(cls, key: str) -> Optional[Dict[str, Any]]:
+        """Look up an unexpired entry in memory."""
+        item = cls._entries.get(key)
+        if item is None:
+            return None
+        
+        expires_at, entry = item
+        if expires_at < time.monotonic():
+            del cls._entries[key]
+            return None
+        
+        cls._entries.move_to_end(key)
+        return entry
+    
+    @classmethod
+    def _put_memory(cls, key: str, entry: Dict[str, Any], age: float = 0.0) -> None:
+        """Store an entry of the given age, evicting the least recently used beyond the limit."""
+        cls._entries[key] = (time.monotonic() + settings.LLM_CACHE_TTL_SECONDS - age, entry)
+        cls._entries.move_to_end(key)
+        while len(cls._entries) > settings.LLM_CACHE_MAX_ENTRIES:
+            cls._entries.popitem(last=False)
+    
+    @classmethod
+    def _count_hit(cls, counter: str, entry: Dict[str, Any]) -> None:
+        """Count a hit and the LLM work it saved."""
+        cls._stats[counter] += 1
+        cls._stats["llm_seconds_saved"] += entry["llm_seconds"]
+        cls._stats["tokens_saved"] += entry["estimated_tokens"]
+    
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        """
+        Return the cache counters.
+        
+        Returns:
+            Hits per tier, misses, the hit rate, and the estimated LLM
+            seconds and tokens the hits saved
+        """
+        hits = cls._stats["memory_hits"] + cls._stats["database_hits"] + cls._stats["shared_calls"]
+        lookups = hits + cls._stats["misses"]
+        return {
+            "enabled": cls.enabled(),
+            **cls._stats,
+            "llm_seconds_saved": round(cls._stats["llm_seconds_saved"], 3),
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": len(cls._entries),
+            "max_entries": settings.LLM_CACHE_MAX_ENTRIES
+        }
+
+
+def cached_insights(
+    generate_full_insights: Callable[[Any, List[ChatMessage]], Awaitable[Dict[str, Any]]]
+) -> Callable[[Any, List[ChatMessage]], Awaitable[Dict[str, Any]]]:
+    """
+    Serve a service's generate_full_insights through the LLMResultCache.
+    
+    Args:
+        generate_full_insights: The method to wrap
+    
+    Returns:
+        The wrapped method, keyed by the service's provider and model
+    """
+    @functools.wraps(generate_full_insights)
+    async def wrapper(self, messages: List[ChatMessage]) -> Dict[str, Any]:
+        if not LLMResultCache.enabled():
+            return await generate_full_insights(self, messages)
+        
+        key = insights_key(self.provider, self.model, messages)
+        return await LLMResultCache.get_or_generate(
+            key, lambda: generate_full_insights(self, messages), messages
+        )
+    
+    return wrapper
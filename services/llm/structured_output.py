@@ -0,0 +1,286 @@
+"""
+Parsing of the structured insights returned by the LLM services.
+"""
+import asyncio
+import copy
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional
+from pydantic import TypeAdapter, ValidationError
+from db.models.chat import ChatMessage, ConversationSummary
+from services.llm.base import LLMService
+from config.settings import settings
+from config.logging import logger
+
+# Insights returned by generate_full_insights, with the values used when one cannot be produced
+DEFAULT_INSIGHTS: Dict[str, Any] = {
+    "summary": "Failed to generate summary.",
+    "action_items": [],
+    "decisions": [],
+    "questions": [],
+    "sentiment": "neutral",
+    "outcome": "maybe",
+    "keywords": []
+}
+INSIGHT_FIELDS = tuple(DEFAULT_INSIGHTS)
+# Part of the LLM result cache key; bump when the insights prompts or their parsing change
+INSIGHTS_PROMPT_VERSION = 1
+
+# The LLMService method producing each insight on its own
+INSIGHT_EXTRACTORS = {
+    "summary": "generate_summary",
+    "action_items": "extract_action_items",
+    "decisions": "extract_decisions",
+    "questions": "extract_questions",
+    "sentiment": "analyze_sentiment",
+    "outcome": "determine_outcome",
+    "keywords": "extract_keywords"
+}
+
+# Validators for the insight fields, built from the ConversationSummary field types
+_FIELD_ADAPTERS = {
+    field: TypeAdapter(ConversationSummary.model_fields[field].annotation)
+    for field in INSIGHT_FIELDS
+}
+
+_FENCE_PATTERN = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL | re.IGNORECASE)
+_TRAILING_COMMA_PATTERN = re.compile(r",\s*([}\]])")
+# A trailing comma, or a key or array element cut off before its value or closing bracket
+_DANGLING_PATTERN = re.compile(r',?\s*(?:"(?:[^"\\]|\\.)*"\s*:?\s*)?$')
+
+
+def default_insights(fields: Iterable[str] = INSIGHT_FIELDS) -> Dict[str, Any]:
+    """
+    Return fresh default values for insight fields.
+    
+    Args:
+        fields: The fields to return
+    
+    Returns:
+        The default of each field; lists are new objects the caller may modify
+    """
+    return {field: copy.copy(DEFAULT_INSIGHTS[field]) for field in fields}
+
+
+def _scan(text: str) -> Dict[str, Any]:
+    """
+    Track JSON nesting through text.
+    
+    Args:
+        text: JSON text, possibly incomplete
+    
+    Returns:
+        The brackets still open, whether the text ends inside a string, and
+        the index where the first top-level value closes (None if it doesn't)
+    """
+    stack: List[str] = []
+    in_string = escaped = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+            if not stack:
+                return {"stack": stack, "in_string": False, "escaped": False, "end": index}
+    
+    return {"stack": stack, "in_string": in_string, "escaped": escaped, "end": None}
+
+
+def _loads_object(text: str) -> Optional[Dict[str, Any]]:
+    """Parse text as a JSON object, tolerating trailing commas."""
+    for candidate in (text, _TRAILING_COMMA_PATTERN.sub(r"\1", text)):
+        try:
+            value = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        return value if isinstance(value, dict) else None
+    
+    return None
+
+
+def _close_truncated(fragment: str) -> Optional[Dict[str, Any]]:
+    """
+    Parse a JSON object cut off before its end, e.g. by the output token limit.
+    
+    Open strings and brackets are closed. If the result still does not
+    parse, the last incomplete member is dropped and the rest retried.
+    
+    Args:
+        fragment: Text from the opening brace to the end of the response
+    
+    Returns:
+        The members that were complete, or None if none could be recovered
+    """
+    while fragment:
+        state = _scan(fragment)
+        if state["in_string"]:
+            # Drop a dangling escape so the added quote is not escaped
+            fragment = (fragment[:-1] if state["escaped"] else fragment) + '"'
+        
+        for candidate in (fragment, _DANGLING_PATTERN.sub("", fragment.rstrip(), count=1)):
+            closers = "".join(reversed(_scan(candidate)["stack"]))
+            value = _loads_object(candidate + closers)
+            if value is not None:
+                return value
+        
+        cut = fragment.rfind(",")
+        if cut <= 0:
+            return None
+        fragment = fragment[:cut]
+    
+    return None
+
+
+def validate_insights(values: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Keep the insight fields whose values fit the ConversationSummary types.
+    
+    Labels are matched case-insensitively and a single string is accepted
+    for a list field.
+    
+    Args:
+        values: Candidate insight values
+    
+    Returns:
+        The valid fields, normalized
+    """
+    valid = {}
+    for field, adapter in _FIELD_ADAPTERS.items():
+        if field not in values:
+            continue
+        
+        value = values[field]
+        if field in ("sentiment", "outcome") and isinstance(value, str):
+            value = value.strip().strip(".'\"").lower()
+        elif isinstance(DEFAULT_INSIGHTS[field], list) and isinstance(value, str):
+            value = [value] if value.strip() else []
+        
+        try:
+            value = adapter.validate_python(value)
+        except ValidationError:
+            continue
+        if field == "summary" and not value.strip():
+            continue
+        valid[field] = value
+    
+    return valid
+
+
+def parse_insights(response: str) -> Dict[str, Any]:
+    """
+    Parse the insights from an LLM response.
+    
+    Tolerates markdown code fences, text around the JSON object and output
+    cut off before the object is complete.
+    
+    Args:
+        response: The raw LLM response
+    
+    Returns:
+        The insight fields that could be parsed and validated; possibly none
+    """
+    fenced = _FENCE_PATTERN.search(response)
+    text = fenced.group(1) if fenced else response
+    
+    start = text.find("{")
+    if start < 0:
+        return {}
+    
+    text = text[start:]
+    end = _scan(text)["end"]
+    if end is not None:
+        values = _loads_object(text[:end + 1])
+    else:
+        values = _close_truncated(text)
+    
+    return validate_insights(values) if values else {}
+
+
+def update_insights_prompt(previous: Dict[str, Any]) -> str:
+    """
+    Build the system prompt asking to update insights with new messages.
+    
+    Args:
+        previous: Insights of the conversation so far
+    
+    Returns:
+        The system prompt
+    """
+    return (
+        "You maintain the insights of an ongoing customer service conversation. "
+        "These are the insights of the conversation so far, in JSON format:\n"
+        f"{json.dumps({field: previous[field] for field in INSIGHT_FIELDS}, ensure_ascii=False)}\n\n"
+        "The following messages were added to the conversation since. Update the insights so "
+        "they describe the whole conversation: extend the summary, add new action items, "
+        "decisions, questions and keywords, keep the earlier ones unless the new messages "
+        "change them, and set sentiment and outcome for the conversation as it stands now. "
+        "Keep 5-10 keywords.\n\n"
+        "Respond with valid JSON only, with the same fields."
+    )
+
+
+def merge_updated_insights(previous: Dict[str, Any], response: str) -> Dict[str, Any]:
+    """
+    Parse updated insights, keeping previous values for fields the response lacks.
+    
+    Args:
+        previous: Insights of the conversation before the update
+        response: The raw LLM response
+    
+    Returns:
+        The updated insights
+    """
+    updated = parse_insights(response)
+    missing = [field for field in INSIGHT_FIELDS if field not in updated]
+    if missing:
+        logger.warning(f"Insights update lacked {', '.join(missing)}, keeping the previous values")
+    
+    return {**{field: copy.copy(previous[field]) for field in missing}, **updated}
+
+
+async def request_missing_insights(
+    service: LLMService,
+    fields: List[str],
+    messages: List[ChatMessage],
+    formatted_messages: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    Request insight fields one by one, concurrently.
+    
+    At most LLM_FALLBACK_CONCURRENCY requests are in flight at once.
+    
+    Args:
+        service: The LLM service whose extractor methods to call
+        fields: The fields to request
+        messages: List of chat messages
+        formatted_messages: The messages already formatted for the provider
+    
+    Returns:
+        A value for every requested field; the default for those the
+        provider did not produce a valid value for
+    """
+    semaphore = asyncio.Semaphore(settings.LLM_FALLBACK_CONCURRENCY)
+    
+    async def request(field: str) -> Any:
+        """Request one field."""
+        async with semaphore:
+            extractor = getattr(service, INSIGHT_EXTRACTORS[field])
+            return await extractor(messages, formatted_messages=formatted_messages)
+    
+    values = dict(zip(fields, await asyncio.gather(*(request(field) for field in fields))))
+    valid = validate_insights(values)
+    
+    invalid = [field for field in fields if field not in valid]
+    if invalid:
+        logger.error(f"No valid value for insights {', '.join(invalid)}, using defaults")
+    
+    return {**default_insights(invalid), **valid}
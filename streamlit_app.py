@@ -7,6 +7,7 @@ import requests
 import json
 import os
 import datetime
+import time
 import plotly.express as px
 import plotly.graph_objects as go
 from typing import Dict, List, Any
@@ -35,6 +36,8 @@ class ChatSummarizerUI:
             st.session_state.conversations = []
         if "current_page" not in st.session_state:
             st.session_state.current_page = "dashboard"  # dashboard, conversations, upload
+        if "http_cache" not in st.session_state:
+            st.session_state.http_cache = {}  # url -> (etag, data)
     
     def setup_sidebar(self):
         """Create the sidebar with navigation and settings."""
@@ -264,6 +267,30 @@ class ChatSummarizerUI:
         else:
             st.info("No conversations match your search criteria.")
     
+    def conditional_get(self, url, headers):
+        """
+        GET a JSON resource, reusing the copy from an earlier rerun if unchanged.
+        
+        Returns:
+            The status code and the parsed body (None if not 200)
+        """
+        cached = st.session_state.http_cache.get(url)
+        request_headers = dict(headers)
+        if cached:
+            request_headers["If-None-Match"] = cached[0]
+        
+        response = requests.get(url, headers=request_headers)
+        if response.status_code == 304 and cached:
+            return 200, cached[1]
+        if response.status_code != 200:
+            st.session_state.http_cache.pop(url, None)
+            return response.status_code, None
+        
+        data = response.json()
+        if response.headers.get("ETag"):
+            st.session_state.http_cache[url] = (response.headers["ETag"], data)
+        return 200, data
+    
     def display_conversation_detail(self):
         """Display details of a selected conversation."""
         if not st.session_state.selected_conversation:
@@ -283,24 +310,18 @@ class ChatSummarizerUI:
         # Get conversation messages
         try:
             headers = {"X-API-Key": st.session_state.api_key}
-            response = requests.get(
+            status_code, messages = self.conditional_get(
                 f"{st.session_state.api_url}/chats/{conv_id}",
-                headers=headers
+                headers
             )
             
-            if response.status_code == 200:
-                messages = response.json()
-                
+            if status_code == 200:
                 # Try to get summary
-                summary_response = requests.get(
+                _, summary = self.conditional_get(
                     f"{st.session_state.api_url}/chats/{conv_id}/summary",
-                    headers=headers
+                    headers
                 )
                 
-                summary = None
-                if summary_response.status_code == 200:
-                    summary = summary_response.json()
-                
                 # Display in columns
                 col1, col2 = st.columns([3, 2])
                 
@@ -310,10 +331,10 @@ class ChatSummarizerUI:
                 with col2:
                     self.display_conversation_summary(conv_id, summary)
                 
-            elif response.status_code == 404:
+            elif status_code == 404:
                 st.error(f"Conversation {conv_id} not found.")
             else:
-                st.error(f"Failed to load conversation: {response.status_code}")
+                st.error(f"Failed to load conversation: {status_code}")
         except Exception as e:
             st.error(f"Error loading conversation: {str(e)}")
     
@@ -515,15 +536,8 @@ class ChatSummarizerUI:
                     files=files
                 )
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    st.success(f"Import completed successfully!")
-                    
-                    stats = result.get("stats", {})
-                    st.write(f"- Processed: {stats.get('processed', 0)} messages")
-                    st.write(f"- Successful: {stats.get('successful', 0)} messages")
-                    st.write(f"- Failed: {stats.get('failed', 0)} messages")
-                    st.write(f"- Conversations: {stats.get('conversation_count', 0)}")
+                if response.status_code == 202:
+                    self.wait_for_import_job(response.json()["job_id"], headers)
                 else:
                     st.error(f"Failed to import data: {response.status_code}")
                     st.write(response.text)
@@ -545,21 +559,48 @@ class ChatSummarizerUI:
                     json={"file_path": file_path}
                 )
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    st.success(f"Import completed successfully!")
-                    
-                    stats = result.get("stats", {})
-                    st.write(f"- Processed: {stats.get('processed', 0)} messages")
-                    st.write(f"- Successful: {stats.get('successful', 0)} messages")
-                    st.write(f"- Failed: {stats.get('failed', 0)} messages")
-                    st.write(f"- Conversations: {stats.get('conversation_count', 0)}")
+                if response.status_code == 202:
+                    self.wait_for_import_job(response.json()["job_id"], headers)
                 else:
                     st.error(f"Failed to import data: {response.status_code}")
                     st.write(response.text)
         except Exception as e:
             st.error(f"Error importing data: {str(e)}")
     
+    def wait_for_import_job(self, job_id, headers):
+        """Poll a background import job until it finishes and show its result."""
+        st.info(f"Import job {job_id} started.")
+        progress_bar = st.progress(0.0)
+        
+        while True:
+            response = requests.get(
+                f"{st.session_state.api_url}/import/jobs/{job_id}",
+                headers=headers
+            )
+            if response.status_code != 200:
+                st.error(f"Failed to check import job: {response.status_code}")
+                st.write(response.text)
+                return
+            
+            job = response.json()
+            if job.get("total_bytes"):
+                progress_bar.progress(min(job["bytes_processed"] / job["total_bytes"], 1.0))
+            
+            if job["status"] in ("completed", "failed"):
+                break
+            time.sleep(1)
+        
+        if job["status"] == "completed":
+            st.success(f"Import completed successfully!")
+        else:
+            st.error(f"Import failed: {job.get('error')}")
+        
+        st.write(f"- Processed: {job.get('rows_processed', 0)} messages")
+        st.write(f"- Successful: {job.get('successful', 0)} messages")
+        st.write(f"- Failed: {job.get('failed', 0)} messages")
+        st.write(f"- Already imported: {job.get('duplicates', 0)} messages")
+        st.write(f"- Throughput: {job.get('rows_per_second', 0)} rows/sec")
+    
     def run(self):
         """Run the Streamlit application."""
         # Setup the sidebar
@@ -1,33 +1,118 @@
 """
 Utility for importing chat data from CSV files.
 """
+import asyncio
+import codecs
 import csv
+import io
+import json
 import os
-from typing import List, Optional
+import threading
+import time
+import warnings
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
 from datetime import datetime
-import uuid
 import pandas as pd
-from db.models.chat import ChatMessage
+from bson import ObjectId
 from db.repositories.chat_repository import ChatRepository
+from config.settings import settings
 from config.logging import logger
 
 
+class IncrementalCSVParser:
+    """
+    Parse CSV rows from byte chunks as they arrive.
+    
+    Only complete records are returned; a record whose quoted field spans
+    a chunk boundary is held back until the rest of it is fed.
+    """
+    
+    def __init__(self, encoding: str = "utf-8"):
+        """Initialize the parser with an incremental text decoder."""
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._pending = ""
+        self.header: Optional[List[str]] = None
+    
+    def feed(self, data: bytes) -> List[List[str]]:
+        """
+        Add bytes and return the data rows completed by them.
+        
+        Args:
+            data: The next chunk of the CSV byte stream
+            
+        Returns:
+            Complete data rows (the header row is stored, not returned)
+        """
+        text = self._pending + self._decoder.decode(data)
+        
+        # A newline ends a record only if the quotes before it are balanced
+        end = 0
+        in_quotes = False
+        position = 0
+        while True:
+            newline = text.find("\n", position)
+            if newline == -1:
+                break
+            if text.count('"', position, newline) % 2:
+                in_quotes = not in_quotes
+            position = newline + 1
+            if not in_quotes:
+                end = position
+        
+        self._pending = text[end:]
+        return self._parse(text[:end])
+    
+    def close(self) -> List[List[str]]:
+        """
+        Flush the decoder and return any final record without a newline.
+        
+        Returns:
+            The remaining data rows
+        """
+        text = self._pending + self._decoder.decode(b"", final=True)
+        self._pending = ""
+        return self._parse(text)
+    
+    def _parse(self, text: str) -> List[List[str]]:
+        """Parse complete records, capturing the first one as the header."""
+        if not text:
+            return []
+        
+        rows = [row for row in csv.reader(io.StringIO(text)) if row]
+        if self.header is None and rows:
+            self.header = rows.pop(0)
+        return rows
+
+
 class CSVImporter:
     """Class to import chat data from CSV files."""
     
+    # Message fields read from every import source
+    FIELDS = ["conversation_id", "message_id", "message_content", "user_id", "user_type", "timestamp"]
+    
+    # Accepted user types; anything else falls back to "customer"
+    USER_TYPES = {"customer": "customer", "support_agent": "support_agent"}
+    
     @staticmethod
     async def import_from_file(
-        file_path: str, 
+        file_path: str,
         conversation_id_column: str = "conversation_id",
         message_id_column: str = "message_id",
         message_content_column: str = "message_content",
         user_id_column: str = "user_id",
         user_type_column: str = "user_type",
-        timestamp_column: str = "timestamp"
+        timestamp_column: str = "timestamp",
+        chunk_size: Optional[int] = None,
+        skip_rows: int = 0,
+        progress_callback: Optional[Callable[[dict], Awaitable[None]]] = None
     ) -> dict:
         """
         Import chat data from a CSV file into the database.
         
+        The file is read in fixed-size chunks so memory use does not grow
+        with the file size. While one chunk is being written to MongoDB the
+        next one is parsed in a worker thread.
+        
         Args:
             file_path: Path to the CSV file
             conversation_id_column: Column name for conversation IDs
@@ -36,7 +121,11 @@ class CSVImporter:
             user_id_column: Column name for user IDs
             user_type_column: Column name for user types
             timestamp_column: Column name for timestamps
-            
+            chunk_size: Rows per chunk (defaults to CSV_IMPORT_CHUNK_SIZE)
+            skip_rows: Number of data rows to skip, used to resume an import
+            progress_callback: Awaited with a progress snapshot after each chunk
+                is written
+        
         Returns:
             Dictionary with import statistics
         """
@@ -44,90 +133,554 @@ class CSVImporter:
             logger.error(f"CSV file not found: {file_path}")
             raise FileNotFoundError(f"CSV file not found: {file_path}")
         
+        columns = {
+            "conversation_id": conversation_id_column,
+            "message_id": message_id_column,
+            "message_content": message_content_column,
+            "user_id": user_id_column,
+            "user_type": user_type_column,
+            "timestamp": timestamp_column
+        }
+        chunk_size = chunk_size or settings.CSV_IMPORT_CHUNK_SIZE
+        
         try:
-            # Read CSV using pandas for better handling of various formats
-            df = pd.read_csv(file_path)
-            logger.info(f"Read {len(df)} rows from CSV file")
-            
-            # Validate columns
-            required_columns = [
-                conversation_id_column,
-                message_id_column,
-                message_content_column,
-                user_id_column,
-                user_type_column,
-                timestamp_column
-            ]
+            with open(file_path, "rb") as csv_file:
+                # Read CSV using pandas for better handling of various formats.
+                # IDs are read as text so numeric IDs keep their original form.
+                reader = pd.read_csv(
+                    csv_file,
+                    chunksize=chunk_size,
+                    dtype={
+                        columns[field]: str
+                        for field in ("conversation_id", "message_id", "user_id")
+                    }
+                )
+                with reader:
+                    return await CSVImporter._import_chunks(
+                        CSVImporter._skip_rows(reader, skip_rows) if skip_rows else reader,
+                        columns,
+                        progress_callback=progress_callback,
+                        bytes_read=csv_file.tell
+                    )
+        except Exception as e:
+            logger.error(f"Error importing CSV: {str(e)}")
+            raise
+    
+    @staticmethod
+    async def import_from_stream(
+        data: AsyncIterator[bytes],
+        conversation_id_column: str = "conversation_id",
+        message_id_column: str = "message_id",
+        message_content_column: str = "message_content",
+        user_id_column: str = "user_id",
+        user_type_column: str = "user_type",
+        timestamp_column: str = "timestamp",
+        chunk_size: Optional[int] = None
+    ) -> dict:
+        """
+        Import chat data from a CSV byte stream without staging it on disk.
+        
+        Rows are parsed as bytes arrive and written whenever a chunk fills.
+        The next bytes are only pulled after the pending chunk is written,
+        so a slow database throttles the producer instead of growing memory.
+        
+        Args:
+            data: Async iterator of CSV bytes, such as a request body stream
+            conversation_id_column: Column name for conversation IDs
+            message_id_column: Column name for message IDs
+            message_content_column: Column name for message content
+            user_id_column: Column name for user IDs
+            user_type_column: Column name for user types
+            timestamp_column: Column name for timestamps
+            chunk_size: Rows per chunk (defaults to CSV_IMPORT_CHUNK_SIZE)
+        
+        Returns:
+            Dictionary with import statistics
+        """
+        columns = {
+            "conversation_id": conversation_id_column,
+            "message_id": message_id_column,
+            "message_content": message_content_column,
+            "user_id": user_id_column,
+            "user_type": user_type_column,
+            "timestamp": timestamp_column
+        }
+        chunk_size = chunk_size or settings.CSV_IMPORT_CHUNK_SIZE
+        
+        parser = IncrementalCSVParser()
+        stats = CSVImporter.new_stats()
+        rows: List[List[str]] = []
+        
+        try:
+            async for block in data:
+                rows.extend(parser.feed(block))
+                while len(rows) >= chunk_size:
+                    await CSVImporter._import_rows(parser.header, rows[:chunk_size], columns, stats)
+                    del rows[:chunk_size]
             
-            for column in required_columns:
-                if column not in df.columns:
-                    logger.error(f"Required column '{column}' not found in CSV")
-                    raise ValueError(f"Required column '{column}' not found in CSV")
+            rows.extend(parser.close())
+            if parser.header is None:
+                raise ValueError("No columns to parse from CSV")
             
-            # Import statistics
-            stats = {
-                "total_rows": len(df),
-                "processed": 0,
-                "successful": 0,
-                "failed": 0,
-                "conversations": set()
+            CSVImporter._validate_columns(pd.DataFrame(columns=parser.header), columns)
+            if rows:
+                await CSVImporter._import_rows(parser.header, rows, columns, stats)
+        except Exception as e:
+            logger.error(f"Error importing CSV stream: {str(e)}")
+            raise
+        
+        return CSVImporter.finish_stats(stats)
+    
+    @staticmethod
+    async def _import_rows(
+        header: List[str],
+        rows: List[List[str]],
+        columns: Dict[str, str],
+        stats: dict
+    ) -> None:
+        """
+        Normalize and write rows parsed from a CSV stream.
+        
+        Args:
+            header: The CSV header row
+            rows: Parsed data rows
+            columns: Mapping of message field name to CSV column name
+            stats: Running import statistics, updated in place
+        """
+        first_row = stats["processed"]
+        
+        # Rows with the wrong number of fields cannot be mapped to columns
+        well_formed = [row for row in rows if len(row) == len(header)]
+        malformed = len(rows) - len(well_formed)
+        if malformed:
+            logger.error(f"Skipping {malformed} malformed rows after row {first_row}")
+        
+        frame = pd.DataFrame(
+            well_formed,
+            columns=header,
+            index=range(first_row, first_row + len(well_formed))
+        )
+        CSVImporter._validate_columns(frame, columns)
+        # Match read_csv, which treats empty fields as missing values
+        frame = frame.mask(frame == "")
+        
+        documents, row_indexes, failed = await asyncio.to_thread(
+            CSVImporter.normalize_chunk, frame, columns
+        )
+        
+        stats["processed"] += len(rows)
+        stats["failed"] += failed + malformed
+        await CSVImporter.write_documents(documents, row_indexes, stats)
+        
+        elapsed = time.monotonic() - stats["_started"]
+        logger.info(
+            f"CSV stream import progress: {stats['processed']} rows processed, "
+            f"{stats['processed'] / elapsed if elapsed else 0:.0f} rows/sec"
+        )
+    
+    @staticmethod
+    async def _import_chunks(
+        chunks: Iterator[pd.DataFrame],
+        columns: Dict[str, str],
+        progress_callback: Optional[Callable[[dict], Awaitable[None]]] = None,
+        bytes_read: Optional[Callable[[], int]] = None
+    ) -> dict:
+        """
+        Normalize and write chunks, preparing the next chunk during each write.
+        
+        Args:
+            chunks: Iterator yielding DataFrame chunks
+            columns: Mapping of message field name to CSV column name
+            progress_callback: Awaited with a progress snapshot after each chunk
+            bytes_read: Returns how far into the source the parser has read
+        
+        Returns:
+            Dictionary with import statistics
+        """
+        stats = CSVImporter.new_stats()
+        stop = threading.Event()
+        
+        # Parse in a worker thread so the event loop stays responsive
+        next_batch = asyncio.ensure_future(
+            asyncio.to_thread(CSVImporter._read_next_batch, chunks, columns, bytes_read, stop)
+        )
+        
+        try:
+            while True:
+                batch = await next_batch
+                if batch is None:
+                    break
+                
+                # Start preparing the next chunk before writing this one
+                next_batch = asyncio.ensure_future(
+                    asyncio.to_thread(CSVImporter._read_next_batch, chunks, columns, bytes_read, stop)
+                )
+                
+                documents, row_indexes, failed, position = batch
+                stats["processed"] += len(documents) + failed
+                stats["failed"] += failed
+                await CSVImporter.write_documents(documents, row_indexes, stats)
+                
+                elapsed = time.monotonic() - stats["_started"]
+                rows_per_second = stats["processed"] / elapsed if elapsed else 0.0
+                logger.info(
+                    f"CSV import progress: {stats['processed']} rows processed, "
+                    f"{rows_per_second:.0f} rows/sec"
+                )
+                
+                if progress_callback:
+                    await progress_callback({
+                        "processed": stats["processed"],
+                        "successful": stats["successful"],
+                        "failed": stats["failed"],
+                        "duplicates": stats["duplicates"],
+                        "bytes_processed": position,
+                        "rows_per_second": round(rows_per_second, 1)
+                    })
+        finally:
+            # Cancelling the task would not stop its thread: tell the reader not
+            # to start another chunk and wait for it, so the caller does not
+            # close the source while the thread is still reading it
+            stop.set()
+            await asyncio.wait([next_batch])
+            if not next_batch.cancelled():
+                next_batch.exception()
+        
+        return CSVImporter.finish_stats(stats)
+    
+    @staticmethod
+    def _skip_rows(chunks: Iterator[pd.DataFrame], skip_rows: int) -> Iterator[pd.DataFrame]:
+        """
+        Drop the first data rows of a chunked read.
+        
+        Rows are counted by the chunks' index, the way processed rows are
+        counted, so blank lines and multi-line quoted fields are not
+        mistaken for rows as a skiprows line count would.
+        
+        Args:
+            chunks: Iterator yielding DataFrame chunks with a running index
+            skip_rows: Number of data rows to drop
+        
+        Yields:
+            The remaining rows, in chunks
+        """
+        for chunk in chunks:
+            if len(chunk) and chunk.index[-1] >= skip_rows:
+                yield chunk.iloc[max(0, skip_rows - chunk.index[0]):]
+    
+    @staticmethod
+    def _read_next_batch(
+        chunks: Iterator[pd.DataFrame],
+        columns: Dict[str, str],
+        bytes_read: Optional[Callable[[], int]] = None,
+        stop: Optional[threading.Event] = None
+    ) -> Optional[Tuple[List[dict], List[int], int, Optional[int]]]:
+        """
+        Read the next chunk and normalize it into message documents.
+        
+        Args:
+            chunks: Iterator yielding DataFrame chunks
+            columns: Mapping of message field name to CSV column name
+            bytes_read: Returns how far into the source the parser has read
+            stop: Once set, no further chunk is read
+        
+        Returns:
+            Normalized documents, row indexes, failure count and source
+            position, or None when exhausted or stopped
+        """
+        if stop is not None and stop.is_set():
+            return None
+        
+        chunk = next(chunks, None)
+        if chunk is None:
+            return None
+        
+        position = bytes_read() if bytes_read else None
+        CSVImporter._validate_columns(chunk, columns)
+        return (*CSVImporter.normalize_chunk(chunk, columns), position)
+    
+    @staticmethod
+    def _validate_columns(chunk: pd.DataFrame, columns: Dict[str, str]) -> None:
+        """
+        Check that every required column is present.
+        
+        Args:
+            chunk: A chunk read from the file
+            columns: Mapping of message field name to CSV column name
+        
+        Raises:
+            ValueError: If a required column is missing
+        """
+        for column in columns.values():
+            if column not in chunk.columns:
+                logger.error(f"Required column '{column}' not found in CSV")
+                raise ValueError(f"Required column '{column}' not found in CSV")
+    
+    @staticmethod
+    def normalize_chunk(
+        chunk: pd.DataFrame,
+        columns: Dict[str, str]
+    ) -> Tuple[List[dict], List[int], int]:
+        """
+        Turn a chunk into insert-ready message documents using column operations.
+        
+        Applies the same rules as ChatMessage validation without building a
+        model per row: IDs and content are coerced to strings, timestamps are
+        parsed in one pass with a per-row fallback for mixed formats, and
+        unknown user types default to "customer".
+        
+        Args:
+            chunk: The rows to normalize
+            columns: Mapping of message field name to CSV column name
+        
+        Returns:
+            Documents, their source row indexes and the number of failed rows
+        """
+        now = datetime.utcnow()
+        string_columns = [
+            columns[field]
+            for field in ("conversation_id", "message_id", "message_content", "user_id")
+        ]
+        
+        # Rows missing a required value cannot become valid messages
+        missing_mask = chunk[string_columns].isna().any(axis=1)
+        failed = int(missing_mask.sum())
+        if failed:
+            for index in chunk.index[missing_mask.to_numpy()]:
+                logger.error(f"Error processing row {index}: missing required value")
+            chunk = chunk[~missing_mask]
+        
+        string_fields = {
+            field: chunk[columns[field]].astype(str).tolist()
+            for field in ("conversation_id", "message_id", "message_content", "user_id")
+        }
+        
+        # Parse timestamps for the whole column, then retry mixed formats
+        raw_timestamps = chunk[columns["timestamp"]]
+        with warnings.catch_warnings():
+            # Unparseable first values only disable format inference
+            warnings.simplefilter("ignore", UserWarning)
+            timestamps = pd.to_datetime(raw_timestamps, errors="coerce", utc=True)
+        retry_mask = timestamps.isna() & raw_timestamps.notna()
+        if retry_mask.any():
+            timestamps[retry_mask] = pd.to_datetime(
+                raw_timestamps[retry_mask], errors="coerce", utc=True, format="mixed"
+            )
+        
+        invalid_timestamps = timestamps.isna()
+        if invalid_timestamps.any():
+            logger.warning(
+                f"Invalid timestamp in {int(invalid_timestamps.sum())} rows "
+                f"(first row {chunk.index[invalid_timestamps.to_numpy()][0]}), using current time"
+            )
+        timestamp_values = [
+            now if pd.isna(value) else value.to_pydatetime()
+            for value in timestamps.dt.tz_localize(None)
+        ]
+        
+        # Map user types through the category codes instead of row by row
+        user_types = chunk[columns["user_type"]].astype(str).astype("category")
+        mapped_user_types = user_types.map(CSVImporter.USER_TYPES)
+        invalid_user_types = mapped_user_types.isna()
+        if invalid_user_types.any():
+            logger.warning(
+                f"Invalid user_type in {int(invalid_user_types.sum())} rows "
+                f"(values: {sorted(user_types[invalid_user_types].unique().tolist())}), "
+                f"defaulting to 'customer'"
+            )
+        user_type_values = mapped_user_types.astype(object).where(
+            ~invalid_user_types, "customer"
+        ).tolist()
+        
+        documents = [
+            {
+                "_id": ObjectId(),
+                "conversation_id": conversation_id,
+                "message_id": message_id,
+                "message_content": message_content,
+                "user_id": user_id,
+                "user_type": user_type,
+                "timestamp": timestamp
             }
+            for conversation_id, message_id, message_content, user_id, user_type, timestamp in zip(
+                string_fields["conversation_id"],
+                string_fields["message_id"],
+                string_fields["message_content"],
+                string_fields["user_id"],
+                user_type_values,
+                timestamp_values
+            )
+        ]
+        
+        return documents, chunk.index.tolist(), failed
+    
+    @staticmethod
+    def iter_file_batches(
+        file_path: str,
+        chunk_size: Optional[int] = None
+    ) -> Iterator[Tuple[List[dict], List[int], int]]:
+        """
+        Read a CSV or NDJSON file and yield normalized document batches.
+        
+        This does no database I/O, so it can run in a worker process. Files
+        ending in .ndjson or .jsonl are read as one JSON object per line;
+        anything else is read as CSV. Both use the default column names.
+        
+        Args:
+            file_path: Path to the file
+            chunk_size: Rows per batch (defaults to CSV_IMPORT_CHUNK_SIZE)
             
-            # Process each row
-            for index, row in df.iterrows():
-                stats["processed"] += 1
+        Yields:
+            Documents, their source row indexes and the number of failed rows
+        """
+        chunk_size = chunk_size or settings.CSV_IMPORT_CHUNK_SIZE
+        columns = {field: field for field in CSVImporter.FIELDS}
+        
+        if file_path.endswith((".ndjson", ".jsonl")):
+            with open(file_path, "r", encoding="utf-8") as ndjson_file:
+                records: List[dict] = []
+                indexes: List[int] = []
+                invalid = 0
                 
-                try:
-                    # Get values
-                    conversation_id = str(row[conversation_id_column])
-                    message_id = str(row[message_id_column])
-                    message_content = str(row[message_content_column])
-                    user_id = str(row[user_id_column])
-                    user_type = str(row[user_type_column])
-                    
-                    # Handle timestamp
+                for line_number, line in enumerate(ndjson_file):
+                    if not line.strip():
+                        continue
                     try:
-                        timestamp = pd.to_datetime(row[timestamp_column])
-                    except:
-                        # Default to current time if timestamp is invalid
-                        logger.warning(f"Invalid timestamp in row {index}, using current time")
-                        timestamp = datetime.utcnow()
-                    
-                    # Validate user_type
-                    if user_type not in ["customer", "support_agent"]:
-                        logger.warning(f"Invalid user_type '{user_type}' in row {index}, defaulting to 'customer'")
-                        user_type = "customer"
+                        record = json.loads(line)
+                        if not isinstance(record, dict):
+                            raise ValueError("not a JSON object")
+                        records.append(record)
+                        indexes.append(line_number)
+                    except ValueError as e:
+                        logger.error(f"Error processing line {line_number}: {str(e)}")
+                        invalid += 1
                     
-                    # Create message object
-                    message = ChatMessage(
-                        conversation_id=conversation_id,
-                        message_id=message_id,
-                        message_content=message_content,
-                        user_id=user_id,
-                        user_type=user_type,
-                        timestamp=timestamp
+                    if len(records) + invalid >= chunk_size:
+                        documents, row_indexes, failed = CSVImporter.normalize_chunk(
+                            pd.DataFrame.from_records(records, columns=CSVImporter.FIELDS, index=indexes),
+                            columns
+                        )
+                        yield documents, row_indexes, failed + invalid
+                        records, indexes, invalid = [], [], 0
+                
+                if records or invalid:
+                    documents, row_indexes, failed = CSVImporter.normalize_chunk(
+                        pd.DataFrame.from_records(records, columns=CSVImporter.FIELDS, index=indexes),
+                        columns
                     )
-                    
-                    # Store in database
-                    await ChatRepository.create_message(message)
-                    
-                    # Update statistics
-                    stats["successful"] += 1
-                    stats["conversations"].add(conversation_id)
-                    
-                except Exception as e:
-                    logger.error(f"Error processing row {index}: {str(e)}")
-                    stats["failed"] += 1
-            
-            # Convert set to list for easier serialization
-            stats["conversations"] = list(stats["conversations"])
-            stats["conversation_count"] = len(stats["conversations"])
-            
-            logger.info(f"CSV import completed: {stats['successful']} messages imported, "
-                       f"{stats['failed']} failed, {stats['conversation_count']} conversations")
-            
-            return stats
-            
-        except Exception as e:
-            logger.error(f"Error importing CSV: {str(e)}")
-            raise 
\ No newline at end of file
+                    yield documents, row_indexes, failed + invalid
+            return
+        
+        with pd.read_csv(
+            file_path,
+            chunksize=chunk_size,
+            dtype={field: str for field in ("conversation_id", "message_id", "user_id")}
+        ) as reader:
+            for chunk in reader:
+                CSVImporter._validate_columns(chunk, columns)
+                yield CSVImporter.normalize_chunk(chunk, columns)
+    
+    @staticmethod
+    async def write_documents(
+        documents: List[dict],
+        row_indexes: List[int],
+        stats: dict
+    ) -> None:
+        """
+        Write message documents and record per-row results in the stats.
+        
+        Args:
+            documents: Insert-ready message documents
+            row_indexes: Source row index for each document
+            stats: Running import statistics, updated in place
+        """
+        if not documents:
+            return
+        
+        results = await ChatRepository.insert_documents(documents)
+        chunk_conversations = set()
+        
+        for document, index, result in zip(documents, row_indexes, results):
+            if result["status"] == "inserted":
+                stats["successful"] += 1
+                CSVImporter._count_conversation(stats, document["conversation_id"], chunk_conversations)
+            elif result["status"] == "duplicate":
+                # Already imported, e.g. when a file is re-imported
+                stats["duplicates"] += 1
+            else:
+                logger.error(f"Error importing row {index}: {result.get('error')}")
+                stats["failed"] += 1
+    
+    @staticmethod
+    def _count_conversation(stats: dict, conversation_id: str, chunk_conversations: set) -> None:
+        """
+        Count a conversation that received messages, in bounded memory.
+        
+        The first IMPORT_MAX_TRACKED_CONVERSATIONS conversation IDs are kept
+        and counted exactly. Beyond that, a conversation is counted once per
+        chunk it appears in, so one spanning several chunks is counted again.
+        
+        Args:
+            stats: Running import statistics, updated in place
+            conversation_id: The conversation of an inserted message
+            chunk_conversations: Conversations already counted in this chunk
+        """
+        if conversation_id in stats["conversations"] or conversation_id in chunk_conversations:
+            return
+        
+        if len(stats["conversations"]) < settings.IMPORT_MAX_TRACKED_CONVERSATIONS:
+            stats["conversations"].add(conversation_id)
+        else:
+            chunk_conversations.add(conversation_id)
+            stats["conversation_count_exact"] = False
+        stats["conversation_count"] += 1
+    
+    @staticmethod
+    def new_stats() -> dict:
+        """
+        Create an empty statistics dictionary for an import run.
+        
+        Importers that parse on their own, such as import_cleaned_data.py,
+        pass it to write_documents and finish it with finish_stats.
+        
+        Returns:
+            The running statistics
+        """
+        return {
+            "total_rows": 0,
+            "processed": 0,
+            "successful": 0,
+            "failed": 0,
+            "duplicates": 0,
+            "conversations": set(),
+            "conversation_count": 0,
+            "conversation_count_exact": True,
+            "_started": time.monotonic()
+        }
+    
+    @staticmethod
+    def finish_stats(stats: dict) -> dict:
+        """
+        Finalize statistics for serialization.
+        
+        Args:
+            stats: Running import statistics
+        
+        Returns:
+            The statistics with derived totals and throughput
+        """
+        elapsed = time.monotonic() - stats.pop("_started")
+        
+        stats["total_rows"] = stats["processed"]
+        # Convert set to list for easier serialization; at most
+        # IMPORT_MAX_TRACKED_CONVERSATIONS IDs, see conversation_count for the total
+        stats["conversations"] = list(stats["conversations"])
+        stats["elapsed_seconds"] = round(elapsed, 3)
+        stats["rows_per_second"] = round(stats["processed"] / elapsed, 1) if elapsed else 0.0
+        
+        logger.info(f"CSV import completed: {stats['successful']} messages imported, "
+                   f"{stats['failed']} failed, {stats['duplicates']} duplicates, "
+                   f"{stats['conversation_count']} conversations, "
+                   f"{stats['rows_per_second']} rows/sec")
+        
+        return stats
@@ -0,0 +1,24 @@
+"""
+Datetime helpers.
+"""
+from datetime import datetime, timezone
+from typing import Optional
+
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    Convert a datetime to naive UTC, the form MongoDB returns.
+    
+    Timezone-aware values, e.g. parsed from "2024-01-01T00:00:00Z", are
+    converted to UTC; naive values are taken to be UTC already. Comparing
+    a stored timestamp with an aware value in Python raises TypeError.
+    
+    Args:
+        value: The datetime, or None
+    
+    Returns:
+        The naive UTC datetime, or None
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
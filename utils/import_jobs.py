@@ -0,0 +1,130 @@
+"""
+Background runner for CSV import jobs.
+"""
+import os
+from datetime import datetime, timedelta
+from db.models.import_job import ImportJob
+from db.repositories.import_job_repository import ImportJobRepository
+from utils.csv_importer import CSVImporter
+from config.settings import settings
+from config.logging import logger
+
+
+class ImportJobRunner:
+    """Runs CSV imports as resumable background jobs."""
+    
+    @staticmethod
+    async def run(job_id: str) -> None:
+        """
+        Run or resume an import job from its last committed offset.
+        
+        Progress is written to the job after every chunk, so a job that
+        fails part way can be resumed without re-importing committed rows.
+        
+        Args:
+            job_id: The ID of the job to run
+        """
+        job = await ImportJobRepository.get_job(job_id)
+        if not job:
+            logger.error(f"Import job {job_id} not found")
+            return
+        
+        stale_before = datetime.utcnow() - timedelta(seconds=settings.IMPORT_JOB_STALE_SECONDS)
+        if not await ImportJobRepository.claim_job(job.id, ["pending", "failed"], stale_before):
+            logger.warning(f"Import job {job_id} is already running or finished")
+            return
+        
+        offset = job.rows_processed
+        base_successful = job.successful
+        base_failed = job.failed
+        base_duplicates = job.duplicates
+        # Bytes of the rows committed by earlier runs, which this run skips
+        base_bytes = job.bytes_processed if offset else 0
+        total_bytes = os.path.getsize(job.file_path) if os.path.exists(job.file_path) else 0
+        
+        async def report_progress(progress: dict) -> None:
+            """Persist the committed offset and throughput for this job."""
+            bytes_processed = progress["bytes_processed"] or 0
+            eta_seconds = None
+            # Rows and rate cover this run only, so compare them with this run's bytes
+            bytes_this_run = bytes_processed - base_bytes
+            if progress["rows_per_second"] and bytes_this_run > 0:
+                rows_remaining = progress["processed"] * (total_bytes - bytes_processed) / bytes_this_run
+                eta_seconds = round(rows_remaining / progress["rows_per_second"], 1)
+            
+            await ImportJobRepository.update_job(job.id, {
+                "rows_processed": offset + progress["processed"],
+                "successful": base_successful + progress["successful"],
+                "failed": base_failed + progress["failed"],
+                "duplicates": base_duplicates + progress["duplicates"],
+                "bytes_processed": bytes_processed,
+                "total_bytes": total_bytes,
+                "rows_per_second": progress["rows_per_second"],
+                "eta_seconds": eta_seconds
+            })
+        
+        if offset:
+            logger.info(f"Resuming import job {job_id} from row {offset}")
+        else:
+            logger.info(f"Starting import job {job_id} for {job.filename}")
+        
+        try:
+            stats = await CSVImporter.import_from_file(
+                job.file_path,
+                skip_rows=offset,
+                progress_callback=report_progress
+            )
+        except Exception as e:
+            logger.error(f"Import job {job_id} failed: {e}")
+            await ImportJobRepository.update_job(job.id, {
+                "status": "failed",
+                "error": str(e),
+                "eta_seconds": None
+            })
+            return
+        
+        await ImportJobRepository.update_job(job.id, {
+            "status": "completed",
+            "rows_processed": offset + stats["processed"],
+            "successful": base_successful + stats["successful"],
+            "failed": base_failed + stats["failed"],
+            "duplicates": base_duplicates + stats["duplicates"],
+            "bytes_processed": total_bytes,
+            "total_bytes": total_bytes,
+            "eta_seconds": 0.0,
+            "completed_at": datetime.utcnow()
+        })
+        
+        if job.delete_file and os.path.exists(job.file_path):
+            os.unlink(job.file_path)
+        
+        logger.info(f"Import job {job_id} completed")
+    
+    @staticmethod
+    def describe(job: ImportJob) -> dict:
+        """
+        Build the API representation of a job.
+        
+        Args:
+            job: The job to describe
+        
+        Returns:
+            Dictionary with job status and progress
+        """
+        return {
+            "job_id": str(job.id),
+            "filename": job.filename,
+            "status": job.status,
+            "rows_processed": job.rows_processed,
+            "successful": job.successful,
+            "failed": job.failed,
+            "duplicates": job.duplicates,
+            "bytes_processed": job.bytes_processed,
+            "total_bytes": job.total_bytes,
+            "rows_per_second": job.rows_per_second,
+            "eta_seconds": job.eta_seconds,
+            "error": job.error,
+            "created_at": job.created_at,
+            "updated_at": job.updated_at,
+            "completed_at": job.completed_at
+        }
@@ -0,0 +1,165 @@
+"""
+Keyset (cursor) pagination helpers.
+"""
+import base64
+from typing import Any, Dict, List, Literal, Optional, Tuple
+from bson import json_util
+
+Direction = Literal["next", "prev"]
+SortSpec = List[Tuple[str, int]]
+
+
+class KeysetPagination:
+    """
+    Opaque cursors for pages ordered by a unique sort key.
+    
+    A cursor records the sort key values of the first or last item of a
+    page and the direction to continue in, so the next page is an index
+    seek past that position instead of a skip over every earlier item.
+    """
+    
+    @staticmethod
+    def encode_cursor(sort: SortSpec, values: List[Any], direction: Direction) -> str:
+        """
+        Build an opaque cursor token.
+        
+        Args:
+            sort: The (field, direction) pairs the results are ordered by
+            values: The sort key values of the boundary item
+            direction: "next" to continue after it, "prev" to go back before it
+        
+        Returns:
+            URL-safe cursor token
+        """
+        payload = json_util.dumps({
+            "s": [field for field, _ in sort],
+            "v": values,
+            "d": direction
+        })
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+    
+    @staticmethod
+    def decode_cursor(token: str, sort: SortSpec) -> Tuple[List[Any], Direction]:
+        """
+        Decode a cursor token created for the same ordering.
+        
+        Args:
+            token: The cursor token from a previous response
+            sort: The (field, direction) pairs the results are ordered by
+        
+        Returns:
+            The boundary sort key values and the direction
+        
+        Raises:
+            ValueError: If the token is malformed or was issued for another ordering
+        """
+        try:
+            padded = token + "=" * (-len(token) % 4)
+            payload = json_util.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            fields, values, direction = payload["s"], payload["v"], payload["d"]
+        except (ValueError, TypeError, KeyError):
+            # Covers bad base64, bad UTF-8 and bad JSON alike
+            raise ValueError("Invalid cursor")
+        
+        if fields != [field for field, _ in sort] or len(values) != len(sort) or direction not in ("next", "prev"):
+            raise ValueError("Cursor does not match this listing")
+        
+        return values, direction
+    
+    @staticmethod
+    def sort_key(document: Dict[str, Any], sort: SortSpec) -> List[Any]:
+        """
+        Extract the sort key values of a document.
+        
+        Args:
+            document: A result document
+            sort: The (field, direction) pairs the results are ordered by
+        
+        Returns:
+            The document's values for each sort field
+        """
+        return [document[field] for field, _ in sort]
+    
+    @staticmethod
+    def seek_filter(sort: SortSpec, values: List[Any], direction: Direction) -> Dict[str, Any]:
+        """
+        Build a filter selecting the items after (or before) a position.
+        
+        Args:
+            sort: The (field, direction) pairs the results are ordered by
+            values: The sort key values of the boundary item
+            direction: "next" for items after the boundary, "prev" for items before it
+        
+        Returns:
+            MongoDB filter usable as an index range on the sort fields
+        """
+        clauses = []
+        for position, (field, order) in enumerate(sort):
+            forward = (order == 1) == (direction == "next")
+            clause = {earlier: values[index] for index, (earlier, _) in enumerate(sort[:position])}
+            clause[field] = {"$gt" if forward else "$lt": values[position]}
+            clauses.append(clause)
+        
+        return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+    
+    @staticmethod
+    def query_sort(sort: SortSpec, direction: Direction) -> SortSpec:
+        """
+        Return the order to read in: reversed when paging backwards.
+        
+        Args:
+            sort: The (field, direction) pairs the results are ordered by
+            direction: The paging direction
+        
+        Returns:
+            The sort to pass to the query
+        """
+        if direction == "prev":
+            return [(field, -order) for field, order in sort]
+        return list(sort)
+    
+    @staticmethod
+    def build_page(
+        documents: List[Dict[str, Any]],
+        sort: SortSpec,
+        limit: int,
+        direction: Direction,
+        has_previous: bool
+    ) -> Tuple[List[Dict[str, Any]], Optional[str], Optional[str]]:
+        """
+        Trim an over-fetched window to a page and create its cursors.
+        
+        The window must hold up to limit + 1 documents read in query_sort
+        order; the extra document only signals that another page exists.
+        
+        Args:
+            documents: The documents read, in query order
+            sort: The (field, direction) pairs the results are ordered by
+            limit: Page size
+            direction: The direction the window was read in
+            has_previous: Whether pages exist before the window when reading forwards
+        
+        Returns:
+            The page in display order, the next cursor and the previous cursor
+        """
+        has_more = len(documents) > limit
+        page = documents[:limit]
+        if direction == "prev":
+            page.reverse()
+        
+        if not page:
+            return page, None, None
+        
+        has_next = has_more if direction == "next" else True
+        has_prev = has_previous if direction == "next" else has_more
+        
+        next_cursor = (
+            KeysetPagination.encode_cursor(sort, KeysetPagination.sort_key(page[-1], sort), "next")
+            if has_next else None
+        )
+        prev_cursor = (
+            KeysetPagination.encode_cursor(sort, KeysetPagination.sort_key(page[0], sort), "prev")
+            if has_prev else None
+        )
+        
+        return page, next_cursor, prev_cursor